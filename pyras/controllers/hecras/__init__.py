@@ -1,13 +1,30 @@
 """
 HEC-RAS Controller
 ==================
+
+The installed versions of HEC-RAS are looked for in the registry on first
+use of `get_available_versions` only, and the result is kept in
+~/.pyras/hecras_versions.json until the registry changes. The controller
+classes are imported with the package but pywin32 only when a controller is
+created, so the package can be imported on any platform.
 """
 
+import json
 import os
+import os.path as osp
+import tempfile
+
+from ...util import replace_file
+
+
+# Executables of the HEC-RAS versions with a controller
+_VERSIONS = {'HEC-RAS\\4.1.0\\ras.exe': 'RAS41',
+             'HEC-RAS\\5.0 Beta 2014-10-01\\ras.exe': 'RAS500'}
 
-import win32api
-import win32con
-from six import PY3
+# Bump when the layout of the version cache changes
+_CACHE_VERSION = 1
+
+_available_versions = None
 
 
 def kill_ras():
@@ -16,10 +33,7 @@ def kill_ras():
 
     ras_process_string = 'ras.exe'
     proc = subprocess.Popen('TASKLIST /FO "CSV"', stdout=subprocess.PIPE)
-    if PY3:
-        tasklist = proc.stdout.read().decode('utf-8').split('\n')
-    else:
-        tasklist = proc.stdout.read().split('\n')
+    tasklist = proc.stdout.read().decode('utf-8').split('\n')
     tasks = []
     pids = []
     for line in tasklist:
@@ -37,23 +51,95 @@ def kill_ras():
             print(e)
 
 
-def get_available_versions():
-    """ """
-    ver = {'HEC-RAS\\4.1.0\\ras.exe': 'RAS41',
-           'HEC-RAS\\5.0 Beta 2014-10-01\\ras.exe': 'RAS500'}
+def _version_cache():
+    """Return the path of the cache of the available versions."""
+    return osp.join(osp.expanduser('~'), '.pyras', 'hecras_versions.json')
+
 
-    ldic = _get_registered_typelibs()
+def _typelib_stamp():
+    """Return the last write time and the number of subkeys of the TypeLib
+    registry key, they change when a type library is registered."""
+    import win32api
+    import win32con
 
-    # Check if files actually exist (another sanity check)
-    available_versions = []
+    key = win32api.RegOpenKey(win32con.HKEY_CLASSES_ROOT, "TypeLib")
+    try:
+        n_keys, _, modified = win32api.RegQueryInfoKey(key)
+    finally:
+        win32api.RegCloseKey(key)
+    return [int(modified), int(n_keys)]
 
-    for dic in ldic:
-        fname = dic['filename']
-        if os.path.isfile(fname):
-            for k in ver:
-                if k in fname:
-                    available_versions.append(ver[k])
-    return available_versions
+
+def _read_version_cache(stamp):
+    """Return the cached (version, filename) pairs, None if outdated."""
+    try:
+        with open(_version_cache()) as f:
+            cache = json.load(f)
+    except (IOError, OSError, ValueError):
+        return None
+    if (cache.get('cache_version') != _CACHE_VERSION or
+            cache.get('stamp') != stamp):
+        return None
+    found = cache.get('versions', [])
+    # Uninstalling HEC-RAS may leave the registry untouched
+    if not all(osp.isfile(fname) for _, fname in found):
+        return None
+    return found
+
+
+def _write_version_cache(stamp, found):
+    """Store the (version, filename) pairs found in the registry."""
+    filename = _version_cache()
+    directory = osp.dirname(filename)
+    try:
+        if not osp.isdir(directory):
+            os.makedirs(directory)
+        fd, tmp = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        with os.fdopen(fd, 'w') as f:
+            json.dump({'cache_version': _CACHE_VERSION, 'stamp': stamp,
+                       'versions': found}, f)
+        replace_file(tmp, filename)
+    except (IOError, OSError):
+        # The cache is only an optimization
+        pass
+
+
+def get_available_versions(refresh=False):
+    """Return the controller versions of the installed HEC-RAS, e.g.
+    ['RAS41', 'RAS500'].
+
+    The registry is scanned on first call, then the result is reused, from
+    memory or from ~/.pyras/hecras_versions.json while the TypeLib key of the
+    registry is not modified. An empty list is returned without pywin32.
+
+    Parameters
+    ----------
+    refresh : bool, optional
+        Scan the registry again.
+    """
+    global _available_versions
+    if _available_versions is not None and not refresh:
+        return list(_available_versions)
+    try:
+        stamp = _typelib_stamp()
+    except ImportError:
+        _available_versions = []
+        return []
+
+    found = None if refresh else _read_version_cache(stamp)
+    if found is None:
+        # Check if files actually exist (another sanity check)
+        found = []
+        for dic in _get_registered_typelibs():
+            fname = dic['filename']
+            if os.path.isfile(fname):
+                for k in _VERSIONS:
+                    if k in fname:
+                        found.append([_VERSIONS[k], fname])
+        _write_version_cache(stamp, found)
+
+    _available_versions = [version for version, _ in found]
+    return list(_available_versions)
 
 
 def _get_typelib_info(keyid, version):
@@ -62,6 +148,9 @@ def _get_typelib_info(keyid, version):
 
     # Copyright (c) 1996-2008, Greg Stein and Mark Hammond.
     """
+    import win32api
+    import win32con
+
     collected = []
     help_path = ""
     key = win32api.RegOpenKey(win32con.HKEY_CLASSES_ROOT,
@@ -122,6 +211,9 @@ def _get_registered_typelibs(match='HEC River Analysis System'):
 
     # Copyright (c) 1996-2008, Greg Stein and Mark Hammond.
     """
+    import win32api
+    import win32con
+
     # Explicit lookup in the registry.
     result = []
     key = win32api.RegOpenKey(win32con.HKEY_CLASSES_ROOT, "TypeLib")
@@ -185,14 +277,10 @@ class HECRASImportError(Exception):
 
 # %%
 # kill_ras()
-__available_versions__ = get_available_versions()
-
 from .hecrascontroller import RAS500
 from .hecrascontroller import RAS41
 
 # Cleaning the namespace
 globals().pop('hecrascontroller')
 globals().pop('hecrasgeometry')
-globals().pop('win32api')
-globals().pop('win32con')
 globals().pop('runtime')
@@ -0,0 +1,105 @@
+"""
+Asynchronous computation of HEC-RAS plans.
+
+Every controller runs its own HEC-RAS process. The computation of the
+current plan is started in non blocking mode and Compute_Complete is polled
+from the event loop, waiting a little longer after every poll, so a single
+event loop can wait for the plans of many controllers at once.
+
+This module needs Python 3.5 or later, it is imported by
+RASController.compute_async when first used.
+"""
+import asyncio
+import time
+
+
+def _cancel(controller):
+    """Cancel the computation of a controller, if the version can."""
+    # Compute_Cancel is not documented for RAS500, call the COM object
+    try:
+        controller._rc.Compute_Cancel()
+    except Exception:
+        # The computation runs to its end, close() kills HEC-RAS
+        pass
+
+
+async def compute_async(controller, timeout=None, poll_interval=0.05,
+                        max_interval=2.0, backoff=1.5):
+    """Compute the current plan of a controller without blocking the event
+    loop.
+
+    Parameters
+    ----------
+    controller : RASController
+        A controller of a version with Compute_Complete (RAS500 and later).
+    timeout : float, optional
+        The maximum duration of the computation in seconds. It is cancelled
+        if it takes longer.
+    poll_interval : float, optional
+        The first interval between polls of Compute_Complete, in seconds.
+    max_interval : float, optional
+        The longest interval between polls.
+    backoff : float, optional
+        The factor applied to the interval after every poll.
+
+    Returns
+    -------
+    bool
+        The success of the start of the computation.
+
+    Raises
+    ------
+    asyncio.TimeoutError
+        If the computation takes longer than `timeout`, it is cancelled.
+    asyncio.CancelledError
+        If the task is cancelled, the computation is cancelled too.
+    """
+    rc = controller._rc
+    controller.clear_id_cache()
+    success = rc.Compute_CurrentPlan(None, None, False)[0]
+    deadline = None if timeout is None else time.monotonic() + timeout
+    interval = poll_interval
+    try:
+        while not rc.Compute_Complete():
+            delay = interval
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise asyncio.TimeoutError(
+                        'Computation not complete after {0} s'.format(
+                            timeout))
+                delay = min(delay, remaining)
+            await asyncio.sleep(delay)
+            interval = min(interval * backoff, max_interval)
+    except (asyncio.TimeoutError, asyncio.CancelledError):
+        _cancel(controller)
+        raise
+    finally:
+        controller.clear_id_cache()
+    return success
+
+
+async def compute_all(controllers, timeout=None, return_exceptions=False,
+                      **kwargs):
+    """Compute the current plans of many controllers at once.
+
+    Parameters
+    ----------
+    controllers : list of RASController
+        The controllers, every one with its plan set.
+    timeout : float, optional
+        The maximum duration of every computation in seconds.
+    return_exceptions : bool, optional
+        Return the errors of the failed computations with the results of the
+        others, otherwise the first error is raised.
+    **kwargs
+        The polling options of `compute_async`.
+
+    Returns
+    -------
+    list
+        The results of `compute_async`, in the order of `controllers`.
+    """
+    tasks = [compute_async(controller, timeout, **kwargs)
+             for controller in controllers]
+    return await asyncio.gather(*tasks, return_exceptions=return_exceptions)
@@ -1,6 +1,6 @@
 """
 """
-import win32com.client
+import numpy as np
 
 from . import ras41
 from . import ras500
@@ -8,12 +8,39 @@ from .. import hecrasgeometry
 from ..runtime import Runtime
 
 
+# Controller methods that may change the river, reach and node IDs
+_ID_CHANGES = ('Project_Open', 'Project_New', 'Plan_SetCurrent',
+               'PlanOutput_SetCurrent', 'Compute_CurrentPlan',
+               'Compute_WATPlan', 'Edit_GeometricData', 'Edit_AddXS',
+               'Edit_AddBC', 'Edit_AddIW', 'Edit_AddLW', 'Edit_XS',
+               'Edit_BC', 'Edit_IW', 'Edit_LW', 'Geometry_SetMann',
+               'Geometry_SetMann_LChR', 'Geometery_GISImport')
+
+
+def _clears_ids(name):
+    """Return a controller method that drops the cached IDs before calling
+    the method `name` of the HEC-RAS version."""
+    def method(self, *args, **kwargs):
+        self.clear_id_cache()
+        return getattr(super(RASController, self), name)(*args, **kwargs)
+    method.__name__ = name
+    method.__doc__ = getattr(ras41.ControllerBase, name).__doc__
+    return method
+
+
+def _key(names):
+    """Return the names of a river, reach or node as a dictionary key."""
+    return tuple(str(name).strip() for name in names)
+
+
 class RASController(object):
     """ """
 
     def __init__(self, filename=None):
         super(RASController, self).__init__()
         try:
+            import win32com.client
+
             self._rc = win32com.client.DispatchEx(
                 "{0}.HECRASController".format(self._ras_version))
             # self._rc = win32com.client.DispatchWithEvents(
@@ -28,6 +55,8 @@ class RASController(object):
             self._ras_version)
         self._filename = filename
         self._runtime = Runtime(self)
+        self._ids = {}
+        self._id_stats = {'hits': 0, 'misses': 0, 'loads': 0}
 
         if filename:
             self.Project_Open(filename)
@@ -57,6 +86,274 @@ class RASController(object):
         """ """
         self._runtime.close()
 
+    def compute_async(self, timeout=None, poll_interval=0.05,
+                      max_interval=2.0, backoff=1.5):
+        """Compute the current plan without blocking, return an awaitable.
+
+        Compute_Complete is polled with increasing intervals, from
+        `poll_interval` to `max_interval` seconds. The computation is
+        cancelled after `timeout` seconds (asyncio.TimeoutError) or if the
+        task is cancelled. Use pyras.controllers.hecras.compute.compute_all
+        to wait for the plans of many controllers at once.
+
+        Notes
+        -----
+        Needs a version with non blocking computations (RAS500 and later) and
+        Python 3.5 or later.
+        """
+        if not hasattr(self, 'Compute_Complete'):
+            raise NotImplementedError(self._error)
+        from ..compute import compute_async
+
+        return compute_async(self, timeout, poll_interval, max_interval,
+                             backoff)
+
+    # %% ID cache
+    def _load_ids(self, output):
+        """Read the IDs of all the rivers, reaches and nodes, from the output
+        file or from the geometry."""
+        rc = self._rc
+        ids, names = {}, {}
+        if output:
+            _, rivers = rc.Output_GetRivers(None, None)
+        else:
+            _, rivers = rc.Geometry_GetRivers(0, ())
+        geo = None if output else self.Geometry()
+        for riv, river in enumerate(rivers or (), 1):
+            if output:
+                _, _, reaches = rc.Output_GetReaches(riv, None, None)
+            else:
+                _, _, reaches = rc.Geometry_GetReaches(riv, 0, ())
+            items = [((river,), (riv,))]
+            for rch, reach in enumerate(reaches or (), 1):
+                items.append(((river, reach), (riv, rch)))
+                if output:
+                    _, _, nRS, rs, _ = rc.Output_GetNodes(riv, rch, None, None,
+                                                          None)
+                else:
+                    nRS = geo.nNode(riv, rch)
+                    empty = (float('nan'),) * (nRS + 1)
+                    _, _, nRS, rs, _ = rc.Geometry_GetNodes(riv, rch, nRS,
+                                                            empty, empty)
+                # Node n is item n of the 1-based array
+                for n, station in enumerate(ras41._one_based(rs, nRS), 1):
+                    items.append(((river, reach, station), (riv, rch, n)))
+            for key, value in items:
+                ids[_key(key)] = value
+                names[value] = _key(key)
+        self._id_stats['loads'] += 1
+        self._ids[output] = ids, names
+        return ids, names
+
+    def _id_table(self, output):
+        """Return the cached ID dictionaries, loading them if needed."""
+        table = self._ids.get(output)
+        if table is None:
+            table = self._load_ids(output)
+        return table
+
+    def _child_id(self, output, parent, name):
+        """Return the cached ID of a reach or node given the IDs of its river
+        or reach, None if not found."""
+        ids, names = self._id_table(output)
+        parent = names.get(tuple(int(i) for i in parent))
+        child = None if parent is None else ids.get(_key(parent + (name,)))
+        self._id_stats['hits' if child is not None else 'misses'] += 1
+        return None if child is None else child[-1]
+
+    def get_ids(self, river, reach=None, rs=None, output=False):
+        """Return the IDs of a river, reach or node from their names.
+
+        The IDs of the whole model are read with a few calls on first use and
+        cached until the project, the plan or the geometry changes.
+
+        Parameters
+        ----------
+        river : str
+            The river name.
+        reach : str, optional
+            The reach name, to get the river and reach IDs.
+        rs : str, optional
+            The river station, to get the river, reach and node IDs.
+        output : bool, optional
+            Use the IDs of the output file rather than of the geometry.
+
+        Returns
+        -------
+        tuple of int or None
+            (riv,), (riv, rch) or (riv, rch, n), None if not found.
+        """
+        names = [name for name in (river, reach, rs) if name is not None]
+        ids, _ = self._id_table(output)
+        result = ids.get(_key(names))
+        self._id_stats['hits' if result is not None else 'misses'] += 1
+        return result
+
+    def get_names(self, riv, rch=None, n=None, output=False):
+        """Return the names of a river, reach or node from their IDs, the
+        inverse of `get_ids`, None if not found."""
+        key = tuple(int(i) for i in (riv, rch, n) if i is not None)
+        _, names = self._id_table(output)
+        result = names.get(key)
+        self._id_stats['hits' if result is not None else 'misses'] += 1
+        return result
+
+    def clear_id_cache(self):
+        """Drop the cached IDs, they are read again on next use.
+
+        This is done by the controller methods that open projects, change
+        the current plan, compute or edit the geometry. Call it after
+        changing the geometry through the HECRASGeometry object.
+        """
+        self._ids = {}
+
+    def id_cache_info(self):
+        """Return the 'hits', 'misses' and 'loads' of the ID cache and its
+        'size', the number of cached names."""
+        info = dict(self._id_stats)
+        info['size'] = sum(len(ids) for ids, _ in self._ids.values())
+        return info
+
+    def Output_GetRiver(self, river):
+        """Returns the river ID for a given river name, from the ID cache."""
+        ids = self.get_ids(river, output=True)
+        if ids is not None:
+            return ids[0]
+        return super(RASController, self).Output_GetRiver(river)
+
+    def Output_GetReach(self, riv, reach):
+        """Returns the Reach ID for a given Reach name, from the ID cache."""
+        rch = self._child_id(True, (riv,), reach)
+        if rch is not None:
+            return rch
+        return super(RASController, self).Output_GetReach(riv, reach)
+
+    def Output_GetNode(self, riv, reach, rs):
+        """Returns the Node ID for a given River Station, from the ID
+        cache."""
+        n = self._child_id(True, (riv, reach), rs)
+        if n is not None:
+            return n
+        return super(RASController, self).Output_GetNode(riv, reach, rs)
+
+    def Geometry_GetNode(self, riv, rch, rs):
+        """Returns the node ID of a selected node, from the ID cache."""
+        n = self._child_id(False, (riv, rch), rs)
+        if n is not None:
+            return n
+        return super(RASController, self).Geometry_GetNode(riv, rch, rs)
+
+    def output_cube(self, variables, profiles=None):
+        """Return the output of all the cross sections of the current plan.
+
+        This is the result of Output_ReachOutput for every reach, profile and
+        variable in a single array. The rivers, reaches and profiles are
+        listed once and the COM interface is called directly, once per
+        reach, profile and variable.
+
+        Parameters
+        ----------
+        variables : int or list of int
+            The variable IDs, see the ras_constants module.
+        profiles : list of int or str, optional
+            The profile IDs or names, by default all the profiles.
+
+        Returns
+        -------
+        cube : ndarray of float, shape (n_xs, n_profiles, n_variables)
+            The output values, NaN where HEC-RAS returned no value.
+        coords : dict
+            The 'river', 'reach', 'rs' and 'distance' (channel distance) of
+            every cross section, from upstream to downstream in every reach,
+            and the 'profile' names and 'variable' IDs of the other axes.
+
+        Raises
+        ------
+        ValueError
+            If there is no variable or no profile.
+
+        Notes
+        -----
+        Only cross sections are returned, as with Output_ReachOutput. This
+        function reads from the output file, so a *.O## file is required
+        (i.e. run computations first).
+
+        The cross sections of a reach are those of the first profile and
+        variable. If HEC-RAS returns fewer values for another profile or
+        variable, they are taken as the most downstream cross sections and
+        the others are NaN.
+        """
+        rc = self._rc
+        variables = [int(v) for v in np.atleast_1d(variables)]
+        _, profile_names = rc.Output_GetProfiles(None, None)
+        profile_names = list(profile_names or ())
+        if profiles is None:
+            profile_ids = list(range(1, len(profile_names) + 1))
+        else:
+            profile_ids = [int(p) if isinstance(p, (int, np.integer))
+                           else profile_names.index(p) + 1 for p in profiles]
+        if not variables:
+            raise ValueError('No output variable requested')
+        if not profile_ids:
+            raise ValueError('No profile requested or in the output')
+
+        # The cross sections of every reach, from the first requested value.
+        # The arrays are 1-based, with an unused first item
+        reaches = []
+        _, rivers = rc.Output_GetRivers(None, None)
+        for riv, river in enumerate(rivers or (), 1):
+            _, _, names = rc.Output_GetReaches(riv, None, None)
+            for rch, reach in enumerate(names or (), 1):
+                res = rc.Output_ReachOutput(riv, rch, profile_ids[0],
+                                            variables[0], None, None, None,
+                                            None)
+                nRS, rs, dist, value = res[4:8]
+                reaches.append((riv, rch, river, reach, nRS, rs, dist, value))
+
+        count = np.array([item[4] or 0 for item in reaches], dtype=np.int64)
+        start = np.zeros(count.size + 1, dtype=np.int64)
+        np.cumsum(count, out=start[1:])
+        n = int(start[-1])
+        cube = np.full((n, len(profile_ids), len(variables)), np.nan)
+        coords = {'river': np.empty(n, dtype=object),
+                  'reach': np.empty(n, dtype=object),
+                  'rs': np.empty(n, dtype=object),
+                  'distance': np.full(n, np.nan),
+                  'profile': [profile_names[p - 1] for p in profile_ids],
+                  'variable': np.array(variables)}
+
+        def fill(values, i, j, k):
+            # Output_ReachOutput lists the cross sections from downstream,
+            # shorter lists are aligned on the downstream end
+            values = np.array(ras41._one_based(values, count[i]),
+                              dtype=np.float64)
+            stop = start[i + 1]
+            cube[stop - values.size:stop, j, k] = values[::-1]
+
+        for i, (riv, rch, river, reach, nRS, rs, dist, value) in \
+                enumerate(reaches):
+            if not count[i]:
+                continue
+            xs = slice(start[i], start[i + 1])
+            coords['river'][xs] = river
+            coords['reach'][xs] = reach
+            coords['rs'][xs] = list(ras41._one_based(rs, count[i]))[::-1]
+            coords['distance'][xs] = np.array(
+                ras41._one_based(dist, count[i]), dtype=np.float64)[::-1]
+            fill(value, i, 0, 0)
+            for j, prof in enumerate(profile_ids):
+                for k, nVar in enumerate(variables):
+                    if j == 0 and k == 0:
+                        continue
+                    res = rc.Output_ReachOutput(riv, rch, prof, nVar, None,
+                                                None, None, None)
+                    fill(res[7], i, j, k)
+        return cube, coords
+
+
+for _name in _ID_CHANGES:
+    setattr(RASController, _name, _clears_ids(_name))
+
 
 class RAS41(RASController, ras41.Controller):
     """HEC-RAS Controller version RAS41.
@@ -70,7 +367,7 @@ class RAS41(RASController, ras41.Controller):
     def __init__(self, filename=None):
         self._ras_version = 'RAS41'
         self._ras = ras41
-        self._geometry = hecrasgeometry.RAS41()
+        self._geometry = hecrasgeometry.RAS41(self)
         super(RAS41, self).__init__(filename)
 
 
@@ -86,5 +383,5 @@ class RAS500(RASController, ras500.Controller):
     def __init__(self, filename=None):
         self._ras_version = 'RAS503'
         self._ras = ras500
-        self._geometry = hecrasgeometry.RAS500()
+        self._geometry = hecrasgeometry.RAS500(self)
         super(RAS500, self).__init__(filename)
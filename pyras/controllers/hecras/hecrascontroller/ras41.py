@@ -1,18 +1,53 @@
 """
 """
-import datetime as dt
 import os
 import os.path as osp
 
+import numpy as np
 
-def _fix_dates(dates):
-    """Helper function to convert dates to datetime objects."""
 
-    # Fix dates with epoch
-    init = dt.datetime(1900, 1, 1) - dt.timedelta(2)  # Needed to adjust
-    new_dates = [dt.timedelta(d) + init for d in dates[1:]]
+# Origin of the OLE automation dates returned by HEC-RAS
+_OLE_EPOCH = np.datetime64('1899-12-30T00:00:00', 'us')
 
-    return new_dates
+
+def _one_based(values, count=None):
+    """Return the items of a 1-based array returned by HEC-RAS.
+
+    The arrays have an unused first item, as the arrays passed to HEC-RAS
+    (see Geometry_GetNodes). The first `count` items after it are returned,
+    all of them by default.
+    """
+    if values is None:
+        return ()
+    stop = None if count is None else count + 1
+    return values[1:stop]
+
+
+def _fix_dates(dates, as_array=False):
+    """Helper function to convert dates to datetime objects.
+
+    The dates are OLE automation dates, a 1-based array whose first item is
+    skipped. All the dates are converted at once, to the microsecond as
+    datetime.timedelta does, or rounded to the second in a numpy
+    datetime64[s] array if `as_array`.
+    """
+    days = np.asarray(_one_based(dates), dtype=np.float64)
+    if as_array:
+        seconds = np.round(days * 86400.0).astype(np.int64)
+        return (_OLE_EPOCH.astype('datetime64[s]') +
+                seconds.astype('timedelta64[s]'))
+
+    # Whole days apart, so the fractions are rounded as by timedelta
+    whole = np.floor(days)
+    microseconds = (whole.astype(np.int64) * 86400000000 +
+                    np.round((days - whole) * 86400e6).astype(np.int64))
+    new_dates = _OLE_EPOCH + microseconds.astype('timedelta64[us]')
+    return new_dates.tolist()
+
+
+def _fix_values(values):
+    """Helper function to convert a 1-based array of values to floats."""
+    return np.asarray(_one_based(values), dtype=np.float64)
 
 
 def _create_dir(filepath):
@@ -179,7 +214,7 @@ class ControllerAdded(object):
         res = rc.Geometry_GetGML(geomfilename)
         return res
 
-    def OutputDSS_GetStageFlowSA(self, StorageArea):
+    def OutputDSS_GetStageFlowSA(self, StorageArea, as_array=False):
         """
         Returns stage and flow for every hydrograph output interval for a
         given storage area.
@@ -188,17 +223,22 @@ class ControllerAdded(object):
         ----------
         StorageArea : string
             The storage area name.
+        as_array : bool, optional
+            Return the dates as a numpy datetime64[s] array and the stage and
+            flow as float arrays of the same length, much faster for long
+            simulations.
 
         Returns
         -------
         nValue: int
             The number of hydrograph outputs
         ValueDateTime: list of datetime objects
-            The array of date/times in python datetime format.
+            The array of date/times in python datetime format, or a
+            datetime64[s] array if `as_array`.
         Stage: list of floats
-            The array of stage values.
+            The array of stage values, or a float array if `as_array`.
         Flow: list of floats
-            The array of flow values.
+            The array of flow values, or a float array if `as_array`.
         errmsg: str
             An error message returned if something goes wrong with getting
             output.
@@ -220,7 +260,9 @@ class ControllerAdded(object):
                                           Stage, Flow, errmsg)
         success, StorageArea, nvalue, ValueDateTime, Stage, Flow, errmsg = res
 
-        new_dates = _fix_dates(ValueDateTime)
+        new_dates = _fix_dates(ValueDateTime, as_array)
+        if as_array:
+            Stage, Flow = _fix_values(Stage), _fix_values(Flow)
         return nvalue, new_dates, Stage, Flow, errmsg
 
     def Output_ComputationLevel_Export(self, filename, WriteFlow=False,
@@ -261,7 +303,8 @@ class ControllerAdded(object):
         parameters that can be sent.
 
         *Caution: this method can take a long time to run and can create a very
-        large text file.
+        large text file. Use pyras.io.hecras.computation_level to read it back
+        by chunks.
 
         """
         errmsg = ''
@@ -1510,7 +1553,7 @@ class ControllerBase(object):
         return (nv, LeftSta, RightSta, ConvPerc, Area, WP, Flow, HydrDepth,
                 Velocity)
 
-    def OutputDSS_GetStageFlow(self, riv, rch, rs):
+    def OutputDSS_GetStageFlow(self, riv, rch, rs, as_array=False):
         """Return stage and flow for every hydrograph output interval.
 
         Parameters
@@ -1521,17 +1564,22 @@ class ControllerBase(object):
             The reach name.
         rs : str
             The river station.
+        as_array : bool, optional
+            Return the dates as a numpy datetime64[s] array and the stage and
+            flow as float arrays of the same length, much faster for long
+            simulations.
 
         Returns
         -------
         nvalue : int
             The number of hydrograph outputs.
         ValueDateTime : list of datetime
-            The list of datetime objects.
+            The list of datetime objects, or a datetime64[s] array if
+            `as_array`.
         Stage : list of floats
-            The list of stage values.
+            The list of stage values, or a float array if `as_array`.
         Flow : list of floats
-            The list of flow values.
+            The list of flow values, or a float array if `as_array`.
         errmsg : str
             Error message in case ssomething goes wrong with getting output.
 
@@ -1550,7 +1598,9 @@ class ControllerBase(object):
         res = rc.OutputDSS_GetStageFlow(riv, rch, rs, nvalue, ValueDateTime,
                                         Stage, Flow, errmsg)
         success, riv, rch, rs, nvalue, ValueDateTime, Stage, Flow, errmsg = res
-        new_dates = _fix_dates(ValueDateTime)
+        new_dates = _fix_dates(ValueDateTime, as_array)
+        if as_array:
+            Stage, Flow = _fix_values(Stage), _fix_values(Flow)
 
         return nvalue, new_dates, Stage, Flow, errmsg
 
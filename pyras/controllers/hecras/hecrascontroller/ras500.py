@@ -225,7 +225,7 @@ class ControllerBase(ras41.ControllerBase, ras41.ControllerAdded):
     pass
 
 
-class Controller(ControllerBase, ControllerAdded, ControllerDeprecated):
+class Controller(ControllerAdded, ControllerBase, ControllerDeprecated):
     """HECRAS Controller version RAS500."""
 
     def __init__(self):
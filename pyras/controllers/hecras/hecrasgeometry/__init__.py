@@ -1,36 +1,78 @@
 """
 """
-import win32com.client
-
 from . import ras41
 from . import ras500
 
 
 class RASGeometry(object):
+    """The HECRASGeometry object of a controller.
+
+    The river, reach and node IDs and the river stations are answered from
+    the ID cache of the controller, see RASController.get_ids, and looked up
+    with HEC-RAS only for unknown names.
+    """
 
-    def __init__(self):
+    def __init__(self, controller=None):
         super(RASGeometry, self).__init__()
+        self._controller = controller
         try:
+            import win32com.client
+
             self._geometry = win32com.client.DispatchEx(
                 "{0}.HECRASGeometry".format(self._ras_version))
         except Exception:
             msg = "{0}.HECRASGeometry not found.".format(self._ras_version)
             raise ImportError(msg)
 
+    def RiverIndex(self, RiverName):
+        """Returns the id of the river, given a river name, from the ID
+        cache."""
+        if self._controller is not None:
+            ids = self._controller.get_ids(RiverName)
+            if ids is not None:
+                return ids[0]
+        return super(RASGeometry, self).RiverIndex(RiverName)
+
+    def ReachIndex(self, riv, ReachName):
+        """Returns the ID of a reach, given its name, from the ID cache."""
+        if self._controller is not None:
+            rch = self._controller._child_id(False, (riv,), ReachName)
+            if rch is not None:
+                return rch
+        return super(RASGeometry, self).ReachIndex(riv, ReachName)
+
+    def NodeIndex(self, riv, rch, RS):
+        """Returns the node ID for a given river station, from the ID
+        cache."""
+        if self._controller is not None:
+            n = self._controller._child_id(False, (riv, rch), RS)
+            if n is not None:
+                return n
+        return super(RASGeometry, self).NodeIndex(riv, rch, RS)
+
+    def NodeRS(self, riv, rch, n):
+        """Returns the river station of a node, given its node ID, from the
+        ID cache."""
+        if self._controller is not None:
+            names = self._controller.get_names(riv, rch, n)
+            if names is not None:
+                return names[-1]
+        return super(RASGeometry, self).NodeRS(riv, rch, n)
+
 
 class RAS41(RASGeometry, ras41.Geometry):
     """HEC-RAS Geometry version RAS41."""
 
-    def __init__(self):
+    def __init__(self, controller=None):
         self._ras_version = 'RAS41'
         self._ras = ras41
-        super(RAS41, self).__init__()
+        super(RAS41, self).__init__(controller)
 
 
 class RAS500(RASGeometry, ras500.Geometry):
     """HEC-RAS Geometry version RAS500."""
 
-    def __init__(self):
+    def __init__(self, controller=None):
         self._ras_version = 'RAS503'
         self._ras = ras500
-        super(RAS500, self).__init__()
+        super(RAS500, self).__init__(controller)
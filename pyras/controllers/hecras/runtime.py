@@ -3,10 +3,6 @@
 import os
 import time
 
-import win32con
-import win32gui
-import win32process
-
 
 class Runtime(object):
     """ """
@@ -23,6 +19,10 @@ class Runtime(object):
 
     def get_pid(self):
         """ """
+        import win32con
+        import win32gui
+        import win32process
+
         self.parent.ShowRas()
         window_text = 'HEC-RAS '
 
@@ -94,6 +94,9 @@ class Runtime(object):
 
     def _pause(self, window_text=None, close=False):
         """ """
+        import win32con
+        import win32gui
+
         def enumHandler(hwnd, lParam):
             if window_text in win32gui.GetWindowText(hwnd):
                 self.window = hwnd
@@ -0,0 +1,88 @@
+"""
+Reaches of a river network.
+"""
+
+
+class Link(object):
+    """A reach of a river network, a view on the arrays of the network.
+
+    Links are created by indexing a RiverNetwork, they do not copy its
+    arrays.
+
+    Parameters
+    ----------
+    network : RiverNetwork
+        The network of the reach.
+    index : int
+        The index of the reach in the network.
+    """
+
+    __slots__ = ('_network', '_index')
+
+    def __init__(self, network, index):
+        self._network = network
+        self._index = index
+
+    def __repr__(self):
+        return '<Link {0!r}>'.format(self.location)
+
+    def __eq__(self, other):
+        return (isinstance(other, Link) and other._network is self._network
+                and other._index == self._index)
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __hash__(self):
+        return hash((id(self._network), self._index))
+
+    @property
+    def network(self):
+        """The network of the reach."""
+        return self._network
+
+    @property
+    def index(self):
+        """The index of the reach in the network."""
+        return self._index
+
+    @property
+    def location(self):
+        """The (river, reach) of the reach."""
+        return self._network.names[self._index]
+
+    @property
+    def length(self):
+        """The length of the reach."""
+        return self._network.lengths[self._index]
+
+    @property
+    def upstream_junction(self):
+        """The junction at the upstream end of the reach."""
+        return int(self._network.upstream[self._index])
+
+    @property
+    def downstream_junction(self):
+        """The junction at the downstream end of the reach."""
+        return int(self._network.downstream[self._index])
+
+    @property
+    def previous_links(self):
+        """The reaches flowing into the reach."""
+        network = self._network
+        start, stop = network.up_start[self._index:self._index + 2]
+        return [network[i] for i in network.up_index[start:stop]]
+
+    @property
+    def next_links(self):
+        """The reaches the reach flows into."""
+        network = self._network
+        start, stop = network.down_start[self._index:self._index + 2]
+        return [network[i] for i in network.down_index[start:stop]]
+
+    @property
+    def nodes(self):
+        """The nodes of the reach, from upstream to downstream."""
+        network = self._network
+        start, stop = network.node_start[self._index:self._index + 2]
+        return list(network.node_names[start:stop])
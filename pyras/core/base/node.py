@@ -4,46 +4,83 @@ http://www.python-course.eu/graphs_python.php
 """
 
 
-def Node(object):
-    """
+class Node(object):
+    """Base class of the elements located along a river (cross sections,
+    structures...).
 
+    Parameters
+    ----------
+    name : str, optional
+        The name of the node, e.g. its river station.
+    location : tuple, optional
+        The (river, reach) of the node.
+    comments : str, optional
+        Free text description of the node.
     """
-    
+
+    __slots__ = ('_name', '_location', '_comments', '_previous', '_next')
+
+    def __init__(self, name=None, location=None, comments=''):
+        self._name = name
+        self._location = location
+        self._comments = comments
+        # The lists of linked nodes are created on first use, most nodes of
+        # a large model are never linked
+        self._previous = None
+        self._next = None
+
+    # This means nodes are directed, anything incoming is previous
+    # anything outgoing is next... change names maybe?
+    @property
+    def previous_nodes(self):
+        """The nodes upstream."""
+        if self._previous is None:
+            self._previous = []
+        return self._previous
+
+    @previous_nodes.setter
+    def previous_nodes(self, value):
+        """ """
+        self._previous = list(value)
+
+    @property
+    def next_nodes(self):
+        """The nodes downstream."""
+        if self._next is None:
+            self._next = []
+        return self._next
+
+    @next_nodes.setter
+    def next_nodes(self, value):
+        """ """
+        self._next = list(value)
+
     @property
     def location(self):
-        """
-        """
+        """The (river, reach) of the node."""
+        return self._location
 
-    @station.setter
+    @location.setter
     def location(self, value):
-        """
-        """
-        
-    @property    
-    def name(self):
-        """
-        """
+        """ """
+        self._location = value
 
-    @name.setter    
+    @property
     def name(self):
-        """
-        """
+        """The name of the node."""
+        return self._name
+
+    @name.setter
+    def name(self, value):
+        """ """
+        self._name = value
 
     @property
     def comments(self):
-        """
-        """
+        """Free text description of the node."""
+        return self._comments
 
-    @comments.setter    
-    def comments(self):
-        """
-        """
-
-    def __init__(self):
-        self.name
-        self.location
-        self.comments
-        # This means nodes are directed, anything incoming is previous
-        # anything outgoing is next... change names maybe?
-        self.previous_nodes
-        self.next_nodes
+    @comments.setter
+    def comments(self, value):
+        """ """
+        self._comments = value
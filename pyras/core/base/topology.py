@@ -0,0 +1,186 @@
+"""
+Construction of river networks from the reach lines of a model.
+
+Schematic_ReachPoints returns the lines of the reaches, drawn from upstream
+to downstream, but no junctions. The junctions are found by hashing the end
+points of the reaches on a grid of cells of the snapping tolerance: end
+points closer than the tolerance are in the same or in adjacent cells, so
+every end point is only compared with the few end points of 4 cells and
+the whole network is built in linear time. A reach flows into the reaches
+starting where it ends, a junction with several reaches starting at it is a
+flow split.
+
+Geometry files (*.g##) list the reaches joined at every junction in their
+"Junct Name" blocks, which are used as they are.
+"""
+import numpy as np
+
+from ..hydraulics import _offsets
+from ...io.hecras.read_ras import read_network
+from .tree import RiverNetwork
+
+
+# Cells already compared with a cell: itself and half of its neighbours
+_NEIGHBOURS = ((0, 0), (1, -1), (1, 0), (1, 1), (0, 1))
+
+
+def _find(parent, i):
+    """Root of an item of a union-find forest, halving the path."""
+    while parent[i] != i:
+        parent[i] = parent[parent[i]]
+        i = parent[i]
+    return i
+
+
+def snap_points(x, y, tolerance):
+    """Group the points linked by distances within a tolerance.
+
+    Parameters
+    ----------
+    x, y : array of float
+        The coordinates of the points.
+    tolerance : float
+        The largest distance between two linked points. Groups are chained:
+        points farther apart are in the same group when they are linked
+        through other points of the group (single linkage).
+
+    Returns
+    -------
+    ndarray of int
+        The group of every point, numbered from 0 in order of first point.
+    """
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    if tolerance <= 0:
+        raise ValueError('The tolerance must be positive')
+    cells = np.floor(np.column_stack([x, y]) / tolerance).astype(np.int64)
+    grid = {}
+    for i, cell in enumerate(zip(cells[:, 0].tolist(), cells[:, 1].tolist())):
+        grid.setdefault(cell, []).append(i)
+
+    parent = list(range(x.size))
+    limit = tolerance * tolerance
+    for (cx, cy), items in grid.items():
+        for dx, dy in _NEIGHBOURS:
+            others = grid.get((cx + dx, cy + dy))
+            if others is None:
+                continue
+            for a, i in enumerate(items):
+                # Pairs of the same cell are compared once
+                for j in (items[a + 1:] if others is items else others):
+                    if (x[i] - x[j]) ** 2 + (y[i] - y[j]) ** 2 <= limit:
+                        root_i, root_j = _find(parent, i), _find(parent, j)
+                        if root_i != root_j:
+                            parent[max(root_i, root_j)] = min(root_i, root_j)
+
+    roots = np.array([_find(parent, i) for i in range(x.size)],
+                     dtype=np.int64)
+    _, first, groups = np.unique(roots, return_index=True,
+                                 return_inverse=True)
+    # Number the groups in order of their first point
+    rank = np.empty(first.size, dtype=np.int64)
+    rank[np.argsort(first)] = np.arange(first.size)
+    return rank[groups.ravel()]
+
+
+def _line_lengths(x, y, start, count):
+    """Length of every polyline."""
+    n = len(count)
+    owner = np.repeat(np.arange(n), count)
+    segment = np.hypot(np.diff(x), np.diff(y))
+    # Segments joining two polylines are dropped
+    same = owner[1:] == owner[:-1] if x.size else np.empty(0, dtype=bool)
+    return np.bincount(owner[1:][same], weights=segment[same], minlength=n)
+
+
+def network_from_lines(names, x, y, start, count, tolerance=0.01,
+                       nodes=None):
+    """Build a river network by snapping the ends of the reach lines.
+
+    Parameters
+    ----------
+    names : list of tuple
+        The (river, reach) of every reach.
+    x, y : array of float
+        The points of all the reach lines, one after the other, every line
+        from upstream to downstream.
+    start, count : array of int
+        The first point and the number of points of every reach line.
+    tolerance : float, optional
+        The largest distance between linked ends of reaches, in the units
+        of the coordinates, see `snap_points`.
+    nodes : list of sequences, optional
+        The nodes of every reach, see RiverNetwork.
+
+    Returns
+    -------
+    RiverNetwork
+        The network, the ends of the reaches not shared with other reaches
+        being free ends.
+    """
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    start = np.asarray(start, dtype=np.int64)
+    count = np.asarray(count, dtype=np.int64)
+    if (count < 1).any():
+        raise ValueError('Reaches without points can not be connected')
+    n = count.size
+    # Upstream and downstream end of every reach, alternating
+    ends = np.column_stack([start, start + count - 1]).ravel()
+    groups = snap_points(x[ends], y[ends], tolerance)
+
+    # Ends shared by several reaches are junctions, the others free ends
+    shared = np.bincount(groups)[groups] > 1
+    junction = np.full(groups.size, -1, dtype=np.int64)
+    _, junction[shared] = np.unique(groups[shared], return_inverse=True)
+    junction = junction.reshape(n, 2)
+
+    # Lines may not be contiguous, copy them in order to measure them
+    items = (np.repeat(start, count) + np.arange(count.sum()) -
+             np.repeat(_offsets(count)[:-1], count))
+    lengths = _line_lengths(x[items], y[items], start, count)
+    return RiverNetwork(junction[:, 0], junction[:, 1], names, lengths,
+                        nodes)
+
+
+def network_from_schematic(points, tolerance=0.01, nodes=None):
+    """Build a river network from the result of Schematic_ReachPoints.
+
+    See `network_from_lines` for the parameters.
+    """
+    rivers, reaches, start, count, x, y = points[:6]
+    return network_from_lines(list(zip(rivers, reaches)), x, y, start, count,
+                              tolerance, nodes)
+
+
+def network_from_geometry(filename, tolerance=None):
+    """Build the river network of a geometry file (*.g##).
+
+    Parameters
+    ----------
+    filename : str
+        Path to the geometry file.
+    tolerance : float, optional
+        By default the reaches are joined as in the "Junct Name" blocks of
+        the file. Otherwise the ends of the reach lines closer than the
+        tolerance are joined instead.
+
+    Returns
+    -------
+    RiverNetwork
+        The network, with the length of the reach lines and the river
+        stations of the nodes of every reach.
+    """
+    network = read_network(filename)
+    lines = network['reach_xy']
+    count = np.array([line.shape[0] for line in lines], dtype=np.int64)
+    xy = (np.concatenate(lines) if lines else
+          np.empty((0, 2), dtype=np.float64))
+    start = _offsets(count)[:-1]
+    if tolerance is not None:
+        return network_from_lines(network['reaches'], xy[:, 0], xy[:, 1],
+                                  start, count, tolerance, network['nodes'])
+    lengths = _line_lengths(xy[:, 0], xy[:, 1], start, count)
+    return RiverNetwork.from_junctions(network['junctions'],
+                                       network['reaches'], lengths,
+                                       network['nodes'])
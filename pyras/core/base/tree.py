@@ -0,0 +1,439 @@
+"""
+River network of a model stored in compressed sparse row arrays.
+
+The reaches are the links of the network and the junctions its vertices,
+the free upstream and downstream ends of the reaches being junctions of
+their own. The connectivity is stored as in a CSR sparse matrix: the reaches
+downstream of reach i are down_index[down_start[i]:down_start[i + 1]]. The
+nodes (cross sections, structures...) of all the reaches follow each other
+in a flat array, from upstream to downstream, in the same way.
+
+The topological order of the reaches is computed on first use and cached as
+levels: the reaches of a level only receive flow from the reaches of the
+previous levels. Traversals and accumulations along the network are array
+operations over these levels rather than walks over Python objects.
+"""
+import numpy as np
+
+from ..hydraulics import _offsets
+from .link import Link
+
+
+# Starting value of the accumulation of the flows into a reach
+_IDENTITY = {np.add: 0.0, np.maximum: -np.inf, np.minimum: np.inf}
+
+
+def _gather(start, index, groups):
+    """Return the items of some rows of a CSR table and their row."""
+    count = np.diff(start)[groups]
+    items = (np.repeat(start[:-1][groups], count) + np.arange(count.sum()) -
+             np.repeat(_offsets(count)[:-1], count))
+    return index[items], np.repeat(groups, count)
+
+
+def _table(keys, n):
+    """Return the CSR table of the items grouped by key."""
+    order = np.argsort(keys, kind='stable')
+    return _offsets(np.bincount(keys, minlength=n)), order
+
+
+class RiverNetwork(object):
+    """Reaches of a model and their connections in CSR arrays.
+
+    Parameters
+    ----------
+    upstream, downstream : array of int
+        The junction at the upstream and the downstream end of every reach.
+        The reaches ending at a junction flow into the reaches starting at
+        it. Negative values are free ends, they get a junction of their own.
+    names : list of tuple, optional
+        The (river, reach) of every reach.
+    lengths : array of float, optional
+        The length of every reach.
+    nodes : list of sequences, optional
+        The nodes of every reach from upstream to downstream, e.g. their
+        river stations.
+    junction_names : list of str, optional
+        The names of the junctions given in `upstream` and `downstream`.
+
+    Attributes
+    ----------
+    up_start, up_index : ndarray of int
+        The reaches flowing into every reach.
+    down_start, down_index : ndarray of int
+        The reaches every reach flows into.
+    inflow_start, inflow_index : ndarray of int
+        The reaches ending at every junction.
+    outflow_start, outflow_index : ndarray of int
+        The reaches starting at every junction.
+    node_start : ndarray of int
+        The first node of every reach in `node_names`.
+
+    Notes
+    -----
+    The connectivity arrays are not meant to be modified, the topological
+    order and the junction tables are computed once.
+    """
+
+    def __init__(self, upstream, downstream, names=None, lengths=None,
+                 nodes=None, junction_names=None):
+        upstream = np.array(upstream, dtype=np.int64)
+        downstream = np.array(downstream, dtype=np.int64)
+        if upstream.shape != downstream.shape:
+            raise ValueError('upstream and downstream must have equal length')
+        n = upstream.size
+        n_named = max(upstream.max(initial=-1), downstream.max(initial=-1)) + 1
+        if junction_names is not None:
+            n_named = max(n_named, len(junction_names))
+
+        # A junction for every free end
+        free = np.concatenate([upstream, downstream]) < 0
+        ends = np.concatenate([upstream, downstream])
+        ends[free] = n_named + np.arange(free.sum())
+        self.upstream, self.downstream = ends[:n], ends[n:]
+        self.n_junctions = n_named + int(free.sum())
+        self.junction_names = np.empty(self.n_junctions, dtype=object)
+        if junction_names is not None:
+            self.junction_names[:len(junction_names)] = junction_names
+
+        # Reaches ending and starting at every junction
+        self.inflow_start, self.inflow_index = _table(self.downstream,
+                                                      self.n_junctions)
+        self.outflow_start, self.outflow_index = _table(self.upstream,
+                                                        self.n_junctions)
+
+        # Reaches downstream of a reach start at its downstream junction
+        self.down_index, _ = _gather(self.outflow_start, self.outflow_index,
+                                     self.downstream)
+        self.down_start = _offsets(np.diff(self.outflow_start)[
+            self.downstream])
+        self.up_index, _ = _gather(self.inflow_start, self.inflow_index,
+                                   self.upstream)
+        self.up_start = _offsets(np.diff(self.inflow_start)[self.upstream])
+
+        self.names = np.empty(n, dtype=object)
+        if names is not None:
+            self.names[:] = list(names)
+        if lengths is None:
+            self.lengths = np.full(n, np.nan)
+        else:
+            self.lengths = np.array(lengths, dtype=np.float64).reshape(n)
+        if nodes is None:
+            nodes = [()] * n
+        self.node_start = _offsets([len(items) for items in nodes])
+        self.node_names = np.empty(self.node_start[-1], dtype=object)
+        self.node_names[:] = [item for items in nodes for item in items]
+
+        self._keys = None
+        self._level = None
+        self._level_start = None
+        self._order = None
+        self._edges = {}
+        self._junctions = None
+
+    def __len__(self):
+        return self.upstream.size
+
+    def __repr__(self):
+        return '<RiverNetwork {0} reaches {1} junctions>'.format(
+            len(self), self.n_junctions)
+
+    def __getitem__(self, index):
+        n = len(self)
+        if isinstance(index, slice):
+            return [Link(self, i) for i in range(*index.indices(n))]
+        index = int(index)
+        if index < 0:
+            index += n
+        if not 0 <= index < n:
+            raise IndexError('Reach index out of range')
+        return Link(self, index)
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield Link(self, i)
+
+    @staticmethod
+    def from_junctions(junctions, names=None, lengths=None, nodes=None):
+        """Create a network from the reaches joined at every junction.
+
+        Parameters
+        ----------
+        junctions : dict
+            Maps the junction names to a pair of lists, the (river, reach)
+            flowing into the junction and the ones flowing out of it, as in
+            the Junct Name blocks of the geometry files.
+        names : list of tuple, optional
+            All the (river, reach) of the model, by default the ones of the
+            junctions. Reaches that are not at a junction are isolated.
+        lengths, nodes : optional
+            The length and the nodes of every reach of `names`.
+        """
+        if names is None:
+            names = []
+            for inflows, outflows in junctions.values():
+                names += [name for name in list(inflows) + list(outflows)
+                          if name not in names]
+        index = {name: i for i, name in enumerate(names)}
+        upstream = np.full(len(names), -1, dtype=np.int64)
+        downstream = np.full(len(names), -1, dtype=np.int64)
+        junction_names = list(junctions)
+        for j, name in enumerate(junction_names):
+            inflows, outflows = junctions[name]
+            for reach in inflows:
+                downstream[index[tuple(reach)]] = j
+            for reach in outflows:
+                upstream[index[tuple(reach)]] = j
+        return RiverNetwork(upstream, downstream, names, lengths, nodes,
+                            junction_names)
+
+    def find(self, river, reach):
+        """Return the index of a reach."""
+        if self._keys is None:
+            self._keys = {tuple(name): i for i, name in enumerate(self.names)
+                          if name is not None}
+        try:
+            return self._keys[(river, reach)]
+        except KeyError:
+            raise KeyError('Reach not in the network: {0}, {1}'.format(
+                river, reach))
+
+    # --- Topological order
+    # ------------------------------------------------------------------------
+    def _sort(self):
+        """Compute the levels of the reaches, by removing the reaches
+        without inflow from the network until it is empty (Kahn)."""
+        n = len(self)
+        indegree = np.diff(self.up_start)
+        level = np.full(n, -1, dtype=np.int64)
+        frontier = np.nonzero(indegree == 0)[0]
+        k = 0
+        while frontier.size:
+            level[frontier] = k
+            targets, _ = _gather(self.down_start, self.down_index, frontier)
+            indegree = indegree - np.bincount(targets, minlength=n)
+            frontier = np.unique(targets[indegree[targets] == 0])
+            k += 1
+        if (level < 0).any():
+            loop = [self.names[i] for i in np.nonzero(level < 0)[0][:5]]
+            raise ValueError('The river network has a loop through '
+                             '{0}'.format(loop))
+        self._level = level
+        self._order = np.argsort(level, kind='stable')
+        self._level_start = _offsets(np.bincount(level, minlength=k))
+
+    @property
+    def level(self):
+        """The level of every reach in the topological order, the longest
+        chain of reaches upstream of it."""
+        if self._level is None:
+            self._sort()
+        return self._level
+
+    @property
+    def order(self):
+        """The reaches from upstream to downstream, every reach after all
+        the reaches flowing into it."""
+        if self._order is None:
+            self._sort()
+        return self._order
+
+    @property
+    def level_start(self):
+        """The first reach of every level in `order`."""
+        if self._level_start is None:
+            self._sort()
+        return self._level_start
+
+    def _edge_levels(self, direction):
+        """Return the connections (source, target, edge) in the order the
+        sources are visited and the first connection of every level."""
+        if direction not in self._edges:
+            if direction == 'downstream':
+                start, index = self.down_start, self.down_index
+            elif direction == 'upstream':
+                start, index = self.up_start, self.up_index
+            else:
+                raise ValueError('Unknown direction {0}'.format(direction))
+            source = np.repeat(np.arange(len(self)), np.diff(start))
+            level = self.level[source]
+            n_levels = self.level_start.size - 1
+            if direction == 'upstream':
+                level = n_levels - 1 - level
+            edges = np.argsort(level, kind='stable')
+            self._edges[direction] = (
+                source[edges], index[edges], edges,
+                _offsets(np.bincount(level, minlength=n_levels)))
+        return self._edges[direction]
+
+    @property
+    def junctions(self):
+        """Table of the junctions: dict of arrays with the number of
+        'inflows' and 'outflows' of every junction and the 'confluence',
+        'split', 'source' and 'outlet' flags."""
+        if self._junctions is None:
+            inflows = np.diff(self.inflow_start)
+            outflows = np.diff(self.outflow_start)
+            self._junctions = {'name': self.junction_names,
+                               'inflows': inflows,
+                               'outflows': outflows,
+                               'confluence': inflows > 1,
+                               'split': outflows > 1,
+                               'source': inflows == 0,
+                               'outlet': outflows == 0}
+        return self._junctions
+
+    @property
+    def node_order(self):
+        """The nodes of all the reaches from upstream to downstream, as
+        indices of `node_names`."""
+        items, _ = _gather(self.node_start, np.arange(self.node_start[-1]),
+                           self.order)
+        return items
+
+    @property
+    def node_reach(self):
+        """The reach of every node of `node_names`."""
+        return np.repeat(np.arange(len(self)), np.diff(self.node_start))
+
+    # --- Traversals
+    # ------------------------------------------------------------------------
+    def _traverse(self, reaches, start, index, include):
+        """Reaches reached from some reaches along a CSR table."""
+        seen = np.zeros(len(self), dtype=bool)
+        frontier = np.unique(np.atleast_1d(np.asarray(reaches,
+                                                      dtype=np.int64)))
+        if include:
+            seen[frontier] = True
+        while frontier.size:
+            targets, _ = _gather(start, index, frontier)
+            frontier = np.unique(targets[~seen[targets]])
+            seen[frontier] = True
+        order = self.order
+        return order[seen[order]]
+
+    def upstream_of(self, reaches, include=False):
+        """Return all the reaches flowing into some reaches, in topological
+        order."""
+        return self._traverse(reaches, self.up_start, self.up_index, include)
+
+    def downstream_of(self, reaches, include=False):
+        """Return all the reaches some reaches flow into, in topological
+        order."""
+        return self._traverse(reaches, self.down_start, self.down_index,
+                              include)
+
+    # --- Accumulations
+    # ------------------------------------------------------------------------
+    def accumulate(self, values, direction='downstream', ufunc=np.add,
+                   weights=None):
+        """Accumulate values of the reaches along the network.
+
+        The result of a reach is its value plus the combination of the
+        results of the reaches flowing into it (downstream direction) or
+        that it flows into (upstream direction).
+
+        Parameters
+        ----------
+        values : array of float, shape (n,) or (n, k)
+            The values of every reach, e.g. for k profiles.
+        direction : {'downstream', 'upstream'}, optional
+            The direction of the accumulation.
+        ufunc : {np.add, np.maximum, np.minimum}, optional
+            How the results of the connected reaches are combined.
+        weights : array of float, optional
+            A factor for every connection, aligned with `down_index` or
+            `up_index` depending on the direction.
+
+        Returns
+        -------
+        ndarray of float
+            The accumulated values, with the shape of `values`.
+        """
+        if ufunc not in _IDENTITY:
+            raise ValueError('ufunc must be np.add, np.maximum or np.minimum')
+        values = np.asarray(values, dtype=np.float64)
+        if values.shape[:1] != (len(self),):
+            raise ValueError('values must have a row for every reach')
+        source, target, edges, edge_start = self._edge_levels(direction)
+        factor = None
+        if weights is not None:
+            factor = np.asarray(weights, dtype=np.float64)[edges]
+            factor = factor.reshape(factor.shape + (1,) * (values.ndim - 1))
+
+        order, level_start = self.order, self.level_start
+        n_levels = level_start.size - 1
+        total = values.copy()
+        incoming = np.full(values.shape, _IDENTITY[ufunc])
+        reached = np.zeros(len(self), dtype=bool)
+        for k in range(n_levels):
+            if direction == 'downstream':
+                reaches = order[level_start[k]:level_start[k + 1]]
+            else:
+                reaches = order[level_start[n_levels - 1 - k]:
+                                level_start[n_levels - k]]
+            update = reaches[reached[reaches]]
+            total[update] = values[update] + incoming[update]
+            e = slice(edge_start[k], edge_start[k + 1])
+            contribution = total[source[e]]
+            if factor is not None:
+                contribution = contribution * factor[e]
+            ufunc.at(incoming, target[e], contribution)
+            reached[target[e]] = True
+        return total
+
+    def split_fractions(self, weights=None):
+        """Return the fraction of the flow of every connection, aligned
+        with `down_index`.
+
+        Parameters
+        ----------
+        weights : array of float, optional
+            A weight for every reach, the flow arriving at a junction is
+            divided between the reaches starting at it in proportion to
+            their weight. By default it is divided equally.
+        """
+        if weights is None:
+            weights = np.ones(len(self))
+        weights = np.asarray(weights, dtype=np.float64)
+        total = np.bincount(self.upstream, weights=weights,
+                            minlength=self.n_junctions)
+        target = self.down_index
+        with np.errstate(divide='ignore', invalid='ignore'):
+            fraction = weights[target] / total[self.upstream[target]]
+        return np.nan_to_num(fraction)
+
+    def route(self, inflow, split=None):
+        """Route the local inflows of the reaches down the network.
+
+        Parameters
+        ----------
+        inflow : array of float, shape (n,) or (n, k)
+            The flow entering every reach, at its upstream end, from outside
+            the network: upstream boundary flows and lateral inflows.
+        split : array of float, optional
+            The weights of the reaches starting at a flow split, see
+            `split_fractions`.
+
+        Returns
+        -------
+        ndarray of float
+            The flow of every reach.
+        """
+        return self.accumulate(inflow, 'downstream',
+                               weights=self.split_fractions(split))
+
+    def distance_to_outlet(self, lengths=None):
+        """Return the distance from the upstream end of every reach to the
+        nearest outlet of the network."""
+        if lengths is None:
+            lengths = np.nan_to_num(self.lengths)
+        return self.accumulate(lengths, 'upstream', np.minimum)
+
+    def upstream_length(self, lengths=None):
+        """Return the total length of every reach and of the reaches flowing
+        into it. The reaches upstream of a flow split that joins again are
+        counted twice."""
+        if lengths is None:
+            lengths = np.nan_to_num(self.lengths)
+        return self.accumulate(lengths, 'downstream')
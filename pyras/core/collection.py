@@ -0,0 +1,406 @@
+"""
+Cross sections of a whole model stored in contiguous arrays.
+
+The layout is the one of the HEC-RAS Schematic_XSPoints method: the points
+of all the cross sections follow each other in flat station and elevation
+arrays, and an offset table gives where every cross section starts. The
+Manning's n breakpoints are stored the same way and the per section values
+(bank stations, reach lengths, coefficients) in arrays with one row per
+cross section. CrossSection objects taken from a collection are views on
+these arrays, they do not copy the points.
+"""
+import numpy as np
+
+from .htab import HydraulicTable, fingerprint
+from .hydraulics import Subdivision, _offsets
+from ..io.hecras.read_ras import iter_geometry
+
+
+def _join(arrays):
+    """Concatenate a list of arrays, possibly empty."""
+    return np.concatenate(arrays) if arrays else np.empty(0)
+
+
+def _rows(values, n, width, default):
+    """Return per section values as an array of shape (n, width)."""
+    if values is None:
+        return np.tile(np.asarray(default, dtype=np.float64), (n, 1))
+    values = np.array(values, dtype=np.float64).reshape(n, width)
+    return np.where(np.isnan(values), default, values)
+
+
+class CrossSectionCollection(object):
+    """Cross sections of a model in a few contiguous arrays.
+
+    Parameters
+    ----------
+    station, elevation : array of float
+        The points of all the cross sections, one after the other.
+    count : array of int
+        The number of points of every cross section.
+    mann_station, mann_n : array of float, optional
+        The Manning's n values of all the cross sections and the stations
+        where they start.
+    mann_count : array of int, optional
+        The number of Manning's n values of every cross section.
+    banks : array of float, shape (n, 2), optional
+        The left and right bank stations.
+    names : list of str, optional
+        The river stations.
+    locations : list of tuple, optional
+        The (river, reach) of every cross section.
+    lengths : array of float, shape (n, 3), optional
+        The left overbank, channel and right overbank reach lengths to the
+        next cross section downstream.
+    exp_contr : array of float, shape (n, 2), optional
+        The expansion and contraction coefficients, 0.3 and 0.1 by default.
+    units : {'English', 'SI'}, optional
+        The unit system.
+    levees : array of float, shape (n, 2), optional
+        The left and right levee stations, NaN if not set.
+
+    Attributes
+    ----------
+    start : ndarray of int, shape (n + 1,)
+        The first point of every cross section, the last item is the total
+        number of points (XSStartIndex in HEC-RAS).
+    mann_start : ndarray of int, shape (n + 1,)
+        The first Manning's n value of every cross section.
+
+    Notes
+    -----
+    The arrays may be modified in place, but the hydraulic properties
+    computed before are only dropped by the methods of the collection and
+    of its cross sections, call `changed` after editing the arrays directly.
+    Changing the number of points of a cross section copies the arrays that
+    follow it.
+    """
+
+    def __init__(self, station, elevation, count, mann_station=None,
+                 mann_n=None, mann_count=None, banks=None, names=None,
+                 locations=None, lengths=None, exp_contr=None,
+                 units='English', levees=None):
+        self.station = np.array(station, dtype=np.float64)
+        self.elevation = np.array(elevation, dtype=np.float64)
+        count = np.asarray(count, dtype=np.int64)
+        if self.station.shape != self.elevation.shape:
+            raise ValueError('station and elevation must have equal length')
+        if count.sum() != self.station.size:
+            raise ValueError('The point counts do not match the number of '
+                             'points')
+        n = count.size
+        self.start = _offsets(count)
+        if mann_station is None:
+            mann_station, mann_n, mann_count = [], [], np.zeros(n, np.int64)
+        self.mann_station = np.array(mann_station, dtype=np.float64)
+        self.mann_n = np.array(mann_n, dtype=np.float64)
+        self.mann_start = _offsets(np.asarray(mann_count, dtype=np.int64))
+        self.banks = _rows(banks, n, 2, (np.nan, np.nan))
+        self.levees = _rows(levees, n, 2, (np.nan, np.nan))
+        self.lengths = _rows(lengths, n, 3, (np.nan, np.nan, np.nan))
+        self.exp_contr = _rows(exp_contr, n, 2, (0.3, 0.1))
+        self.names = np.empty(n, dtype=object)
+        if names is not None:
+            self.names[:] = names
+        # Locations are stored once, with an index per cross section
+        self.location_names = []
+        self.location_index = np.zeros(n, dtype=np.int32)
+        if locations is None:
+            locations = [None] * n
+        codes = {}
+        for i, location in enumerate(locations):
+            code = codes.get(location)
+            if code is None:
+                code = codes[location] = len(self.location_names)
+                self.location_names.append(location)
+            self.location_index[i] = code
+        self.units = units
+        # Edits bump the version of the edited cross section only
+        self._versions = np.zeros(n, dtype=np.int64)
+        self._keys = None
+        self._subdivision = None
+        self._htab = None
+        self._htab_options = {'n_points': 100, 'increment': None}
+        # HTAB options of the cross sections set with CrossSection.set_htab
+        self._section_htab_options = {}
+
+    def __len__(self):
+        return self.start.size - 1
+
+    def __repr__(self):
+        return '<CrossSectionCollection {0} sections {1} points>'.format(
+            len(self), self.station.size)
+
+    def __getitem__(self, index):
+        from .xsection import CrossSection
+
+        n = len(self)
+        if isinstance(index, slice):
+            return [CrossSection.view(self, i)
+                    for i in range(*index.indices(n))]
+        index = int(index)
+        if index < 0:
+            index += n
+        if not 0 <= index < n:
+            raise IndexError('cross section index out of range')
+        return CrossSection.view(self, index)
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    # Alternate constructors
+    @staticmethod
+    def from_sections(sections, units=None):
+        """Copy the points of CrossSection objects into a collection."""
+        sections = list(sections)
+        if units is None:
+            units = sections[0].units if sections else 'English'
+        return CrossSectionCollection(
+            _join([xs.station for xs in sections]),
+            _join([xs.elevation for xs in sections]),
+            [xs.station.size for xs in sections],
+            _join([xs.mann_station for xs in sections]),
+            _join([xs.mann_n for xs in sections]),
+            [xs.mann_n.size for xs in sections],
+            [xs.banks for xs in sections],
+            [xs.name for xs in sections],
+            [xs.location for xs in sections],
+            [xs.lengths for xs in sections],
+            [xs.exp_contr for xs in sections], units,
+            levees=[xs.levees for xs in sections])
+
+    @staticmethod
+    def from_geometry(filename, units='English'):
+        """Read the cross sections of a geometry file (*.g##).
+
+        Bridges, culverts and other structures are skipped.
+        """
+        columns = dict((key, []) for key in
+                       ('station', 'elevation', 'mann_station', 'mann_n',
+                        'bank_stations', 'levees', 'rs', 'location', 'lengths',
+                        'exp_contr'))
+        for node in iter_geometry(filename):
+            if node['type'] != 1:
+                continue
+            node['location'] = (node['river'], node['reach'])
+            for key, values in columns.items():
+                values.append(node[key])
+        count = [station.size for station in columns['station']]
+        mann_count = [n.size for n in columns['mann_n']]
+        return CrossSectionCollection(
+            _join(columns['station']), _join(columns['elevation']), count,
+            _join(columns['mann_station']), _join(columns['mann_n']),
+            mann_count, columns['bank_stations'] or None, columns['rs'],
+            columns['location'], columns['lengths'] or None,
+            columns['exp_contr'] or None, units,
+            levees=columns['levees'] or None)
+
+    @staticmethod
+    def concatenate(collections):
+        """Join collections, in order."""
+        collections = list(collections)
+        return CrossSectionCollection(
+            _join([c.station for c in collections]),
+            _join([c.elevation for c in collections]),
+            _join([c.count for c in collections]),
+            _join([c.mann_station for c in collections]),
+            _join([c.mann_n for c in collections]),
+            _join([c.mann_count for c in collections]),
+            _join([c.banks.ravel() for c in collections]),
+            _join([c.names for c in collections]),
+            [c.location(i) for c in collections for i in range(len(c))],
+            _join([c.lengths.ravel() for c in collections]),
+            _join([c.exp_contr.ravel() for c in collections]),
+            collections[0].units if collections else 'English',
+            levees=_join([c.levees.ravel() for c in collections]))
+
+    def take(self, indices):
+        """Return a new collection with some cross sections, in the order of
+        `indices`."""
+        indices = np.asarray(indices, dtype=np.int64)
+
+        def gather(start, arrays):
+            count = np.diff(start)[indices]
+            points = (np.repeat(start[:-1][indices], count) +
+                      np.arange(count.sum()) -
+                      np.repeat(_offsets(count)[:-1], count))
+            return [count] + [array[points] for array in arrays]
+
+        count, station, elevation = gather(self.start, (self.station,
+                                                        self.elevation))
+        mann_count, mann_station, mann_n = gather(
+            self.mann_start, (self.mann_station, self.mann_n))
+        return CrossSectionCollection(
+            station, elevation, count, mann_station, mann_n, mann_count,
+            self.banks[indices], self.names[indices],
+            [self.location(i) for i in indices], self.lengths[indices],
+            self.exp_contr[indices], self.units, levees=self.levees[indices])
+
+    def node(self, index):
+        """Return a cross section as a node record of
+        read_ras.iter_geometry, e.g. to write it to a geometry file."""
+        river, reach = self.location(index) or (None, None)
+        points = slice(self.start[index], self.start[index + 1])
+        mann = slice(self.mann_start[index], self.mann_start[index + 1])
+        return {'river': river,
+                'reach': reach,
+                'rs': self.names[index],
+                'type': 1,
+                'lengths': self.lengths[index].copy(),
+                'description': '',
+                'cut_line': np.empty((0, 2), dtype=np.float64),
+                'station': self.station[points].copy(),
+                'elevation': self.elevation[points].copy(),
+                'mann_station': self.mann_station[mann].copy(),
+                'mann_n': self.mann_n[mann].copy(),
+                'bank_stations': self.banks[index].copy(),
+                'levees': self.levees[index].copy(),
+                'exp_contr': self.exp_contr[index].copy()}
+
+    # Layout
+    @property
+    def count(self):
+        """The number of points of every cross section (XSPointCount)."""
+        return np.diff(self.start)
+
+    @property
+    def mann_count(self):
+        """The number of Manning's n values of every cross section."""
+        return np.diff(self.mann_start)
+
+    @property
+    def nbytes(self):
+        """The memory used by the arrays, in bytes."""
+        arrays = (self.station, self.elevation, self.start,
+                  self.mann_station, self.mann_n, self.mann_start, self.banks,
+                  self.levees, self.lengths, self.exp_contr, self.names,
+                  self.location_index)
+        return sum(array.nbytes for array in arrays)
+
+    def location(self, index):
+        """The (river, reach) of a cross section."""
+        return self.location_names[self.location_index[index]]
+
+    def find(self, river, reach, rs):
+        """Return the index of a cross section given its location.
+
+        Raises
+        ------
+        KeyError
+            If there is no such cross section.
+        """
+        if self._keys is None:
+            self._keys = dict(
+                ((self.location(i), self.names[i]), i)
+                for i in range(len(self)))
+        return self._keys[((river, reach), rs)]
+
+    @property
+    def thalweg(self):
+        """The lowest elevation of every cross section, NaN if empty."""
+        result = np.full(len(self), np.nan)
+        count = self.count
+        has_points = count > 0
+        if self.elevation.size:
+            result[has_points] = np.minimum.reduceat(
+                self.elevation, self.start[:-1][has_points])
+        return result
+
+    # Edition
+    @staticmethod
+    def _replace(array, starts, index, values):
+        """Replace the slice of a group of a flat array."""
+        return np.concatenate([array[:starts[index]], values,
+                               array[starts[index + 1]:]])
+
+    def set_points(self, index, station, elevation):
+        """Replace the points of a cross section."""
+        station = np.asarray(station, dtype=np.float64)
+        elevation = np.asarray(elevation, dtype=np.float64)
+        if station.shape != elevation.shape:
+            raise ValueError('station and elevation must have equal length')
+        start = self.start
+        if station.size == start[index + 1] - start[index]:
+            self.station[start[index]:start[index + 1]] = station
+            self.elevation[start[index]:start[index + 1]] = elevation
+        else:
+            self.station = self._replace(self.station, start, index, station)
+            self.elevation = self._replace(self.elevation, start, index,
+                                           elevation)
+            self.start[index + 1:] += (station.size -
+                                       (start[index + 1] - start[index]))
+        self.changed(index)
+
+    def set_mann(self, index, mann_n, mann_station):
+        """Replace the Manning's n values of a cross section."""
+        mann_n = np.asarray(mann_n, dtype=np.float64)
+        mann_station = np.asarray(mann_station, dtype=np.float64)
+        start = self.mann_start
+        if mann_n.size == start[index + 1] - start[index]:
+            self.mann_n[start[index]:start[index + 1]] = mann_n
+            self.mann_station[start[index]:start[index + 1]] = mann_station
+        else:
+            self.mann_n = self._replace(self.mann_n, start, index, mann_n)
+            self.mann_station = self._replace(self.mann_station, start,
+                                              index, mann_station)
+            self.mann_start[index + 1:] += (mann_n.size -
+                                            (start[index + 1] - start[index]))
+        self.changed(index)
+
+    def changed(self, index=None):
+        """Drop the hydraulic properties after a change of the arrays.
+
+        Parameters
+        ----------
+        index : int, optional
+            The edited cross section, all of them by default.
+        """
+        if index is None:
+            self._versions += 1
+        else:
+            self._versions[index] += 1
+        self._keys = None
+        self._subdivision = None
+        self._htab = None
+
+    # Hydraulic properties
+    def subdivision(self):
+        """Return the conveyance subdivision of all the cross sections."""
+        if self._subdivision is None:
+            self._subdivision = Subdivision(
+                self.station, self.elevation, self.count, self.mann_station,
+                self.mann_n, self.mann_count, self.banks, self.units)
+        return self._subdivision
+
+    def fingerprint(self):
+        """Return a digest of the geometry, the Manning's n values and the
+        HTAB options."""
+        options = self._htab_options
+        return fingerprint(self.station, self.elevation, self.start,
+                           self.mann_station, self.mann_n, self.mann_start,
+                           self.banks,
+                           np.array([options['n_points'],
+                                     options['increment'] or 0.0]),
+                           np.array(self.units))
+
+    @property
+    def htab(self):
+        """The hydraulic property tables of all the cross sections, see
+        CrossSection.htab."""
+        if self._htab is None:
+            self._htab = HydraulicTable.build(
+                self.subdivision(), fingerprint=self.fingerprint(),
+                **self._htab_options)
+        return self._htab
+
+    def set_htab(self, n_points=100, increment=None):
+        """Set the elevations of the hydraulic property tables, see
+        CrossSection.set_htab."""
+        self._htab_options = {'n_points': n_points, 'increment': increment}
+        self._htab = None
+
+    def htab_options(self, index):
+        """The HTAB options of a cross section, those of the collection
+        unless set with CrossSection.set_htab."""
+        return self._section_htab_options.get(index, self._htab_options)
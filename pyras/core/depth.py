@@ -0,0 +1,228 @@
+"""
+Batch normal depth and critical depth of many cross sections and flows.
+
+The equations are solved for all the (cross section, flow) pairs at once with
+a safeguarded Newton method: every pair keeps a bracket of its root, Newton
+steps leaving the bracket are replaced by bisection steps and the pairs that
+converged are dropped from the next iterations. Hydraulic properties come
+from the HTAB of the cross sections.
+
+The tables stop at the top of the cross sections. Above it the properties
+are extrapolated from the last interval of the table, which is not the
+hydraulics of the cross section, so the pairs whose water surface is above
+the table are reported as not converged, with the extrapolated elevation.
+Raise the ends of the cross sections to solve them.
+"""
+import numpy as np
+
+from .htab import HydraulicTable
+from .hydraulics import GRAVITY
+
+
+def _table(sections):
+    """Return the joined HTAB of a list of cross sections."""
+    if isinstance(sections, HydraulicTable):
+        return sections
+    if hasattr(sections, 'htab') and not isinstance(sections, (list, tuple)):
+        # A CrossSectionCollection or a single CrossSection
+        return sections.htab
+    return HydraulicTable.concatenate([section.htab for section in sections])
+
+
+def _pairs(table, flow, *values):
+    """Broadcast flows and per section values to (n_sections, n_flows)."""
+    n_sections = len(table)
+    flow = np.asarray(flow, dtype=np.float64)
+    if flow.ndim < 2:
+        flow = np.broadcast_to(flow.reshape(1, -1), (n_sections, flow.size))
+    shape = flow.shape
+    if shape[0] != n_sections:
+        raise ValueError('The flow matrix must have one row per section')
+    result = [flow]
+    for value in values:
+        value = np.asarray(value, dtype=np.float64)
+        if value.ndim == 1 and value.size == n_sections:
+            value = value[:, None]
+        result.append(np.broadcast_to(value, shape))
+    return result
+
+
+def _solve(residual, low, high, tol, max_iter, expand):
+    """Find the roots of increasing functions of the elevation.
+
+    Parameters
+    ----------
+    residual : callable
+        Called as residual(z, index) for the pairs `index`, returns the
+        residual and its derivative.
+    low, high : array of float
+        The initial brackets, the residual must be negative at `low`.
+    tol : float
+        The elevation tolerance.
+    max_iter : int
+        The maximum number of iterations.
+    expand : int
+        How many times the top of a bracket may be raised when the residual
+        is still negative there.
+
+    Returns
+    -------
+    z : array of float
+        The roots.
+    converged : array of bool
+        The pairs that converged. The pairs whose bracket had to be raised
+        above `high` are not converged, their root is extrapolated.
+    """
+    low = low.copy()
+    high = high.copy()
+    active = np.arange(low.size)
+    above = np.zeros(low.size, dtype=bool)
+
+    # Raise the top of the brackets not containing the root
+    for _ in range(expand):
+        f, _ = residual(high[active], active)
+        below = f < 0
+        if not below.any():
+            break
+        index = active[below]
+        above[index] = True
+        height = high[index] - low[index]
+        low[index] = high[index]
+        high[index] = high[index] + 2 * height
+        active = index
+
+    z = 0.5 * (low + high)
+    converged = np.zeros(low.size, dtype=bool)
+    active = np.arange(low.size)
+    for _ in range(max_iter):
+        if not active.size:
+            break
+        za = z[active]
+        f, df = residual(za, active)
+        negative = f < 0
+        low[active] = np.where(negative, za, low[active])
+        high[active] = np.where(negative, high[active], za)
+        lo, hi = low[active], high[active]
+
+        # Newton step, bisection if it leaves the bracket
+        with np.errstate(divide='ignore', invalid='ignore'):
+            step = za - f / df
+        inside = (df > 0) & (step > lo) & (step < hi)
+        new = np.where(inside, step, 0.5 * (lo + hi))
+        new = np.where(f == 0, za, new)
+        z[active] = new
+
+        done = (np.abs(new - za) < tol) | (f == 0) | (hi - lo < tol)
+        converged[active[done]] = True
+        active = active[~done]
+
+    return z, converged & ~above
+
+
+def normal_depth(sections, slope, flow, tol=1e-4, max_iter=50):
+    """Solve Manning's equation for the water surface of many sections.
+
+    Parameters
+    ----------
+    sections : list of CrossSection, CrossSectionCollection or HydraulicTable
+        The cross sections.
+    slope : float or array of float
+        The energy slope, a scalar, one per section or one per flow.
+    flow : array of float, shape (n_sections, n_flows) or (n_flows,)
+        The flows, a 1D array is used for all the sections.
+    tol : float, optional
+        The water surface elevation tolerance.
+    max_iter : int, optional
+        The maximum number of iterations.
+
+    Returns
+    -------
+    wse : ndarray, shape (n_sections, n_flows)
+        The normal water surface elevations.
+    converged : ndarray of bool, shape (n_sections, n_flows)
+        The pairs that converged, the others hold the last iterate. The
+        pairs above the top of the HTAB are not converged.
+    """
+    table = _table(sections)
+    flow, slope = _pairs(table, flow, slope)
+    shape = flow.shape
+    sections = np.repeat(np.arange(len(table)), shape[1])
+    # Target conveyance Q / sqrt(S)
+    target = (flow / np.sqrt(slope)).ravel()
+
+    def residual(z, index):
+        s = sections[index]
+        k = table.interpolate('conveyance', z, s)
+        return k - target[index], table.gradient('conveyance', z, s)
+
+    low = table.start[sections]
+    high = low + table.increment[sections] * (table.n_points - 1)
+    wse, converged = _solve(residual, low, high, tol, max_iter, 10)
+    wse = wse.reshape(shape)
+    converged = converged.reshape(shape)
+    dry = flow <= 0
+    wse[dry] = table.start[np.nonzero(dry)[0]]
+    converged[dry] = True
+    return wse, converged
+
+
+def critical_depth(sections, flow, tol=1e-4, max_iter=50):
+    """Find the critical water surface of many sections and flows.
+
+    The critical water surface is where the Froude number, including the
+    velocity coefficient alpha, is 1: alpha Q^2 T / (g A^3) = 1.
+
+    Parameters
+    ----------
+    sections : list of CrossSection, CrossSectionCollection or HydraulicTable
+        The cross sections.
+    flow : array of float, shape (n_sections, n_flows) or (n_flows,)
+        The flows, a 1D array is used for all the sections.
+    tol : float, optional
+        The water surface elevation tolerance.
+    max_iter : int, optional
+        The maximum number of iterations.
+
+    Returns
+    -------
+    wse : ndarray, shape (n_sections, n_flows)
+        The critical water surface elevations.
+    converged : ndarray of bool, shape (n_sections, n_flows)
+        The pairs that converged, not the pairs above the top of the HTAB.
+
+    Notes
+    -----
+    Compound sections can have several critical depths, the one found
+    depends on the initial bracket (thalweg to top of the section). HEC-RAS
+    searches the minimum of the specific energy instead.
+    """
+    table = _table(sections)
+    (flow,) = _pairs(table, flow)
+    shape = flow.shape
+    sections = np.repeat(np.arange(len(table)), shape[1])
+    q2g = (flow ** 2).ravel() / GRAVITY[table.units]
+
+    def residual(z, index):
+        # 1 - Fr^2 increases with the elevation
+        s = sections[index]
+        values = table.lookup(z, s, names=('area', 'top_width', 'alpha'))
+        area, width = values['area'], values['top_width']
+        dwidth = table.gradient('top_width', z, s)
+        factor = values['alpha'] * q2g[index]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            froude2 = factor * width / area ** 3
+            dfroude2 = factor * (dwidth / area ** 3 -
+                                 3 * width ** 2 / area ** 4)
+        wet = area > 0
+        return (np.where(wet, 1.0 - froude2, -np.inf),
+                np.where(wet, -dfroude2, 0.0))
+
+    low = table.start[sections]
+    high = low + table.increment[sections] * (table.n_points - 1)
+    wse, converged = _solve(residual, low, high, tol, max_iter, 10)
+    wse = wse.reshape(shape)
+    converged = converged.reshape(shape)
+    dry = flow <= 0
+    wse[dry] = table.start[np.nonzero(dry)[0]]
+    converged[dry] = True
+    return wse, converged
@@ -0,0 +1,262 @@
+"""
+Precomputed hydraulic property tables (HTAB) of cross sections.
+
+As in HEC-RAS, the properties of a cross section are computed once at a
+regular series of elevations and interpolated afterwards, which is much
+faster than intersecting the geometry at every iteration of a solver. Tables
+are keyed by a fingerprint of the geometry they were built from, so a table
+saved to disk is only reused while the geometry and the Manning's n values
+do not change.
+"""
+import hashlib
+
+import numpy as np
+
+
+_TABLES = ('area', 'perimeter', 'top_width', 'conveyance', 'alpha')
+
+
+def fingerprint(*arrays):
+    """Return a hex digest identifying the content of arrays and values."""
+    sha = hashlib.sha1()
+    for value in arrays:
+        value = np.ascontiguousarray(value)
+        sha.update(value.dtype.str.encode('ascii'))
+        sha.update(str(value.shape).encode('ascii'))
+        sha.update(value.tobytes())
+    return sha.hexdigest()
+
+
+class HydraulicTable(object):
+    """Hydraulic property tables of one or many cross sections.
+
+    Parameters
+    ----------
+    start : array of float, shape (n,)
+        The first elevation of the table of every cross section, the
+        thalweg.
+    increment : array of float, shape (n,)
+        The elevation increment of the table of every cross section.
+    tables : dict
+        Maps 'area', 'perimeter', 'top_width', 'conveyance' and 'alpha' to
+        arrays of shape (n, n_points).
+    fingerprint : str, optional
+        Identifies the geometry the tables were built from.
+    units : {'English', 'SI'}, optional
+        The unit system of the cross sections.
+
+    Notes
+    -----
+    Elevations below the start of a table are dry. Above the last elevation
+    the ends of the cross section are extended vertically: the top width and
+    the perimeter are constant and the conveyance is extrapolated linearly,
+    a rough estimate. Build the tables up to the highest expected water
+    surface to avoid it.
+    """
+
+    def __init__(self, start, increment, tables, fingerprint=None,
+                 units='English'):
+        self.start = np.asarray(start, dtype=np.float64)
+        self.increment = np.asarray(increment, dtype=np.float64)
+        self.tables = dict((name, np.asarray(tables[name],
+                                             dtype=np.float64))
+                           for name in _TABLES)
+        self.fingerprint = fingerprint
+        self.units = units
+
+    def __len__(self):
+        return self.start.size
+
+    @property
+    def n_points(self):
+        """The number of elevations of the tables."""
+        return self.tables['area'].shape[1]
+
+    @property
+    def elevation(self):
+        """The elevations of the tables, shape (n, n_points)."""
+        return (self.start[:, None] +
+                self.increment[:, None] * np.arange(self.n_points))
+
+    @staticmethod
+    def build(subdivision, n_points=100, increment=None, fingerprint=None):
+        """Compute the tables of the cross sections of a subdivision.
+
+        Parameters
+        ----------
+        subdivision : hydraulics.Subdivision
+            The cross sections.
+        n_points : int, optional
+            The number of elevations of the tables, from the thalweg to the
+            highest point of every cross section.
+        increment : float, optional
+            A fixed elevation increment instead. The tables then have as many
+            points as needed by the deepest cross section.
+        fingerprint : str, optional
+            Identifies the geometry, see `fingerprint`.
+
+        Returns
+        -------
+        HydraulicTable
+        """
+        start = subdivision.thalweg
+        height = np.nan_to_num(subdivision.top - start)
+        if increment is None:
+            n_points = max(int(n_points), 2)
+            step = np.maximum(height / (n_points - 1), 1e-3)
+        else:
+            step = np.full(start.size, float(increment))
+            n_points = max(int(np.ceil(height.max(initial=0.0) /
+                                       increment)) + 1, 2)
+        # The first elevation is nudged up so the tables hold the limit of
+        # the properties above the thalweg (a flat bottom has a top width)
+        offsets = np.arange(n_points, dtype=np.float64)
+        offsets[0] = 1e-6
+        wse = start[:, None] + step[:, None] * offsets
+        values = subdivision.properties(wse)
+        tables = dict((name, values[name].sum(axis=1)) for name in
+                      ('area', 'perimeter', 'top_width', 'conveyance'))
+        tables['alpha'] = values['alpha']
+        return HydraulicTable(start, step, tables, fingerprint,
+                              subdivision.units)
+
+    @staticmethod
+    def concatenate(tables):
+        """Join the tables of several cross sections into one.
+
+        Tables with fewer elevations are extended as above the last
+        elevation, see the notes of HydraulicTable.
+        """
+        tables = list(tables)
+        n_points = max(table.n_points for table in tables)
+        units = set(table.units for table in tables)
+        if len(units) > 1:
+            raise ValueError('Tables with different unit systems')
+        joined = {}
+        for name in _TABLES:
+            parts = []
+            for table in tables:
+                values = table.tables[name]
+                extra = n_points - table.n_points
+                if extra:
+                    steps = np.arange(1, extra + 1)
+                    last = values[:, -1:]
+                    if name == 'area':
+                        width = table.tables['top_width'][:, -1:]
+                        pad = last + width * table.increment[:, None] * steps
+                    elif name == 'conveyance':
+                        pad = last + (last - values[:, -2:-1]) * steps
+                    else:
+                        pad = np.repeat(last, extra, axis=1)
+                    values = np.hstack([values, pad])
+                parts.append(values)
+            joined[name] = np.vstack(parts)
+        start = np.concatenate([table.start for table in tables])
+        increment = np.concatenate([table.increment for table in tables])
+        return HydraulicTable(start, increment, joined, None, units.pop())
+
+    def _position(self, z, sections):
+        """Return the section, interval index and fraction of elevations."""
+        z = np.asarray(z, dtype=np.float64)
+        if sections is None:
+            if len(self) != 1:
+                raise ValueError('Give the sections of the elevations')
+            sections = np.zeros(z.shape, dtype=np.int64)
+        sections, z = np.broadcast_arrays(np.asarray(sections), z)
+        position = (z - self.start[sections]) / self.increment[sections]
+        index = np.clip(np.floor(position).astype(np.int64), 0,
+                        self.n_points - 2)
+        return sections, z, index, position - index, position <= 0
+
+    def interpolate(self, name, z, sections=None):
+        """Interpolate one table at water surface elevations.
+
+        Parameters
+        ----------
+        name : str
+            'area', 'perimeter', 'top_width', 'conveyance' or 'alpha'.
+        z : array of float
+            The water surface elevations.
+        sections : array of int, optional
+            The index of the cross section of every elevation, broadcast
+            against `z`. Not needed for the table of a single section.
+
+        Returns
+        -------
+        ndarray
+            With the broadcast shape of `z` and `sections`.
+        """
+        return self.lookup(z, sections, names=[name])[name]
+
+    def gradient(self, name, z, sections=None):
+        """Return the derivative of a table with respect to the elevation.
+
+        It is the slope of the interpolation interval of every elevation,
+        0 where dry and above the tables, except for the conveyance which is
+        extrapolated linearly. The derivative of the area is the top width.
+        """
+        if name == 'area':
+            return self.interpolate('top_width', z, sections)
+        sections, z, index, fraction, dry = self._position(z, sections)
+        table = self.tables[name]
+        slope = ((table[sections, index + 1] - table[sections, index]) /
+                 self.increment[sections])
+        if name != 'conveyance':
+            slope = np.where(fraction > 1, 0.0, slope)
+        return np.where(dry, 0.0, slope)
+
+    def lookup(self, z, sections=None, names=_TABLES):
+        """Interpolate several tables at water surface elevations.
+
+        The area is integrated from the interpolated top width, which is
+        exact for a piecewise linear top width. The other tables are
+        interpolated linearly.
+
+        Returns
+        -------
+        dict
+            Maps the names to arrays, see `interpolate`.
+        """
+        sections, z, index, fraction, dry = self._position(z, sections)
+        # Above the table the ends of the section are vertical walls: the
+        # top width and the perimeter do not change any more
+        clamped = np.minimum(fraction, 1.0)
+        result = {}
+        for name in names:
+            table = self.tables[name]
+            low = table[sections, index]
+            high = table[sections, index + 1]
+            step = fraction if name == 'conveyance' else clamped
+            result[name] = low + step * (high - low)
+
+        if 'area' in names:
+            width = self.tables['top_width']
+            low = width[sections, index]
+            top = low + clamped * (width[sections, index + 1] - low)
+            increment = self.increment[sections]
+            area = self.tables['area'][sections, index]
+            result['area'] = (area + 0.5 * (low + top) * clamped * increment +
+                              top * (fraction - clamped) * increment)
+
+        for name in names:
+            if name == 'alpha':
+                result[name] = np.where(dry, 1.0, result[name])
+            else:
+                result[name] = np.where(dry, 0.0, result[name])
+        return result
+
+    def save(self, filename):
+        """Save the tables to a file."""
+        with open(filename, 'wb') as f:
+            np.savez(f, start=self.start, increment=self.increment,
+                     fingerprint=np.array(self.fingerprint or ''),
+                     units=np.array(self.units), **self.tables)
+
+    @staticmethod
+    def load(filename):
+        """Load tables saved with `save`."""
+        with np.load(filename, allow_pickle=False) as data:
+            tables = dict((name, data[name]) for name in _TABLES)
+            return HydraulicTable(data['start'], data['increment'], tables,
+                                  str(data['fingerprint']) or None,
+                                  str(data['units']))
@@ -0,0 +1,338 @@
+"""
+Vectorized hydraulic properties of cross sections.
+
+The station/elevation polylines of one or many cross sections are split at
+the Manning's n breakpoints and the bank stations, so every segment belongs
+to a single conveyance subsection. The wetted area, perimeter and top width
+of the segments are piecewise polynomials of the water surface elevation,
+their coefficients are accumulated by subsection so the properties at any
+number of elevations are found with binary searches, without looping over
+the segments.
+
+As in HEC-RAS the overbanks are subdivided at every Manning's n breakpoint
+and the main channel is a single subsection, with a composite n if it has
+several values.
+"""
+import numpy as np
+
+
+# Manning's equation constant
+MANNING_CONSTANT = {'English': 1.486, 'SI': 1.0}
+
+# Acceleration of gravity
+GRAVITY = {'English': 32.174, 'SI': 9.80665}
+
+# Subsections of a cross section
+LOB, CHANNEL, ROB = 0, 1, 2
+
+# Maximum number of subsection x elevation values computed at once
+_BLOCK_SIZE = 1 << 19
+
+
+def _offsets(counts):
+    """Return the start of every group of a list of group sizes."""
+    starts = np.zeros(len(counts) + 1, dtype=np.int64)
+    np.cumsum(counts, out=starts[1:])
+    return starts
+
+
+def _section_coordinate(station, section, first, span_base):
+    """Map the stations of many sections to a single increasing axis."""
+    return station - first[section] + span_base[section]
+
+
+class Subdivision(object):
+    """Segments and conveyance subsections of a set of cross sections.
+
+    Parameters
+    ----------
+    station, elevation : array of float
+        The points of all the cross sections, one after the other.
+    count : array of int
+        The number of points of every cross section.
+    mann_station, mann_n : array of float
+        The Manning's n breakpoints of all the cross sections.
+    mann_count : array of int
+        The number of Manning's n breakpoints of every cross section.
+    banks : array of float, shape (n, 2)
+        The left and right bank stations, NaN if not set.
+    units : {'English', 'SI'}, optional
+        The unit system, sets the constant of Manning's equation.
+
+    Notes
+    -----
+    The stations of a cross section must be non decreasing, as required by
+    HEC-RAS. Repeated stations (vertical walls) are supported.
+    """
+
+    def __init__(self, station, elevation, count, mann_station, mann_n,
+                 mann_count, banks, units='English'):
+        station = np.asarray(station, dtype=np.float64)
+        elevation = np.asarray(elevation, dtype=np.float64)
+        count = np.asarray(count, dtype=np.int64)
+        mann_station = np.asarray(mann_station, dtype=np.float64)
+        mann_n = np.asarray(mann_n, dtype=np.float64)
+        mann_count = np.asarray(mann_count, dtype=np.int64)
+        banks = np.asarray(banks, dtype=np.float64).reshape(-1, 2)
+
+        self.units = units
+        self.n_sections = n_sections = count.size
+        start = _offsets(count)[:-1]
+        section = np.repeat(np.arange(n_sections), count)
+
+        # Stations of every section on a common increasing axis, with a gap
+        # of one between sections
+        has_points = count > 0
+        first = np.zeros(n_sections)
+        end = np.zeros(n_sections)
+        first[has_points] = station[start[has_points]]
+        end[has_points] = station[start[has_points] + count[has_points] - 1]
+        span_base = _offsets(end - first + 1.0)[:-1].astype(np.float64)
+        coord = _section_coordinate(station, section, first, span_base)
+        self.thalweg = np.full(n_sections, np.nan)
+        self.top = np.full(n_sections, np.nan)
+        if station.size:
+            self.thalweg[has_points] = np.minimum.reduceat(
+                elevation, start[has_points])
+            self.top[has_points] = np.maximum.reduceat(
+                elevation, start[has_points])
+
+        # Breakpoints to insert: Manning's n stations and bank stations
+        mann_section = np.repeat(np.arange(n_sections), mann_count)
+        left = banks[:, 0]
+        right = banks[:, 1]
+        bp_station = np.concatenate([mann_station, left, right])
+        bp_section = np.concatenate([mann_section, np.arange(n_sections),
+                                     np.arange(n_sections)])
+        valid = (np.isfinite(bp_station) & (bp_station > first[bp_section]) &
+                 (bp_station < end[bp_section]))
+        bp_coord = np.unique(_section_coordinate(
+            bp_station[valid], bp_section[valid], first, span_base))
+        if coord.size and bp_coord.size:
+            i = np.searchsorted(coord, bp_coord, side='left')
+            bp_coord = bp_coord[coord[np.minimum(i, coord.size - 1)] !=
+                                bp_coord]
+        if bp_coord.size:
+            i = np.searchsorted(coord, bp_coord, side='right') - 1
+            ratio = (bp_coord - coord[i]) / (coord[i + 1] - coord[i])
+            bp_elevation = elevation[i] + ratio * (elevation[i + 1] -
+                                                   elevation[i])
+            bp_section = section[i]
+            bp_station = station[i] + (bp_coord - coord[i])
+            order = np.argsort(np.concatenate([coord, bp_coord]),
+                               kind='mergesort')
+            coord = np.concatenate([coord, bp_coord])[order]
+            station = np.concatenate([station, bp_station])[order]
+            elevation = np.concatenate([elevation, bp_elevation])[order]
+            section = np.concatenate([section, bp_section])[order]
+
+        # Segments between consecutive points of the same section
+        i = np.nonzero(section[:-1] == section[1:])[0]
+        self.x0, self.x1 = station[i], station[i + 1]
+        self.z0, self.z1 = elevation[i], elevation[i + 1]
+        self.section = seg_section = section[i]
+        self.segment_start = _offsets(np.bincount(seg_section,
+                                                  minlength=n_sections))
+        middle = 0.5 * (coord[i] + coord[i + 1])
+        mid_station = 0.5 * (self.x0 + self.x1)
+
+        # Manning's n region of every segment, the first value applies before
+        # the first breakpoint
+        mann_first = _offsets(mann_count)[:-1]
+        if mann_n.size:
+            mann_coord = _section_coordinate(
+                np.clip(mann_station, first[mann_section],
+                        end[mann_section]), mann_section, first, span_base)
+            region = np.searchsorted(mann_coord, middle, side='right') - 1
+            outside = ((region < 0) |
+                       (mann_section[np.maximum(region, 0)] != seg_section))
+            region = np.where(outside, mann_first[seg_section], region)
+            no_n = mann_count[seg_section] == 0
+            region = np.where(no_n, -1, region)
+            n = np.where(no_n, np.nan, mann_n[np.maximum(region, 0)])
+        else:
+            region = np.full(seg_section.size, -1, dtype=np.int64)
+            n = np.full(seg_section.size, np.nan)
+        self.n = n
+
+        # Subsection of every segment
+        left = np.where(np.isnan(left), -np.inf, left)
+        right = np.where(np.isnan(right), np.inf, right)
+        kind = np.full(seg_section.size, CHANNEL, dtype=np.int8)
+        kind[mid_station < left[seg_section]] = LOB
+        kind[mid_station > right[seg_section]] = ROB
+        self.kind = kind
+
+        new = np.ones(seg_section.size, dtype=bool)
+        if seg_section.size:
+            new[1:] = ((seg_section[1:] != seg_section[:-1]) |
+                       (kind[1:] != kind[:-1]) |
+                       ((kind[1:] != CHANNEL) & (region[1:] != region[:-1])))
+        self.sub_start = np.nonzero(new)[0]
+        self.sub_section = seg_section[self.sub_start]
+        self.sub_kind = kind[self.sub_start]
+        self.sub_offsets = _offsets(np.bincount(self.sub_section,
+                                                minlength=n_sections))
+
+        self._build_events()
+
+    def _build_events(self):
+        """Tabulate where every segment starts to get wet and is submerged.
+
+        Below its low end a segment is dry, between its ends the wetted
+        area, perimeter and top width are polynomials of the water surface
+        elevation and above its high end they are linear. The coefficients
+        of these polynomials are added at the elevation where they start to
+        apply, sorted by subsection and elevation, and accumulated. The
+        properties of a subsection at any elevation are then the accumulated
+        coefficients of the events below it, found with a binary search.
+        """
+        n_segments = self.section.size
+        thalweg = self.thalweg[self.section]
+        zlo = np.minimum(self.z0, self.z1) - thalweg
+        zhi = np.maximum(self.z0, self.z1) - thalweg
+        dx = self.x1 - self.x0
+        dz = zhi - zlo
+        length = np.hypot(dx, dz)
+        n15 = self.n ** 1.5
+        self._no_n = np.logical_or.reduceat(np.isnan(n15), self.sub_start) \
+            if n_segments else np.zeros(0, dtype=bool)
+        n15 = np.where(np.isnan(n15), 0.0, n15)
+        sloped = dz > 0
+        inverse = np.where(sloped, 1.0 / np.where(sloped, dz, 1.0), 0.0)
+
+        # (area, perimeter, top width, perimeter n^1.5) x (z^2, z, 1)
+        full = np.zeros((n_segments, 4, 3))
+        full[:, 0, 1] = dx
+        full[:, 0, 2] = -dx * 0.5 * (zlo + zhi)
+        full[:, 1, 2] = length
+        full[:, 2, 2] = dx
+        full[:, 3, 2] = length * n15
+        partial = np.zeros((n_segments, 4, 3))
+        a = 0.5 * dx * inverse
+        partial[:, 0, 0] = a
+        partial[:, 0, 1] = -2.0 * a * zlo
+        partial[:, 0, 2] = a * zlo ** 2
+        for q, factor in ((1, length * inverse), (2, dx * inverse)):
+            partial[:, q, 1] = factor
+            partial[:, q, 2] = -factor * zlo
+        partial[:, 3] = partial[:, 1] * n15[:, None]
+
+        sub = np.repeat(np.arange(self.sub_start.size),
+                        np.diff(np.append(self.sub_start, n_segments)))
+        event_sub = np.concatenate([sub[sloped], sub])
+        event_z = np.concatenate([zlo[sloped], zhi])
+        coefficients = np.concatenate([partial[sloped], full - partial])
+        z_range = float(event_z.max()) + 1.0 if event_z.size else 1.0
+        order = np.argsort(event_sub * z_range + event_z, kind='stable')
+        self._event_sub = event_sub[order]
+        self._event_z = event_z[order]
+        self._event_offsets = _offsets(np.bincount(
+            self._event_sub, minlength=self.sub_start.size))
+        cumulative = np.zeros((order.size + 1, 12))
+        np.cumsum(coefficients[order].reshape(-1, 12), axis=0,
+                  out=cumulative[1:])
+        self._cumulative = cumulative
+        self._z_range = z_range
+
+    def _subsection_values(self, u0, u1, wse):
+        """Return the wetted area, perimeter, top width and P n^1.5 of the
+        subsections u0 to u1 at local water surface elevations of shape
+        (subsections, k)."""
+        e0, e1 = self._event_offsets[u0], self._event_offsets[u1]
+        relative = np.arange(u1 - u0)[:, None]
+        z_range = self._z_range
+        keys = (self._event_sub[e0:e1] - u0) * z_range + self._event_z[e0:e1]
+        # Keep the searched elevations within the range of the subsection
+        z = np.clip(wse, 0.0, z_range - 0.5)
+        index = np.searchsorted(keys, relative * z_range + z,
+                                side='left') + e0
+        first = self._event_offsets[u0:u1, None]
+        coefficients = (self._cumulative[index] -
+                        self._cumulative[first]).reshape(wse.shape + (4, 3))
+        z = np.maximum(wse, 0.0)[..., None]
+        values = (coefficients[..., 0] * z + coefficients[..., 1]) * z + \
+            coefficients[..., 2]
+        return [np.maximum(values[..., q], 0.0) for q in range(4)]
+
+    def properties(self, wse):
+        """Compute the hydraulic properties at water surface elevations.
+
+        Parameters
+        ----------
+        wse : array of float, shape (n_sections, k) or (k,)
+            The water surface elevations of every cross section. A 1D array
+            is used for all the sections.
+
+        Returns
+        -------
+        dict
+            'area', 'perimeter', 'top_width' and 'conveyance' of shape
+            (n_sections, 3, k), by left overbank, channel and right overbank,
+            and 'alpha', the velocity weighting coefficient of shape
+            (n_sections, k).
+        """
+        wse = np.asarray(wse, dtype=np.float64)
+        if wse.ndim < 2:
+            wse = np.broadcast_to(wse.reshape(1, -1),
+                                  (self.n_sections, wse.size))
+        n_sections, k = wse.shape
+        c = MANNING_CONSTANT[self.units]
+
+        names = ('area', 'perimeter', 'top_width', 'conveyance')
+        result = dict((name, np.zeros((n_sections, 3, k))) for name in names)
+        k3a2 = np.zeros((n_sections, k))
+
+        # Blocks of whole sections, to bound the memory of (subsection, k)
+        # arrays
+        sub_offsets = self.sub_offsets
+        block = max(1, _BLOCK_SIZE // max(k, 1))
+        s0 = 0
+        while s0 < n_sections:
+            s1 = int(np.searchsorted(sub_offsets, sub_offsets[s0] + block,
+                                     side='right')) - 1
+            s1 = min(max(s1, s0 + 1), n_sections)
+            u0, u1 = sub_offsets[s0], sub_offsets[s1]
+            if u1 > u0:
+                section = self.sub_section[u0:u1]
+                local = wse[section] - self.thalweg[section, None]
+                values = self._subsection_values(u0, u1, local)
+                self._reduce(values, u0, u1, c, result, k3a2)
+            s0 = s1
+
+        # Velocity coefficient, sum(K^3/A^2) At^2 / Kt^3
+        total_area = result['area'].sum(axis=1)
+        total_k = result['conveyance'].sum(axis=1)
+        valid = total_k > 0
+        alpha = np.ones((n_sections, k))
+        alpha[valid] = (k3a2[valid] * total_area[valid] ** 2 /
+                        total_k[valid] ** 3)
+        result['alpha'] = alpha
+        return result
+
+    def _reduce(self, values, u0, u1, c, result, k3a2):
+        """Sum the subsection values of a block by subdivision."""
+        area, perimeter, width, pn = values
+
+        # Conveyance of the subsections, with a composite n
+        wet = perimeter > 0
+        safe = np.where(wet, perimeter, 1.0)
+        n = np.where(wet & (pn > 0), (pn / safe) ** (2.0 / 3.0), 1.0)
+        conveyance = np.where(wet, c / n * area * (area / safe) ** (2.0 / 3.0),
+                              0.0)
+        conveyance[self._no_n[u0:u1]] = np.nan
+        ratio = np.where(area > 0, conveyance ** 3 / np.where(
+            area > 0, area, 1.0) ** 2, 0.0)
+
+        section = self.sub_section[u0:u1]
+        kind = self.sub_kind[u0:u1]
+        new = np.ones(section.size, dtype=bool)
+        new[1:] = (section[1:] != section[:-1]) | (kind[1:] != kind[:-1])
+        groups = np.nonzero(new)[0]
+        g_section, g_kind = section[groups], kind[groups]
+        for name, v in (('area', area), ('perimeter', perimeter),
+                        ('top_width', width), ('conveyance', conveyance)):
+            result[name][g_section, g_kind] = np.add.reduceat(v, groups,
+                                                              axis=0)
+        sections = np.nonzero(np.r_[True, section[1:] != section[:-1]])[0]
+        k3a2[section[sections]] = np.add.reduceat(ratio, sections, axis=0)
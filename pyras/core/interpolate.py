@@ -0,0 +1,233 @@
+"""
+Interpolation of cross sections between surveyed cross sections.
+
+As in the HEC-RAS geometry editor, the points of two consecutive cross
+sections are matched along chords joining their master points: the ends,
+the bank stations and the lowest point of the main channel. Every point is
+located by the region between two master points and its fraction of the
+region. The points of both cross sections are merged, and the stations and
+elevations of the interpolated cross sections vary linearly along the reach.
+All the pairs of cross sections of a reach are interpolated at once.
+"""
+import numpy as np
+
+from .collection import CrossSectionCollection
+from .hydraulics import _offsets
+from ..io.hecras.write_ras import insert_nodes
+
+
+# Number of master points: ends, banks and channel thalweg
+_N_MASTERS = 5
+
+# Width of the chord coordinates of a pair on the common axis
+_PAIR_SPAN = 8.0
+
+
+def _sections(count):
+    """Return the group of every item given the group sizes."""
+    return np.repeat(np.arange(len(count)), count)
+
+
+def _gather(start, groups):
+    """Return the items of some groups of a flat array and their count."""
+    count = np.diff(start)[groups]
+    items = (np.repeat(start[:-1][groups], count) + np.arange(count.sum()) -
+             np.repeat(_offsets(count)[:-1], count))
+    return items, count
+
+
+def _masters(collection):
+    """Return the master stations of every cross section, shape (n, 5):
+    first point, left bank, channel thalweg, right bank, last point."""
+    station, elevation = collection.station, collection.elevation
+    start, count = collection.start, collection.count
+    if (count == 0).any():
+        raise ValueError('Cross sections without points can not be '
+                         'interpolated')
+    first = station[start[:-1]]
+    last = station[start[1:] - 1]
+    left = np.clip(np.where(np.isnan(collection.banks[:, 0]), first,
+                            collection.banks[:, 0]), first, last)
+    right = np.clip(np.where(np.isnan(collection.banks[:, 1]), last,
+                             collection.banks[:, 1]), left, last)
+
+    # Lowest point between the banks, the middle of the channel if none
+    section = _sections(count)
+    in_channel = ((station >= left[section]) & (station <= right[section]))
+    z = np.where(in_channel, elevation, np.inf)
+    lowest = np.minimum.reduceat(z, start[:-1])
+    low = np.nonzero(in_channel & (z == lowest[section]))[0]
+    sections, index = np.unique(section[low], return_index=True)
+    thalweg = 0.5 * (left + right)
+    thalweg[sections] = station[low[index]]
+    return np.column_stack([first, left, thalweg, right, last])
+
+
+def _chord_coordinate(station, section, masters):
+    """Position of stations along the chords, the region between two master
+    points plus the fraction of the region, from 0 to 4."""
+    m = masters[section]
+    region = (station[:, None] >= m[:, 1:_N_MASTERS - 1]).sum(axis=1)
+    rows = np.arange(station.size)
+    low, high = m[rows, region], m[rows, region + 1]
+    width = high - low
+    with np.errstate(divide='ignore', invalid='ignore'):
+        fraction = np.where(width > 0, (station - low) / width, 0.0)
+    return region + np.clip(fraction, 0.0, 1.0)
+
+
+def _chord_station(position, masters):
+    """Stations of chord coordinates given the master stations of every
+    position, the inverse of _chord_coordinate."""
+    region = np.clip(np.floor(position).astype(np.int64), 0,
+                     _N_MASTERS - 2)
+    rows = np.arange(position.size)
+    low, high = masters[rows, region], masters[rows, region + 1]
+    return low + (position - region) * (high - low)
+
+
+def _station_name(upstream, downstream, weight):
+    """River stations of interpolated cross sections, marked with a '*' as
+    in HEC-RAS."""
+    try:
+        upstream, downstream = float(upstream), float(downstream)
+    except (TypeError, ValueError):
+        return ['{0}*{1}'.format(upstream, i + 1)
+                for i in range(len(weight))]
+    values = upstream + weight * (downstream - upstream)
+    return [('{0:.4f}'.format(value).rstrip('0').rstrip('.')) + '*'
+            for value in values]
+
+
+def interpolate_reach(collection, spacing=None, count=None):
+    """Interpolate cross sections between the cross sections of a reach.
+
+    Parameters
+    ----------
+    collection : CrossSectionCollection
+        The cross sections of a reach, from upstream to downstream, with the
+        reach lengths to the next cross section.
+    spacing : float, optional
+        The maximum channel distance between cross sections.
+    count : int or array of int, optional
+        Otherwise the number of cross sections to add between every pair of
+        cross sections, 0 to leave a pair, e.g. around a bridge.
+
+    Returns
+    -------
+    merged : CrossSectionCollection
+        The original and the interpolated cross sections, in order. The
+        reach lengths of the cross sections upstream of interpolated ones
+        are divided accordingly.
+    interpolated : ndarray of bool
+        The interpolated cross sections of `merged`.
+
+    Notes
+    -----
+    The Manning's n values are taken from the nearest original cross section
+    and their stations matched along the chords. Levees are not
+    interpolated. Vertical walls are replaced by the points of the walls of
+    the other cross section.
+    """
+    n = len(collection)
+    if n < 2:
+        return collection.take(np.arange(n)), np.zeros(n, dtype=bool)
+    if count is None:
+        if spacing is None:
+            raise ValueError('Give the spacing or the number of cross '
+                             'sections')
+        channel = np.nan_to_num(collection.lengths[:-1, 1])
+        count = np.maximum(np.ceil(channel / spacing) - 1, 0)
+    count = np.broadcast_to(np.asarray(count, dtype=np.int64),
+                            (n - 1,)).copy()
+
+    masters = _masters(collection)
+    section = _sections(collection.count)
+    position = _chord_coordinate(collection.station, section, masters)
+
+    # Chord coordinates of both cross sections of every pair on a common
+    # axis, the pairs spaced by _PAIR_SPAN
+    upstream = section < n - 1
+    downstream = section > 0
+    key_up = section[upstream] * _PAIR_SPAN + position[upstream]
+    key_down = (section[downstream] - 1) * _PAIR_SPAN + position[downstream]
+    keys = np.unique(np.concatenate([key_up, key_down]))
+    pair = np.floor(keys / _PAIR_SPAN).astype(np.int64)
+    keep = count[np.minimum(pair, n - 2)] > 0
+    keys, pair = keys[keep], pair[keep]
+    z_up = np.interp(keys, key_up, collection.elevation[upstream])
+    z_down = np.interp(keys, key_down, collection.elevation[downstream])
+    position = keys - pair * _PAIR_SPAN
+
+    # The interpolated cross sections and their weight, 0 upstream
+    new_pair = np.repeat(np.arange(n - 1), count)
+    rank = np.arange(new_pair.size) - np.repeat(_offsets(count)[:-1], count)
+    weight = (rank + 1.0) / (count[new_pair] + 1.0)
+    new_masters = ((1 - weight)[:, None] * masters[new_pair] +
+                   weight[:, None] * masters[new_pair + 1])
+
+    # Points of the interpolated cross sections
+    pair_start = _offsets(np.bincount(pair, minlength=n - 1))
+    points, n_points = _gather(pair_start, new_pair)
+    owner = _sections(n_points)
+    w = weight[owner]
+    station = _chord_station(position[points], new_masters[owner])
+    elevation = (1 - w) * z_up[points] + w * z_down[points]
+
+    # Manning's n values of the nearest cross section
+    source = np.where(weight < 0.5, new_pair, new_pair + 1)
+    mann, mann_count = _gather(collection.mann_start, source)
+    mann_owner = _sections(mann_count)
+    mann_position = _chord_coordinate(
+        collection.mann_station[mann],
+        np.repeat(source, mann_count), masters)
+    mann_station = _chord_station(mann_position, new_masters[mann_owner])
+
+    # Reach lengths divided between the cross sections of every pair
+    divisor = np.append(count + 1.0, 1.0)[:, None]
+    lengths = collection.lengths / divisor
+    names = []
+    for p in np.nonzero(count)[0]:
+        names += _station_name(collection.names[p], collection.names[p + 1],
+                               weight[new_pair == p])
+    new = CrossSectionCollection(
+        station, elevation, n_points, mann_station, collection.mann_n[mann],
+        mann_count, new_masters[:, [1, 3]], names,
+        [collection.location(p) for p in new_pair], lengths[new_pair],
+        collection.exp_contr[new_pair], collection.units)
+    original = collection.take(np.arange(n))
+    original.lengths[:] = lengths
+
+    # Every interpolated cross section after the upstream one of its pair
+    order = np.lexsort((np.concatenate([np.zeros(n), rank + 1.0]),
+                        np.concatenate([np.arange(n), new_pair])))
+    merged = CrossSectionCollection.concatenate([original, new]).take(order)
+    interpolated = order >= n
+    return merged, interpolated
+
+
+def write_interpolated(filename, merged, interpolated, output=None):
+    """Write interpolated cross sections to a geometry file.
+
+    Parameters
+    ----------
+    filename : str
+        Path to the geometry file (*.g##) the original cross sections were
+        read from.
+    merged, interpolated
+        The result of `interpolate_reach`.
+    output : str, optional
+        Path of the new geometry file. By default `filename` is replaced.
+    """
+    nodes, after, lengths = [], [], {}
+    upstream = None
+    for i in range(len(merged)):
+        if not interpolated[i]:
+            upstream = i
+            continue
+        river, reach = merged.location(upstream)
+        key = (river, reach, merged.names[upstream])
+        nodes.append(merged.node(i))
+        after.append(key)
+        lengths[key] = merged.lengths[upstream]
+    insert_nodes(filename, nodes, after, lengths, output)
@@ -0,0 +1,361 @@
+"""
+Spatial index of cross section cut lines and reach centerlines.
+
+The segments of the polylines are packed in an R-tree with the Sort-Tile-
+Recursive method: the segments are sorted in vertical slices by x, then by y
+within every slice, and grouped by `node_capacity`. The nodes of every upper
+level group consecutive nodes of the level below, so the children of a node
+are found by index and the tree is a few arrays of bounding boxes. Queries go
+down the tree one level at a time, testing all the candidate nodes of a
+level at once.
+
+The polylines use the layout of the HEC-RAS Schematic_XSPoints and
+Schematic_ReachPoints methods: flat x and y arrays, the index of the first
+point of every polyline and its number of points.
+"""
+import numpy as np
+
+from .hydraulics import _offsets
+from ..io.hecras.read_ras import iter_geometry
+
+
+def _clip(x0, y0, x1, y1, xmin, ymin, xmax, ymax):
+    """Test which segments cross a rectangle (Liang-Barsky)."""
+    dx, dy = x1 - x0, y1 - y0
+    t0 = np.zeros(x0.shape)
+    t1 = np.ones(x0.shape)
+    inside = np.ones(x0.shape, dtype=bool)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        for p, q in ((-dx, x0 - xmin), (dx, xmax - x0),
+                     (-dy, y0 - ymin), (dy, ymax - y0)):
+            ratio = q / p
+            inside &= ~((p == 0) & (q < 0))
+            t0 = np.where(p < 0, np.maximum(t0, ratio), t0)
+            t1 = np.where(p > 0, np.minimum(t1, ratio), t1)
+    return inside & (t0 <= t1)
+
+
+def _distance2(x, y, x0, y0, x1, y1):
+    """Squared distance from a point to segments."""
+    dx, dy = x1 - x0, y1 - y0
+    length2 = dx * dx + dy * dy
+    with np.errstate(divide='ignore', invalid='ignore'):
+        t = np.clip(((x - x0) * dx + (y - y0) * dy) / length2, 0.0, 1.0)
+    t = np.where(length2 > 0, t, 0.0)
+    return (x0 + t * dx - x) ** 2 + (y0 + t * dy - y) ** 2
+
+
+def _first_by_group(groups, values):
+    """Return the groups and the smallest value of every group."""
+    order = np.lexsort((values, groups))
+    groups, values = groups[order], values[order]
+    first = np.ones(groups.size, dtype=bool)
+    first[1:] = groups[1:] != groups[:-1]
+    return groups[first], values[first]
+
+
+class SpatialIndex(object):
+    """Packed R-tree of polylines.
+
+    Parameters
+    ----------
+    x, y : array of float
+        The points of all the polylines, one after the other.
+    start : array of int
+        The index of the first point of every polyline.
+    count : array of int
+        The number of points of every polyline.
+    keys : list, optional
+        The identifier of every polyline, e.g. (river, reach, rs).
+    node_capacity : int, optional
+        The number of children of the nodes of the tree.
+
+    Notes
+    -----
+    The queries return the index of the polylines, `keys` maps them to
+    their identifiers. A polyline with a single point is indexed as a point,
+    polylines without points are never returned.
+    """
+
+    def __init__(self, x, y, start, count, keys=None, node_capacity=16):
+        x = np.asarray(x, dtype=np.float64)
+        y = np.asarray(y, dtype=np.float64)
+        start = np.asarray(start, dtype=np.int64)
+        count = np.asarray(count, dtype=np.int64)
+        self.keys = keys
+        self.n_polylines = count.size
+        self.node_capacity = capacity = int(node_capacity)
+
+        # Segments between consecutive points, single points as segments
+        # of length 0
+        n_segments = np.maximum(count - 1, np.minimum(count, 1))
+        owner = np.repeat(np.arange(count.size), n_segments)
+        first = np.repeat(start, n_segments)
+        rank = np.arange(owner.size) - np.repeat(
+            _offsets(n_segments)[:-1], n_segments)
+        i0 = first + rank
+        i1 = np.where(np.repeat(count, n_segments) > 1, i0 + 1, i0)
+
+        # Sort-Tile-Recursive order of the segments
+        x0, y0, x1, y1 = x[i0], y[i0], x[i1], y[i1]
+        n = owner.size
+        n_leaves = -(-n // capacity)
+        n_slices = max(int(np.ceil(np.sqrt(n_leaves))), 1)
+        tile = np.empty(n, dtype=np.int64)
+        tile[np.argsort(x0 + x1, kind='mergesort')] = (
+            np.arange(n) // (n_slices * capacity))
+        order = np.lexsort((y0 + y1, tile))
+        self.x0, self.y0 = x0[order], y0[order]
+        self.x1, self.y1 = x1[order], y1[order]
+        self.owner = owner[order]
+
+        # Bounding boxes of every level, from the segments to the root
+        bounds = np.array([np.minimum(self.x0, self.x1),
+                           np.minimum(self.y0, self.y1),
+                           np.maximum(self.x0, self.x1),
+                           np.maximum(self.y0, self.y1)])
+        self.levels = [bounds]
+        while bounds.shape[1] > 1:
+            groups = np.arange(0, bounds.shape[1], capacity)
+            bounds = np.array([np.minimum.reduceat(bounds[0], groups),
+                               np.minimum.reduceat(bounds[1], groups),
+                               np.maximum.reduceat(bounds[2], groups),
+                               np.maximum.reduceat(bounds[3], groups)])
+            self.levels.append(bounds)
+
+    def __len__(self):
+        return self.n_polylines
+
+    # Alternate constructors
+    @staticmethod
+    def from_schematic(points, node_capacity=16):
+        """Build the index from the result of Schematic_XSPoints or
+        Schematic_ReachPoints.
+
+        The keys are the river stations for Schematic_XSPoints and the
+        (river, reach) for Schematic_ReachPoints.
+        """
+        names, other, start, count, x, y = points[:6]
+        if len(other) and isinstance(other[0], str):
+            # Schematic_ReachPoints: river and reach names
+            keys = list(zip(names, other))
+        else:
+            keys = list(names)
+        return SpatialIndex(x, y, start, count, keys, node_capacity)
+
+    @staticmethod
+    def from_geometry(filename, node_capacity=16):
+        """Build the index of the cut lines of a geometry file (*.g##).
+
+        The keys are the (river, reach, rs) of the cross sections.
+        """
+        keys, lines = [], []
+        for node in iter_geometry(filename):
+            if node['type'] == 1:
+                keys.append((node['river'], node['reach'], node['rs']))
+                lines.append(node['cut_line'])
+        count = np.array([line.shape[0] for line in lines], dtype=np.int64)
+        points = (np.concatenate(lines) if lines else
+                  np.empty((0, 2), dtype=np.float64))
+        return SpatialIndex(points[:, 0], points[:, 1], _offsets(count)[:-1],
+                            count, keys, node_capacity)
+
+    # Traversal
+    def _children(self, nodes, level):
+        """Return the children of nodes of a level, in the level below."""
+        capacity = self.node_capacity
+        children = (nodes[:, None] * capacity +
+                    np.arange(capacity)).ravel()
+        return children[children < self.levels[level - 1].shape[1]]
+
+    def _search(self, keep):
+        """Return the segments of the nodes kept by keep(bounds, nodes)."""
+        if not self.owner.size:
+            return np.empty(0, dtype=np.int64)
+        top = len(self.levels) - 1
+        nodes = np.arange(self.levels[top].shape[1])
+        nodes = nodes[keep(self.levels[top][:, nodes])]
+        for level in range(top, 0, -1):
+            if not nodes.size:
+                break
+            nodes = self._children(nodes, level)
+            nodes = nodes[keep(self.levels[level - 1][:, nodes])]
+        return nodes
+
+    # Queries
+    def bbox(self, xmin, ymin, xmax, ymax):
+        """Return the polylines crossing a rectangle.
+
+        Returns
+        -------
+        ndarray of int
+            The index of the polylines, sorted.
+        """
+        def keep(bounds):
+            return ((bounds[0] <= xmax) & (bounds[2] >= xmin) &
+                    (bounds[1] <= ymax) & (bounds[3] >= ymin))
+
+        segments = self._search(keep)
+        crossing = _clip(self.x0[segments], self.y0[segments],
+                         self.x1[segments], self.y1[segments],
+                         xmin, ymin, xmax, ymax)
+        return np.unique(self.owner[segments[crossing]])
+
+    def nearest(self, x, y, k=1, max_distance=np.inf):
+        """Return the polylines nearest to a point.
+
+        Parameters
+        ----------
+        x, y : float
+            The point.
+        k : int, optional
+            The number of polylines.
+        max_distance : float, optional
+            Polylines further away are not returned.
+
+        Returns
+        -------
+        index : ndarray of int
+            The index of the polylines, from the nearest.
+        distance : ndarray of float
+            Their distance to the point.
+        """
+        def mindist2(bounds):
+            dx = np.maximum(np.maximum(bounds[0] - x, x - bounds[2]), 0.0)
+            dy = np.maximum(np.maximum(bounds[1] - y, y - bounds[3]), 0.0)
+            return dx * dx + dy * dy
+
+        def distances(segments):
+            return _first_by_group(self.owner[segments], _distance2(
+                x, y, self.x0[segments], self.y0[segments],
+                self.x1[segments], self.y1[segments]))
+
+        empty = (np.empty(0, dtype=np.int64), np.empty(0))
+        if not self.owner.size:
+            return empty
+
+        # Bound the distance with the nearest leaves first, taking more
+        # leaves until they belong to k polylines
+        top = len(self.levels) - 1
+        width = k
+        while True:
+            nodes = np.arange(self.levels[top].shape[1])
+            for level in range(top, 0, -1):
+                nodes = self._children(nodes, level)
+                d2 = mindist2(self.levels[level - 1][:, nodes])
+                if nodes.size > width:
+                    nodes = nodes[np.argpartition(d2, width - 1)[:width]]
+            owners, d2 = distances(nodes)
+            if owners.size >= k or width >= self.owner.size:
+                break
+            width *= 2
+        bound2 = max_distance ** 2
+        if owners.size >= k:
+            bound2 = min(bound2, np.partition(d2, k - 1)[k - 1])
+
+        # Then search within the bound
+        segments = self._search(lambda bounds: mindist2(bounds) <= bound2)
+        owners, d2 = distances(segments)
+        order = np.argsort(d2, kind='mergesort')[:k]
+        order = order[d2[order] <= bound2]
+        return owners[order], np.sqrt(d2[order])
+
+    def intersects(self, x, y, points=False):
+        """Return the polylines crossing another polyline.
+
+        Parameters
+        ----------
+        x, y : array of float
+            The points of the polyline, e.g. a reach centerline.
+        points : bool, optional
+            Also return the intersection points.
+
+        Returns
+        -------
+        ndarray of int
+            The index of the polylines crossing, sorted. With points=True
+            one item per intersection, not sorted, and the x and y
+            coordinates of the intersections.
+        """
+        x = np.asarray(x, dtype=np.float64)
+        y = np.asarray(y, dtype=np.float64)
+        if x.size == 1:
+            x, y = np.repeat(x, 2), np.repeat(y, 2)
+        qx0, qy0, qx1, qy1 = x[:-1], y[:-1], x[1:], y[1:]
+        qbounds = np.array([np.minimum(qx0, qx1), np.minimum(qy0, qy1),
+                            np.maximum(qx0, qx1), np.maximum(qy0, qy1)])
+
+        # (query segment, node) pairs with overlapping boxes
+        query = np.empty(0, dtype=np.int64)
+        nodes = np.empty(0, dtype=np.int64)
+        if self.owner.size and qx0.size:
+            top = len(self.levels) - 1
+            n_top = self.levels[top].shape[1]
+            query = np.repeat(np.arange(qx0.size), n_top)
+            nodes = np.tile(np.arange(n_top), qx0.size)
+            for level in range(top, -1, -1):
+                if level < top:
+                    capacity = self.node_capacity
+                    query = np.repeat(query, capacity)
+                    nodes = (nodes[:, None] * capacity +
+                             np.arange(capacity)).ravel()
+                    valid = nodes < self.levels[level].shape[1]
+                    query, nodes = query[valid], nodes[valid]
+                bounds = self.levels[level][:, nodes]
+                q = qbounds[:, query]
+                overlap = ((bounds[0] <= q[2]) & (bounds[2] >= q[0]) &
+                           (bounds[1] <= q[3]) & (bounds[3] >= q[1]))
+                query, nodes = query[overlap], nodes[overlap]
+
+        # Exact segment intersections
+        px, py = qx0[query], qy0[query]
+        rx, ry = qx1[query] - px, qy1[query] - py
+        sx0, sy0 = self.x0[nodes], self.y0[nodes]
+        sx, sy = self.x1[nodes] - sx0, self.y1[nodes] - sy0
+        denominator = rx * sy - ry * sx
+        with np.errstate(divide='ignore', invalid='ignore'):
+            t = ((sx0 - px) * sy - (sy0 - py) * sx) / denominator
+            u = ((sx0 - px) * ry - (sy0 - py) * rx) / denominator
+        crossing = ((denominator != 0) & (t >= 0) & (t <= 1) &
+                    (u >= 0) & (u <= 1))
+        owners = self.owner[nodes[crossing]]
+        if not points:
+            return np.unique(owners)
+        t = t[crossing]
+        return (owners, px[crossing] + t * rx[crossing],
+                py[crossing] + t * ry[crossing])
+
+    def polygon(self, x, y):
+        """Return the polylines crossing or inside a polygon.
+
+        Parameters
+        ----------
+        x, y : array of float
+            The vertices of the polygon, closed or not.
+
+        Returns
+        -------
+        ndarray of int
+            The index of the polylines, sorted.
+        """
+        x = np.asarray(x, dtype=np.float64)
+        y = np.asarray(y, dtype=np.float64)
+        if x[0] != x[-1] or y[0] != y[-1]:
+            x, y = np.append(x, x[0]), np.append(y, y[0])
+        crossing = self.intersects(x, y)
+
+        # Polylines inside: one point in the polygon (even-odd rule)
+        candidates = np.setdiff1d(self.bbox(x.min(), y.min(), x.max(),
+                                            y.max()), crossing)
+        segments = self._search(lambda bounds: (
+            (bounds[0] <= x.max()) & (bounds[2] >= x.min()) &
+            (bounds[1] <= y.max()) & (bounds[3] >= y.min())))
+        segments = segments[np.isin(self.owner[segments], candidates)]
+        owners, first = _first_by_group(self.owner[segments], segments)
+        px, py = self.x0[first][:, None], self.y0[first][:, None]
+        ex0, ey0, ex1, ey1 = x[:-1], y[:-1], x[1:], y[1:]
+        straddle = (ey0 > py) != (ey1 > py)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            cross_x = ex0 + (py - ey0) * (ex1 - ex0) / (ey1 - ey0)
+        inside = (straddle & (px < cross_x)).sum(axis=1) % 2 == 1
+        return np.union1d(crossing, owners[inside])
@@ -0,0 +1,375 @@
+"""
+Standard step computation of steady gradually varied flow.
+
+The water surface profiles of a reach are computed from cross section to
+cross section by solving the energy equation
+
+    Z2 + a2 V2^2 / 2g = Z1 + a1 V1^2 / 2g + he
+
+where the energy loss he is the friction loss, with the average conveyance
+friction slope and the discharge weighted reach length, plus the contraction
+or expansion loss, as in HEC-RAS. All the profiles are computed at once:
+every step solves the equation for all the flows with a vectorized false
+position method. Subcritical profiles are computed upstream from the
+downstream boundary and supercritical profiles downstream from the upstream
+boundary. Where the energy equation has no solution in the flow regime, the
+water surface is set to the critical depth.
+"""
+import numpy as np
+
+from .depth import critical_depth, normal_depth
+from .htab import HydraulicTable
+from .hydraulics import GRAVITY
+from .xsection import CrossSection
+from ..io.hecras.read_ras import iter_geometry
+
+
+REGIMES = ('subcritical', 'supercritical')
+
+
+def _false_position(residual, low, high, f_low, f_high, tol, max_iter):
+    """Find the roots of functions bracketed by [low, high].
+
+    A modified false position method: the residual at the end of the
+    bracket that is kept is halved, so both ends move.
+
+    Parameters
+    ----------
+    residual : callable
+        Called as residual(z, index) for the items `index`.
+    low, high : array of float
+        The brackets, the residuals at both ends must have opposite signs.
+    f_low, f_high : array of float
+        The residuals at the ends of the brackets.
+    tol : float
+        The residual and the bracket width tolerance.
+    max_iter : int
+        The maximum number of iterations.
+
+    Returns
+    -------
+    z : array of float
+        The roots.
+    converged : array of bool
+        The items that converged.
+    """
+    low, high = low.copy(), high.copy()
+    f_low, f_high = f_low.copy(), f_high.copy()
+    z = 0.5 * (low + high)
+    converged = np.zeros(z.size, dtype=bool)
+    active = np.arange(z.size)
+    for _ in range(max_iter):
+        if not active.size:
+            break
+        a, b = low[active], high[active]
+        fa, fb = f_low[active], f_high[active]
+        za = b - fb * (b - a) / (fb - fa)
+        za = np.where(np.isfinite(za), za, 0.5 * (a + b))
+        fz = residual(za, active)
+        z[active] = za
+
+        # Replace the end with the sign of the new point
+        same = np.sign(fz) == np.sign(fb)
+        high[active] = np.where(same, za, b)
+        f_high[active] = np.where(same, fz, 0.5 * fb)
+        low[active] = np.where(same, a, za)
+        f_low[active] = np.where(same, 0.5 * fa, fz)
+
+        done = (np.abs(fz) < tol) | (np.abs(b - a) < tol)
+        converged[active[done]] = True
+        active = active[~done]
+    return z, converged
+
+
+class SteadyReach(object):
+    """Cross sections of a reach for steady flow computations.
+
+    Parameters
+    ----------
+    sections : list of CrossSection
+        The cross sections, ordered from upstream to downstream as in a
+        geometry file. The `lengths` of every section are the reach lengths
+        to the next one and its `exp_contr` coefficients apply to that reach.
+
+    Notes
+    -----
+    The sections are linked in the flow direction through their
+    `next_nodes` and `previous_nodes`.
+    """
+
+    def __init__(self, sections):
+        self.sections = list(sections)
+        if len(self.sections) < 2:
+            raise ValueError('A reach needs at least two cross sections')
+        units = set(section.units for section in self.sections)
+        if len(units) > 1:
+            raise ValueError('Cross sections with different unit systems')
+        self.units = units.pop()
+        for upstream, downstream in zip(self.sections[:-1],
+                                        self.sections[1:]):
+            if downstream not in upstream.next_nodes:
+                upstream.next_nodes.append(downstream)
+            if upstream not in downstream.previous_nodes:
+                downstream.previous_nodes.append(upstream)
+
+    def __len__(self):
+        return len(self.sections)
+
+    def __repr__(self):
+        location = self.sections[0].location
+        return '<SteadyReach {0!r} {1} sections>'.format(location, len(self))
+
+    @staticmethod
+    def from_geometry(filename, river=None, reach=None, units='English'):
+        """Read the cross sections of a reach from a geometry file (*.g##).
+
+        Parameters
+        ----------
+        filename : str
+            Path to the geometry file.
+        river, reach : str, optional
+            The reach to read, not needed if the file has a single reach.
+        units : {'English', 'SI'}, optional
+            The unit system of the geometry.
+
+        Returns
+        -------
+        SteadyReach
+        """
+        reaches = read_reaches(filename, units)
+        if river is None and reach is None and len(reaches) == 1:
+            return list(reaches.values())[0]
+        matches = [key for key in reaches if
+                   (river is None or key[0] == river) and
+                   (reach is None or key[1] == reach)]
+        if len(matches) != 1:
+            raise ValueError('{0} reaches match river {1!r} and reach {2!r}'
+                             .format(len(matches), river, reach))
+        return reaches[matches[0]]
+
+    def _state(self, index, z, flow):
+        """Hydraulic state of a cross section at water surface elevations.
+
+        Returns
+        -------
+        dict
+            'conveyance', 'area', 'top_width', 'alpha', 'fraction' (the
+            part of the flow in every subsection, shape (3, n)), 'head' (the
+            velocity head) and 'energy'.
+        """
+        values = self.sections[index].subdivision().properties(z[None, :])
+        conveyance = values['conveyance'][0]
+        total = conveyance.sum(axis=0)
+        area = values['area'][0].sum(axis=0)
+        alpha = values['alpha'][0]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            fraction = np.where(total > 0, conveyance / total, 0.0)
+            head = np.where(area > 0, alpha * flow ** 2 /
+                            (2 * GRAVITY[self.units] * area ** 2), np.inf)
+        return {'conveyance': total,
+                'area': area,
+                'top_width': values['top_width'][0].sum(axis=0),
+                'alpha': alpha,
+                'fraction': fraction,
+                'head': head,
+                'energy': z + head}
+
+    def _loss(self, upstream, known, unknown, flow_known, flow_unknown,
+              known_upstream):
+        """Energy loss between two cross sections."""
+        lengths = np.nan_to_num(self.sections[upstream].lengths)
+        expansion, contraction = self.sections[upstream].exp_contr
+        # Discharge weighted reach length
+        flows = (known['fraction'] * flow_known +
+                 unknown['fraction'] * flow_unknown)
+        total = flows.sum(axis=0)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            length = np.where(total > 0, lengths.dot(flows) / total,
+                              lengths[1])
+            slope = ((flow_known + flow_unknown) /
+                     (known['conveyance'] + unknown['conveyance'])) ** 2
+        if known_upstream:
+            head_up, head_down = known['head'], unknown['head']
+        else:
+            head_up, head_down = unknown['head'], known['head']
+        # Contraction where the flow accelerates
+        coefficient = np.where(head_down > head_up, contraction, expansion)
+        return length * slope + coefficient * np.abs(head_down - head_up)
+
+    def compute(self, flow, ws=None, slope=None, regime='subcritical',
+                tol=0.001, max_iter=40):
+        """Compute water surface profiles for many flows.
+
+        Parameters
+        ----------
+        flow : array of float, shape (n_profiles,) or (n_sections, n_profiles)
+            The flow of every profile, the same at all the cross sections or
+            one row per cross section.
+        ws : float or array of float, optional
+            The known water surface elevation of every profile at the
+            boundary: the downstream end for subcritical flow, the upstream
+            end for supercritical flow.
+        slope : float or array of float, optional
+            Otherwise the energy slope used for the normal depth at the
+            boundary. The critical depth is used if neither is given.
+        regime : {'subcritical', 'supercritical'}, optional
+            The flow regime.
+        tol : float, optional
+            The tolerance on the energy balance of every step. Errors add up
+            along the reach, so it is smaller than the 0.01 ft water surface
+            tolerance of HEC-RAS.
+        max_iter : int, optional
+            The maximum number of iterations of every step.
+
+        Returns
+        -------
+        dict
+            With arrays of shape (n_sections, n_profiles): 'wse', 'energy',
+            'velocity' (average velocity), 'froude', 'critical_wse',
+            'critical' (True where the water surface was set to the critical
+            depth because the energy equation had no solution) and
+            'converged'.
+        """
+        if regime not in REGIMES:
+            raise ValueError('Unknown flow regime {0!r}'.format(regime))
+        n_sections = len(self.sections)
+        flow = np.asarray(flow, dtype=np.float64)
+        if flow.ndim < 2:
+            flow = np.tile(flow.reshape(1, -1), (n_sections, 1))
+        if flow.shape[0] != n_sections:
+            raise ValueError('The flow matrix must have one row per section')
+        n_profiles = flow.shape[1]
+
+        table = HydraulicTable.concatenate(
+            [section.htab for section in self.sections])
+        critical_wse, _ = critical_depth(table, flow)
+        thalweg = table.start
+
+        wse = np.empty((n_sections, n_profiles))
+        critical = np.zeros((n_sections, n_profiles), dtype=bool)
+        converged = np.ones((n_sections, n_profiles), dtype=bool)
+
+        # Boundary condition
+        subcritical = regime == 'subcritical'
+        first = n_sections - 1 if subcritical else 0
+        if ws is not None:
+            wse[first] = ws
+        elif slope is not None:
+            wse[first] = normal_depth([self.sections[first]], slope,
+                                      flow[first])[0][0]
+        else:
+            wse[first] = critical_wse[first]
+
+        steps = range(n_sections - 2, -1, -1) if subcritical else \
+            range(1, n_sections)
+        for unknown in steps:
+            known = unknown + 1 if subcritical else unknown - 1
+            upstream = min(known, unknown)
+            q_known, q_unknown = flow[known], flow[unknown]
+            state = self._state(known, wse[known], q_known)
+
+            def residual(z, index):
+                # Energy at the unknown section minus the energy required
+                # by the known one
+                reduced = dict((key, value[..., index])
+                               for key, value in state.items())
+                current = self._state(unknown, z, q_unknown[index])
+                loss = self._loss(upstream, reduced, current,
+                                  q_known[index], q_unknown[index],
+                                  not subcritical)
+                if subcritical:
+                    return current['energy'] - reduced['energy'] - loss
+                return current['energy'] - reduced['energy'] + loss
+
+            # The root is above the critical depth for subcritical flow and
+            # below it for supercritical flow
+            items = np.arange(n_profiles)
+            zc = critical_wse[unknown]
+            f_critical = residual(zc, items)
+            if subcritical:
+                low, f_low = zc, f_critical
+                height = np.maximum(wse[known], zc) - thalweg[unknown]
+                high = zc + np.maximum(height, tol)
+                f_high = residual(high, items)
+                for _ in range(20):
+                    below = f_high < 0
+                    if not below.any():
+                        break
+                    low = np.where(below, high, low)
+                    f_low = np.where(below, f_high, f_low)
+                    high = np.where(below, high + 2 * (high - zc), high)
+                    f_high[below] = residual(high[below], items[below])
+            else:
+                high, f_high = zc, f_critical
+                low = thalweg[unknown] + 1e-3 * (zc - thalweg[unknown])
+                f_low = residual(low, items)
+                f_low, f_high = -f_low, -f_high
+
+            # No solution in the flow regime: critical depth
+            solvable = (f_low < 0) & (f_high > 0) & (flow[unknown] > 0)
+            wse[unknown] = zc
+            critical[unknown] = ~solvable
+            if solvable.any():
+                index = np.nonzero(solvable)[0]
+                if subcritical:
+                    function = residual
+                else:
+                    def function(z, items):
+                        return -residual(z, items)
+                z, done = _false_position(
+                    lambda z, items: function(z, index[items]),
+                    low[index], high[index], f_low[index], f_high[index],
+                    tol, max_iter)
+                wse[unknown, index] = z
+                converged[unknown, index] = done
+
+        energy = np.empty_like(wse)
+        velocity = np.empty_like(wse)
+        froude = np.empty_like(wse)
+        for i in range(n_sections):
+            state = self._state(i, wse[i], flow[i])
+            with np.errstate(divide='ignore', invalid='ignore'):
+                velocity[i] = np.where(state['area'] > 0,
+                                       flow[i] / state['area'], 0.0)
+                depth = state['area'] / state['top_width']
+                froude[i] = np.where(state['area'] > 0, velocity[i] / np.sqrt(
+                    GRAVITY[self.units] * depth), 0.0)
+            energy[i] = state['energy']
+
+        return {'wse': wse,
+                'energy': energy,
+                'velocity': velocity,
+                'froude': froude,
+                'critical_wse': critical_wse,
+                'critical': critical,
+                'converged': converged}
+
+
+def read_reaches(filename, units='English'):
+    """Read the reaches of a geometry file (*.g##) for steady flow.
+
+    Only the cross sections are kept, bridges, culverts and other structures
+    are skipped. The reach lengths of a cross section are measured to the
+    next cross section, so they do not change.
+
+    Parameters
+    ----------
+    filename : str
+        Path to the geometry file.
+    units : {'English', 'SI'}, optional
+        The unit system of the geometry.
+
+    Returns
+    -------
+    dict
+        Maps (river, reach) to SteadyReach, reaches with less than two cross
+        sections are left out.
+    """
+    sections = {}
+    for node in iter_geometry(filename):
+        key = (node['river'], node['reach'])
+        if node['type'] == 1 and node['station'].size:
+            sections.setdefault(key, []).append(
+                CrossSection.from_node(node, units))
+    return dict((key, SteadyReach(value)) for key, value in sections.items()
+                if len(value) > 1)
@@ -0,0 +1,254 @@
+"""
+Point thinning of the cross sections of a collection.
+
+The points of all the cross sections are filtered at once, in three passes:
+
+1. An area filter (Visvalingam-Whyatt) removes the points whose triangle
+   with their neighbours is smaller than a given area, so the flow area of
+   the cross section barely changes.
+2. A Douglas-Peucker simplification keeps the points needed for the
+   elevations to stay within a vertical tolerance.
+3. The points of the cross sections still above the HEC-RAS limit of 500
+   points are removed by increasing triangle area.
+
+The ends of the cross sections, the thalweg, and the points around the bank
+stations, the Manning's n breakpoints and the levees are always kept.
+"""
+import numpy as np
+
+from .collection import CrossSectionCollection
+from .hydraulics import _offsets, _section_coordinate
+
+
+# Maximum number of points of a cross section in HEC-RAS
+MAX_POINTS = 500
+
+
+def _sections(collection):
+    """Return the cross section of every point."""
+    return np.repeat(np.arange(len(collection)), collection.count)
+
+
+def _protected(collection):
+    """Return the points that must be kept."""
+    station, elevation = collection.station, collection.elevation
+    start, count = collection.start, collection.count
+    section = _sections(collection)
+    keep = np.zeros(station.size, dtype=bool)
+    has_points = count > 0
+    first = start[:-1][has_points]
+    keep[first] = True
+    keep[start[1:][has_points] - 1] = True
+    if not station.size:
+        return keep
+
+    # Thalweg, the first lowest point
+    lowest = np.minimum.reduceat(elevation, first)
+    low = np.nonzero(elevation == np.repeat(lowest, count[has_points]))[0]
+    keep[low[np.unique(section[low], return_index=True)[1]]] = True
+
+    # Points at or around the breakpoints
+    n = len(collection)
+    origin = np.zeros(n)
+    end = np.zeros(n)
+    origin[has_points] = station[first]
+    end[has_points] = station[start[1:][has_points] - 1]
+    span_base = _offsets(end - origin + 1.0)[:-1]
+    coord = _section_coordinate(station, section, origin, span_base)
+    mann_section = np.repeat(np.arange(n), collection.mann_count)
+    bp_station = np.concatenate([collection.mann_station,
+                                 collection.banks.ravel(),
+                                 collection.levees.ravel()])
+    bp_section = np.concatenate([mann_section, np.repeat(np.arange(n), 2),
+                                 np.repeat(np.arange(n), 2)])
+    valid = (np.isfinite(bp_station) & has_points[bp_section] &
+             (bp_station >= origin[bp_section]) &
+             (bp_station <= end[bp_section]))
+    bp_coord = _section_coordinate(bp_station[valid], bp_section[valid],
+                                   origin, span_base)
+    below = np.searchsorted(coord, bp_coord, side='right') - 1
+    above = np.searchsorted(coord, bp_coord, side='left')
+    keep[below] = True
+    keep[np.minimum(above, station.size - 1)] = True
+    return keep
+
+
+def _triangles(station, elevation, points, end):
+    """Area of the triangles of points with their neighbours.
+
+    The neighbours of the remaining `points` are the previous and next
+    remaining points, `end` flags the ends of the cross sections whose area
+    is infinite.
+    """
+    x, z = station[points], elevation[points]
+    area = np.full(points.size, np.inf)
+    inner = ~end
+    inner[[0, -1]] = False
+    i = np.nonzero(inner)[0]
+    area[i] = 0.5 * np.abs((x[i - 1] - x[i]) * (z[i + 1] - z[i]) -
+                           (x[i + 1] - x[i]) * (z[i - 1] - z[i]))
+    return area
+
+
+def _local_minima(area, candidate):
+    """Candidates not larger than their neighbours.
+
+    Equal areas make runs of neighbouring minima, e.g. collinear points,
+    every other point of a run is returned so no two neighbours are both
+    minima and a run is halved at every pass.
+    """
+    minimum = candidate.copy()
+    minimum[1:] &= area[1:] <= area[:-1]
+    minimum[:-1] &= area[:-1] <= area[1:]
+    position = np.arange(area.size)
+    first = minimum.copy()
+    first[1:] &= ~minimum[:-1]
+    run_start = np.maximum.accumulate(np.where(first, position, 0))
+    return minimum & ((position - run_start) % 2 == 0)
+
+
+def _area_filter(collection, keep, alive, area=None, max_points=None):
+    """Remove points by increasing triangle area.
+
+    Points are removed while their area is below `area`, or until no
+    cross section has more than `max_points` points.
+    """
+    section = _sections(collection)
+    station, elevation = collection.station, collection.elevation
+    n = len(collection)
+    while True:
+        points = np.nonzero(alive)[0]
+        if not points.size:
+            break
+        end = keep[points]
+        triangles = _triangles(station, elevation, points, end)
+        candidate = _local_minima(triangles, ~end)
+        if area is not None:
+            candidate &= triangles < area
+        else:
+            # Remove at most the excess of every section, smallest first
+            excess = np.bincount(section[points], minlength=n) - max_points
+            candidate &= np.repeat(excess > 0, np.bincount(
+                section[points], minlength=n))
+            index = np.nonzero(candidate)[0]
+            order = np.lexsort((triangles[index], section[points[index]]))
+            index = index[order]
+            owner = section[points[index]]
+            rank = np.arange(index.size) - np.searchsorted(owner, owner)
+            candidate[:] = False
+            candidate[index[rank < excess[owner]]] = True
+        if not candidate.any():
+            break
+        alive[points[candidate]] = False
+    return alive
+
+
+def _douglas_peucker(collection, keep, alive, tolerance):
+    """Keep the remaining points needed to stay within a vertical
+    tolerance, all the intervals between kept points at once."""
+    points = np.nonzero(alive)[0]
+    x = collection.station[points]
+    z = collection.elevation[points]
+    anchor = keep[points].copy()
+    # Points not yet known to be removed or kept
+    pending = ~anchor
+    while True:
+        inner = np.nonzero(pending)[0]
+        if not inner.size:
+            break
+        # The interval of every pending point, between two anchors
+        anchors = np.nonzero(anchor)[0]
+        interval = np.searchsorted(anchors, inner) - 1
+        a, b = anchors[interval], anchors[interval + 1]
+        dx = x[b] - x[a]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            line = z[a] + (x[inner] - x[a]) * (z[b] - z[a]) / dx
+        deviation = np.where(dx > 0, np.abs(z[inner] - line),
+                             np.abs(x[inner] - x[a]))
+        # Split the intervals at their largest deviation, the points of the
+        # other intervals are removed. The pending points are in order, so
+        # are their intervals.
+        new = np.ones(inner.size, dtype=bool)
+        new[1:] = interval[1:] != interval[:-1]
+        group = np.nonzero(new)[0]
+        largest = np.maximum.reduceat(deviation, group)
+        sizes = np.diff(np.append(group, inner.size))
+        at_max = np.nonzero(deviation == np.repeat(largest, sizes))[0]
+        first = np.ones(at_max.size, dtype=bool)
+        first[1:] = interval[at_max][1:] != interval[at_max][:-1]
+        largest = at_max[first]
+        split = largest[deviation[largest] > tolerance]
+        settled = np.ones(anchors.size, dtype=bool)
+        settled[interval[split]] = False
+        pending[inner[settled[interval]]] = False
+        anchor[inner[split]] = True
+        pending[inner[split]] = False
+    alive[points[~anchor]] = False
+    return alive
+
+
+def simplify(collection, tolerance=0.05, area=None, max_points=MAX_POINTS,
+             n_stages=10):
+    """Thin the points of all the cross sections of a collection.
+
+    Parameters
+    ----------
+    collection : CrossSectionCollection
+        The cross sections, not modified.
+    tolerance : float, optional
+        The largest vertical distance between a removed point and the
+        simplified cross section, None to skip the Douglas-Peucker pass.
+    area : float, optional
+        The points whose triangle with their neighbours has a smaller area
+        are removed first.
+    max_points : int, optional
+        The maximum number of points of a cross section.
+    n_stages : int, optional
+        The number of water surface elevations, from the thalweg to the
+        top of every cross section, where the conveyance is compared.
+
+    Returns
+    -------
+    simplified : CrossSectionCollection
+        The thinned cross sections.
+    report : dict
+        Arrays with one value per cross section: 'points' and
+        'points_simplified', 'area_change' and 'conveyance_change', the
+        largest relative change of the flow area and of the conveyance over
+        the compared elevations.
+    """
+    keep = _protected(collection)
+    alive = np.ones(keep.size, dtype=bool)
+    if area is not None:
+        alive = _area_filter(collection, keep, alive, area=area)
+    if tolerance is not None:
+        alive = _douglas_peucker(collection, keep, alive, tolerance)
+    if max_points is not None:
+        alive = _area_filter(collection, keep, alive, max_points=max_points)
+
+    count = np.bincount(_sections(collection)[alive],
+                        minlength=len(collection))
+    simplified = CrossSectionCollection(
+        collection.station[alive], collection.elevation[alive], count,
+        collection.mann_station, collection.mann_n, collection.mann_count,
+        collection.banks, collection.names,
+        [collection.location(i) for i in range(len(collection))],
+        collection.lengths, collection.exp_contr, collection.units,
+        levees=collection.levees)
+
+    # Hydraulic effect of the thinning
+    before = collection.subdivision()
+    offsets = np.linspace(0.0, 1.0, n_stages + 1)[1:]
+    wse = (before.thalweg[:, None] +
+           np.nan_to_num(before.top - before.thalweg)[:, None] * offsets)
+    values = before.properties(wse)
+    after = simplified.subdivision().properties(wse)
+    report = {'points': collection.count,
+              'points_simplified': count}
+    for name in ('area', 'conveyance'):
+        old = values[name].sum(axis=1)
+        new = after[name].sum(axis=1)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            change = np.where(old > 0, np.abs(new - old) / old, 0.0)
+        report[name + '_change'] = np.nan_to_num(change).max(axis=1)
+    return simplified, report
@@ -1,83 +1,433 @@
 
-from . import Node
+import numpy as np
+
+from .base.node import Node
+from .collection import CrossSectionCollection
+from .htab import HydraulicTable, fingerprint
+from .hydraulics import CHANNEL, LOB, ROB, Subdivision
+
 
 class CrossSection(Node):
-    """
+    """Cross section given by a station/elevation polyline.
+
+    Parameters
+    ----------
+    station, elevation : array of float
+        The points of the cross section, stations must be non decreasing.
+    mann_station, mann_n : array of float, optional
+        The Manning's n values and the stations where they start.
+    banks : (float, float), optional
+        The left and right bank stations.
+    levees : (float, float), optional
+        The left and right levee stations, NaN if there is no levee.
+    name : str, optional
+        The river station.
+    location : tuple, optional
+        The (river, reach) of the cross section.
+    lengths : (float, float, float), optional
+        The left overbank, channel and right overbank reach lengths to the
+        next cross section downstream.
+    exp_contr : (float, float), optional
+        The expansion and contraction coefficients of the reach to the next
+        cross section downstream, 0.3 and 0.1 by default.
+    units : {'English', 'SI'}, optional
+        The unit system.
+
+    Notes
+    -----
+    The data of a cross section is held by a CrossSectionCollection, a
+    collection of one created by the constructor or the collection of a
+    whole model, see CrossSectionCollection.__getitem__. The geometry
+    properties are views of its arrays.
+
+    The hydraulic properties take either water surface elevations `z` or
+    depths `y` above the thalweg, scalars or arrays of any shape, and return
+    arrays of the same shape. With subdivided=True a last axis of size 3
+    holds the left overbank, channel and right overbank values.
     """
 
-    def __init__(self):
-        """
+    __slots__ = ('_collection', '_index', '_version', 'angle',
+                 '_subdivision', '_htab')
 
-        """
-        self.banks
+    def __init__(self, station, elevation, mann_station=None, mann_n=None,
+                 banks=None, name=None, location=None, lengths=None,
+                 exp_contr=None, units='English', levees=None):
+        station = np.asarray(station, dtype=np.float64)
+        if mann_station is None:
+            mann_station, mann_n = [], []
+        mann_n = np.asarray(mann_n, dtype=np.float64)
+        collection = CrossSectionCollection(
+            station, elevation, [station.size], mann_station, mann_n,
+            [mann_n.size], None if banks is None else [banks], [name],
+            [location], None if lengths is None else [lengths],
+            None if exp_contr is None else [exp_contr], units,
+            levees=None if levees is None else [levees])
+        self._attach(collection, 0)
+
+    def _attach(self, collection, index):
+        """Make the cross section a view of a collection item."""
+        super(CrossSection, self).__init__()
+        self._collection = collection
+        self._index = index
+        self.angle = 0.0
+        self._version = None
+        self._subdivision = None
+        self._htab = None
+
+    def __repr__(self):
+        return '<CrossSection {0!r} {1} points>'.format(self.name,
+                                                         self.station.size)
 
     # Alternate constructors
+    @staticmethod
+    def view(collection, index):
+        """Return a cross section sharing the arrays of a collection."""
+        section = CrossSection.__new__(CrossSection)
+        section._attach(collection, index)
+        return section
+
     @staticmethod
     def from_coord(x, y):
-        """
+        """Create a cross section from station and elevation coordinates."""
+        return CrossSection(x, y)
+
+    @staticmethod
+    def from_node(node, units='English'):
+        """Create a cross section from a node of read_ras.iter_geometry."""
+        return CrossSection(node['station'], node['elevation'],
+                            node['mann_station'], node['mann_n'],
+                            node['bank_stations'], name=node['rs'],
+                            location=(node['river'], node['reach']),
+                            lengths=node['lengths'],
+                            exp_contr=node['exp_contr'], units=units,
+                            levees=node['levees'])
 
-        """    
-    
     def reverse(self):
-        """
-        """
-    
-    # Hydraulic properties
-    def area(self, z=None, y=None):
-        """
+        """Return the cross section seen from the other bank.
 
+        Stations are mirrored within the same range, so the left bank becomes
+        the right bank.
         """
-    
-    def perimeter(self, z=None):
-        """
+        station = self.station
+        total = station[0] + station[-1] if station.size else 0.0
+        mann_station = self.mann_station
+        if mann_station.size:
+            # Every n value starts where the next one started
+            ends = np.append(mann_station[1:], station[-1])
+            mann_station = total - ends[::-1]
+        left, right = self.banks
+        left_levee, right_levee = self.levees
+        lengths = self.lengths[::-1]
+        return CrossSection(total - station[::-1], self.elevation[::-1],
+                            mann_station, self.mann_n[::-1],
+                            (total - right, total - left), self.name,
+                            self.location, lengths, self.exp_contr,
+                            self.units, (total - right_levee,
+                                         total - left_levee))
 
-        """
-        
-    def radius(self, z=None):
-        """
+    # Geometry, views of the arrays of the collection
+    @property
+    def collection(self):
+        """The CrossSectionCollection holding the data."""
+        return self._collection
 
-        """
-    
-    def conveyance(self, z=None):
-        """
+    @property
+    def index(self):
+        """The index of the cross section in its collection."""
+        return self._index
 
-        """
+    @property
+    def name(self):
+        """The river station."""
+        return self._collection.names[self._index]
+
+    @name.setter
+    def name(self, value):
+        """ """
+        self._collection.names[self._index] = value
+        self._collection._keys = None
+
+    @property
+    def location(self):
+        """The (river, reach) of the cross section."""
+        return self._collection.location(self._index)
+
+    @location.setter
+    def location(self, value):
+        """ """
+        collection = self._collection
+        if value not in collection.location_names:
+            collection.location_names.append(value)
+        collection.location_index[self._index] = \
+            collection.location_names.index(value)
+        collection._keys = None
+
+    def _points(self):
+        """Return the slice of the points of the cross section."""
+        start = self._collection.start
+        return slice(start[self._index], start[self._index + 1])
+
+    @property
+    def station(self):
+        """The stations of the points."""
+        return self._collection.station[self._points()]
+
+    @station.setter
+    def station(self, value):
+        """ """
+        self._collection.set_points(self._index, value, self.elevation)
+
+    @property
+    def elevation(self):
+        """The elevations of the points."""
+        return self._collection.elevation[self._points()]
+
+    @elevation.setter
+    def elevation(self, value):
+        """ """
+        self._collection.set_points(self._index, self.station, value)
+
+    def set_points(self, station, elevation):
+        """Replace the points, possibly with a different number of points."""
+        self._collection.set_points(self._index, station, elevation)
+
+    def _mann(self):
+        """Return the slice of the Manning's n values."""
+        start = self._collection.mann_start
+        return slice(start[self._index], start[self._index + 1])
+
+    @property
+    def mann_station(self):
+        """The stations where the Manning's n values start."""
+        return self._collection.mann_station[self._mann()]
+
+    @property
+    def mann_n(self):
+        """The Manning's n values."""
+        return self._collection.mann_n[self._mann()]
+
+    def set_mann(self, mann_n, mann_station):
+        """Set the Manning's n values and the stations where they start."""
+        self._collection.set_mann(self._index, mann_n, mann_station)
 
     @property
     def banks(self):
-        """
-        """
+        """The (left, right) bank stations."""
+        left, right = self._collection.banks[self._index]
+        return (float(left), float(right))
 
     @banks.setter
-    def banks(self, left, right):
-        """
-        """
+    def banks(self, value):
+        """ """
+        self._collection.banks[self._index] = value
+        self._collection.changed(self._index)
 
     @property
-    def angle(self):
-        """
-        """
+    def levees(self):
+        """The (left, right) levee stations, NaN if there is no levee."""
+        left, right = self._collection.levees[self._index]
+        return (float(left), float(right))
 
-    @banks.setter
-    def angle(self, value):
-        """
-        """
+    @levees.setter
+    def levees(self, value):
+        """ """
+        self._collection.levees[self._index] = value
+
+    @property
+    def lengths(self):
+        """The left overbank, channel and right overbank reach lengths."""
+        return self._collection.lengths[self._index]
+
+    @lengths.setter
+    def lengths(self, value):
+        """ """
+        self._collection.lengths[self._index] = value
+
+    @property
+    def exp_contr(self):
+        """The expansion and contraction coefficients."""
+        return self._collection.exp_contr[self._index]
+
+    @exp_contr.setter
+    def exp_contr(self, value):
+        """ """
+        self._collection.exp_contr[self._index] = value
+
+    @property
+    def units(self):
+        """The unit system, 'English' or 'SI'."""
+        return self._collection.units
 
     @property
     def offset(self):
-        """
-        """
+        """The elevation of the thalweg."""
+        elevation = self.elevation
+        return float(elevation.min()) if elevation.size else None
 
-    @banks.setter
+    @offset.setter
     def offset(self, y):
+        """Raise or lower the cross section so the thalweg is at `y`."""
+        self.elevation = self.elevation + (y - self.offset)
+
+    # Hydraulic properties
+    def _check(self):
+        """Drop the subdivision and the HTAB after a change of geometry."""
+        version = self._collection._versions[self._index]
+        if self._version != version:
+            self._version = version
+            self._subdivision = None
+            self._htab = None
+
+    def fingerprint(self):
+        """Return a digest of the geometry, the Manning's n values and the
+        HTAB options."""
+        options = self._collection.htab_options(self._index)
+        return fingerprint(self.station, self.elevation, self.mann_station,
+                           self.mann_n, np.array(self.banks),
+                           np.array([options['n_points'],
+                                     options['increment'] or 0.0]),
+                           np.array(self.units))
+
+    @property
+    def htab(self):
+        """The hydraulic property tables, built on first use and again
+        after a change of the geometry or of the Manning's n values.
+
+        See Also
+        --------
+        set_htab, save_htab, load_htab
         """
+        self._check()
+        if self._htab is None:
+            self._htab = HydraulicTable.build(
+                self.subdivision(), fingerprint=self.fingerprint(),
+                **self._collection.htab_options(self._index))
+        return self._htab
+
+    def set_htab(self, n_points=100, increment=None):
+        """Set the elevations of the hydraulic property tables.
+
+        Parameters
+        ----------
+        n_points : int, optional
+            The number of elevations, from the thalweg to the highest point.
+        increment : float, optional
+            A fixed elevation increment instead.
         """
-        
-        
-    def conveyance(self, flow, z=None, y=None):
-        """
-        """
-        
-    def plot(self):
+        self._collection._section_htab_options[self._index] = {
+            'n_points': n_points, 'increment': increment}
+        self._htab = None
+
+    def save_htab(self, filename):
+        """Save the hydraulic property tables, building them if needed."""
+        self.htab.save(filename)
+
+    def load_htab(self, filename):
+        """Reuse tables saved with `save_htab` if they match the geometry.
+
+        Returns
+        -------
+        bool
+            True if the saved tables were used, False if they are out of date
+            and will be rebuilt.
         """
+        try:
+            table = HydraulicTable.load(filename)
+        except (IOError, OSError, ValueError, KeyError):
+            return False
+        if table.fingerprint != self.fingerprint():
+            return False
+        self._check()
+        self._htab = table
+        return True
+
+    def subdivision(self):
+        """Return the conveyance subdivision, rebuilt if the geometry or
+        the Manning's n values changed."""
+        self._check()
+        if self._subdivision is None:
+            station, mann_n = self.station, self.mann_n
+            self._subdivision = Subdivision(
+                station, self.elevation, [station.size], self.mann_station,
+                mann_n, [mann_n.size], [self.banks], self.units)
+        return self._subdivision
+
+    def _elevations(self, z, y):
+        """Return the water surface elevations given elevations or depths."""
+        if z is None and y is None:
+            raise ValueError('Give the water surface elevation z or the '
+                             'depth y')
+        if z is None:
+            return self.offset + np.asarray(y, dtype=np.float64)
+        return np.asarray(z, dtype=np.float64)
+
+    def properties(self, z=None, y=None):
+        """Compute all the hydraulic properties at once.
+
+        Returns
+        -------
+        dict
+            'area', 'perimeter', 'top_width' and 'conveyance' with a last
+            axis of size 3 (left overbank, channel, right overbank) and
+            'alpha', the velocity weighting coefficient.
         """
+        z = self._elevations(z, y)
+        values = self.subdivision().properties(z.reshape(1, -1))
+        result = {}
+        for name, value in values.items():
+            if value.ndim == 3:
+                result[name] = np.moveaxis(value[0], 0, -1).reshape(
+                    z.shape + (3,))
+            else:
+                result[name] = value[0].reshape(z.shape)
+        return result
+
+    def _property(self, name, z, y, subdivided):
+        """Return a property, by subsection or in total."""
+        value = self.properties(z, y)[name]
+        return value if subdivided else value.sum(axis=-1)
+
+    def area(self, z=None, y=None, subdivided=False):
+        """Flow area at water surface elevations `z` or depths `y`."""
+        return self._property('area', z, y, subdivided)
+
+    def perimeter(self, z=None, y=None, subdivided=False):
+        """Wetted perimeter at water surface elevations `z` or depths `y`."""
+        return self._property('perimeter', z, y, subdivided)
+
+    def top_width(self, z=None, y=None, subdivided=False):
+        """Top width at water surface elevations `z` or depths `y`."""
+        return self._property('top_width', z, y, subdivided)
+
+    def radius(self, z=None, y=None, subdivided=False):
+        """Hydraulic radius (area / wetted perimeter), 0 where dry."""
+        values = self.properties(z, y)
+        area, perimeter = values['area'], values['perimeter']
+        if not subdivided:
+            area, perimeter = area.sum(axis=-1), perimeter.sum(axis=-1)
+        return np.where(perimeter > 0, area / np.where(perimeter > 0,
+                                                       perimeter, 1.0), 0.0)
+
+    def conveyance(self, z=None, y=None, subdivided=False):
+        """Conveyance (Manning's equation) at water surface elevations `z`
+        or depths `y`. Overbanks are subdivided at every Manning's n
+        breakpoint, as in HEC-RAS."""
+        return self._property('conveyance', z, y, subdivided)
+
+    def plot(self, ax=None):
+        """Plot the cross section with matplotlib."""
+        import matplotlib.pyplot as plt
+        if ax is None:
+            ax = plt.gca()
+        ax.plot(self.station, self.elevation, 'k.-')
+        for bank in self.banks:
+            if not np.isnan(bank):
+                ax.axvline(bank, color='r', linestyle=':')
+        ax.set_xlabel('Station')
+        ax.set_ylabel('Elevation')
+        if self.name is not None:
+            ax.set_title(self.name)
+        return ax
+
+
+__all__ = ['CrossSection', 'LOB', 'CHANNEL', 'ROB']
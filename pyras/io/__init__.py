@@ -0,0 +1 @@
+from .hecras.catalog import ProjectCatalog, scan_projects
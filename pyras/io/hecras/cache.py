@@ -0,0 +1,413 @@
+"""
+Persistent cache of parsed HEC-RAS text files.
+
+Parsed results are stored as uncompressed npz files: the arrays of a result
+are packed in one buffer per dtype and the rest of the structure (dicts,
+lists, strings, numbers) is kept as a small JSON blob in the same file.
+Entries are keyed by the reader and its arguments, the absolute path, size
+and modification time of the parsed file and, optionally, a hash of its
+content.
+"""
+import hashlib
+import json
+import os
+import os.path as osp
+import tempfile
+
+import numpy as np
+
+from . import read_ras
+from ...util import replace_file
+
+
+# Bump when the layout of the entries or of the parsed results changes
+_CACHE_VERSION = 2
+
+_ENTRY_SUFFIX = '.npz'
+_META = '__meta__'
+
+
+def default_directory():
+    """Return the default cache directory, ~/.pyras/cache."""
+    return osp.join(osp.expanduser('~'), '.pyras', 'cache')
+
+
+def _content_hash(filename, block_size=1 << 20):
+    """Return the sha1 hex digest of the content of a file."""
+    sha = hashlib.sha1()
+    with open(filename, 'rb') as f:
+        while True:
+            data = f.read(block_size)
+            if not data:
+                break
+            sha.update(data)
+    return sha.hexdigest()
+
+
+def _add_buffer(array, buffers):
+    """Append an array to the buffer of its dtype and return a reference."""
+    dtype = array.dtype.str
+    arrays, size = buffers.get(dtype, ([], 0))
+    arrays.append(array.ravel())
+    buffers[dtype] = (arrays, size + array.size)
+    return [dtype, size, list(array.shape)]
+
+
+def _get_buffer(ref, buffers):
+    """Return the array of a reference returned by `_add_buffer`."""
+    dtype, start, shape = ref
+    size = int(np.prod(shape))
+    return buffers[dtype][start:start + size].reshape(shape)
+
+
+def _pack_column(values, buffers):
+    """Pack the values of a key of a list of records as a column."""
+    first = values[0]
+    if isinstance(first, np.ndarray):
+        dtype, ndim = first.dtype, first.ndim
+        if all(isinstance(v, np.ndarray) and v.dtype == dtype and
+               v.ndim == ndim for v in values):
+            shapes = np.array([v.shape for v in values],
+                              dtype=np.int64).reshape(len(values), ndim)
+            sizes = np.array([v.size for v in values], dtype=np.int64)
+            offsets = np.concatenate([[0], np.cumsum(sizes)])
+            data = np.concatenate([v.ravel() for v in values])
+            return {'__ragged__': [_add_buffer(data, buffers),
+                                   _add_buffer(offsets, buffers),
+                                   _add_buffer(shapes, buffers)]}
+    elif isinstance(first, str):
+        if all(isinstance(v, str) for v in values):
+            encoded = [v.encode('utf-8') for v in values]
+            sizes = np.array([len(v) for v in encoded], dtype=np.int64)
+            offsets = np.concatenate([[0], np.cumsum(sizes)])
+            data = np.frombuffer(b''.join(encoded), dtype=np.uint8)
+            return {'__text__': [_add_buffer(data, buffers),
+                                 _add_buffer(offsets, buffers)]}
+    elif isinstance(first, (int, float)) and not isinstance(first, bool):
+        kind = type(first)
+        if all(type(v) is kind for v in values):
+            return {'__scalar__': _add_buffer(np.array(values), buffers)}
+    return [_pack(value, buffers) for value in values]
+
+
+def _pack(obj, buffers):
+    """Replace the arrays of a parsed result by references into `buffers`.
+
+    `buffers` maps a dtype string to the list of raveled arrays of that dtype
+    and their total size. Lists of records with the same keys (e.g. the nodes
+    of a geometry file) are stored column by column.
+    """
+    if isinstance(obj, np.ndarray):
+        return {'__array__': _add_buffer(obj, buffers)}
+    elif isinstance(obj, dict):
+        return {'__dict__': [[key, _pack(value, buffers)]
+                             for key, value in obj.items()]}
+    elif isinstance(obj, tuple):
+        return {'__tuple__': [_pack(value, buffers) for value in obj]}
+    elif isinstance(obj, list):
+        if obj and all(isinstance(value, dict) for value in obj):
+            keys = list(obj[0])
+            if all(list(value) == keys for value in obj):
+                columns = [[key, _pack_column([value[key] for value in obj],
+                                              buffers)]
+                           for key in keys]
+                return {'__records__': [len(obj), columns]}
+        return [_pack(value, buffers) for value in obj]
+    elif isinstance(obj, np.generic):
+        return obj.item()
+    return obj
+
+
+def _unpack(obj, buffers):
+    """Inverse of `_pack`, arrays are views into the loaded buffers."""
+    if isinstance(obj, list):
+        return [_unpack(value, buffers) for value in obj]
+    elif isinstance(obj, dict):
+        if '__array__' in obj:
+            return _get_buffer(obj['__array__'], buffers)
+        elif '__dict__' in obj:
+            return dict((key, _unpack(value, buffers))
+                        for key, value in obj['__dict__'])
+        elif '__tuple__' in obj:
+            return tuple(_unpack(value, buffers)
+                         for value in obj['__tuple__'])
+        elif '__records__' in obj:
+            length, columns = obj['__records__']
+            columns = [(key, _Column(column, buffers))
+                       for key, column in columns]
+            return RecordList(length, columns)
+    return obj
+
+
+class _Column(object):
+    """Values of a key of a RecordList, decoded on access."""
+
+    def __init__(self, column, buffers):
+        self._values = self._scalars = None
+        self._data = self._offsets = self._shapes = None
+        if isinstance(column, list):
+            self._values = [_unpack(value, buffers) for value in column]
+        elif '__ragged__' in column:
+            data, offsets, shapes = column['__ragged__']
+            self._data = _get_buffer(data, buffers)
+            self._offsets = _get_buffer(offsets, buffers)
+            self._shapes = _get_buffer(shapes, buffers)
+        elif '__text__' in column:
+            data, offsets = column['__text__']
+            self._data = _get_buffer(data, buffers)
+            self._offsets = _get_buffer(offsets, buffers)
+        elif '__scalar__' in column:
+            self._scalars = _get_buffer(column['__scalar__'], buffers)
+
+    def __getitem__(self, i):
+        if self._values is not None:
+            return self._values[i]
+        elif self._scalars is not None:
+            return self._scalars[i].item()
+        start, stop = int(self._offsets[i]), int(self._offsets[i + 1])
+        if self._shapes is not None:
+            shape = tuple(self._shapes[i].tolist())
+            return self._data[start:stop].reshape(shape)
+        return self._data[start:stop].tobytes().decode('utf-8')
+
+
+class RecordList(object):
+    """Read only list of records loaded from the cache.
+
+    Records are dicts built on access from column buffers, so loading a
+    cached geometry does not depend on its number of nodes. Arrays in the
+    records are views into the buffers of the cache entry.
+    """
+
+    def __init__(self, length, columns):
+        self._length = length
+        self._columns = columns
+
+    def __len__(self):
+        return self._length
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(self._length))]
+        if i < 0:
+            i += self._length
+        if not 0 <= i < self._length:
+            raise IndexError('record index out of range')
+        return dict((key, column[i]) for key, column in self._columns)
+
+    def __iter__(self):
+        for i in range(self._length):
+            yield self[i]
+
+    def column(self, key):
+        """Return the values of a key for all the records."""
+        for name, column in self._columns:
+            if name == key:
+                return [column[i] for i in range(self._length)]
+        raise KeyError(key)
+
+
+class ParseCache(object):
+    """Cache of parsed project, plan, flow and geometry files.
+
+    Parameters
+    ----------
+    directory : str, optional
+        Where to store the entries. Default is ~/.pyras/cache.
+    max_size : int, optional
+        Maximum total size of the entries in bytes. The least recently used
+        entries are evicted when the cache grows past it. Default is 1 GB.
+    use_hash : bool, optional
+        Also key the entries by a sha1 of the file content, to catch changes
+        that keep the size and modification time. Default is False.
+
+    Examples
+    --------
+    >>> cache = ParseCache()
+    >>> nodes = cache.read_geometry('model.g01')  # parsed and stored
+    >>> nodes = cache.read_geometry('model.g01')  # loaded from the cache
+    >>> cache.hits, cache.misses
+    (1, 1)
+    """
+
+    def __init__(self, directory=None, max_size=1 << 30, use_hash=False):
+        super(ParseCache, self).__init__()
+        if directory is None:
+            directory = default_directory()
+        self.directory = directory
+        self.max_size = max_size
+        self.use_hash = use_hash
+        self.hits = 0
+        self.misses = 0
+
+        if not osp.isdir(directory):
+            os.makedirs(directory)
+
+    # %% Readers
+    def read_project(self, filename):
+        """Cached version of read_ras.read_project."""
+        return self.get(read_ras.read_project, filename)
+
+    def read_plan(self, filename):
+        """Cached version of read_ras.read_plan."""
+        return self.get(read_ras.read_plan, filename)
+
+    def read_boundary(self, filename, start=None):
+        """Cached version of read_ras.read_boundary.
+
+        The times of the boundaries depend on `start`, which is part of the
+        cache key.
+        """
+        if start is not None:
+            start = np.datetime64(start, 's')
+        return self.get(read_ras.read_boundary, filename, start)
+
+    def read_geometry(self, filename):
+        """Cached version of read_ras.read_geometry.
+
+        The nodes are returned as a RecordList, a read only sequence of node
+        records built on access, whether they were cached or not.
+        """
+        return self.get(read_ras.read_geometry, filename)
+
+    # %% Entries
+    def key(self, reader, filename, *args):
+        """Return the cache key of a file parsed with a reader and extra
+        arguments."""
+        path = osp.abspath(filename)
+        stat = os.stat(path)
+        mtime = getattr(stat, 'st_mtime_ns', stat.st_mtime)
+        parts = [str(_CACHE_VERSION), reader.__module__, reader.__name__,
+                 path, str(stat.st_size), str(mtime)]
+        parts.extend(str(arg) for arg in args)
+        if self.use_hash:
+            parts.append(_content_hash(path))
+        return hashlib.sha1('|'.join(parts).encode('utf-8')).hexdigest()
+
+    def _entry(self, key):
+        """Return the path of an entry."""
+        return osp.join(self.directory, key + _ENTRY_SUFFIX)
+
+    def get(self, reader, filename, *args):
+        """Return the parsed content of a file, using the cache if possible.
+
+        Parameters
+        ----------
+        reader : callable
+            Function taking a filename and returning the parsed result, e.g.
+            read_ras.read_geometry.
+        filename : str
+            Path to the file to parse.
+        *args
+            Extra arguments of the reader, part of the cache key.
+
+        Returns
+        -------
+        object
+            The result of the reader as it is loaded from the cache, also on
+            a miss, e.g. lists of records are RecordList objects.
+        """
+        key = self.key(reader, filename, *args)
+        entry = self._entry(key)
+
+        result = self._load(entry)
+        if result is not None:
+            self.hits += 1
+            return result
+
+        self.misses += 1
+        result = self._store(entry, reader(filename, *args))
+        self.evict()
+        return result
+
+    def _load(self, entry):
+        """Load an entry, returns None if missing or unreadable."""
+        try:
+            with np.load(entry, allow_pickle=False) as data:
+                meta = json.loads(data[_META].tobytes().decode('utf-8'))
+                buffers = dict((dtype, data['b{0}'.format(i)])
+                               for i, dtype in enumerate(meta['buffers']))
+        except (IOError, OSError, ValueError, KeyError):
+            return None
+
+        # Mark the entry as recently used
+        try:
+            os.utime(entry, None)
+        except OSError:
+            pass
+        return _unpack(meta['result'], buffers)
+
+    def _store(self, entry, result):
+        """Store a parsed result, return it as it is loaded from the entry."""
+        buffers = {}
+        packed = _pack(result, buffers)
+        dtypes = sorted(buffers)
+        meta = json.dumps({'buffers': dtypes, 'result': packed})
+        arrays = {_META: np.frombuffer(meta.encode('utf-8'), dtype=np.uint8)}
+        for i, dtype in enumerate(dtypes):
+            data, size = buffers[dtype]
+            arrays['b{0}'.format(i)] = np.concatenate(data)
+
+        # Write to a temporary file so readers never see a partial entry
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                np.savez(f, **arrays)
+            replace_file(tmp, entry)
+        except Exception:
+            if osp.isfile(tmp):
+                os.remove(tmp)
+            raise
+        buffers = dict((dtype, arrays['b{0}'.format(i)])
+                       for i, dtype in enumerate(dtypes))
+        return _unpack(json.loads(meta)['result'], buffers)
+
+    def _entries(self):
+        """Return (mtime, size, path) of the entries, oldest first."""
+        entries = []
+        for name in os.listdir(self.directory):
+            if name.endswith(_ENTRY_SUFFIX):
+                path = osp.join(self.directory, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+        return sorted(entries)
+
+    def evict(self):
+        """Remove the least recently used entries above the size limit."""
+        entries = self._entries()
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if total <= self.max_size:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+
+    def clear(self):
+        """Remove all the entries and reset the counters."""
+        for _, _, path in self._entries():
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+        self.hits = 0
+        self.misses = 0
+
+    def stats(self):
+        """Return the hit and miss counters and the size of the cache.
+
+        Returns
+        -------
+        dict
+            With keys 'hits', 'misses', 'entries' and 'size' (in bytes).
+        """
+        entries = self._entries()
+        return {'hits': self.hits,
+                'misses': self.misses,
+                'entries': len(entries),
+                'size': sum(size for _, size, _ in entries)}
@@ -0,0 +1,508 @@
+"""
+Catalog of the HEC-RAS projects found in directory trees.
+
+The catalog lists, for every project (*.prj), its plans and the geometry,
+flow and output files they use, with their sizes and modification times. It
+is kept in memory and saved to a SQLite file. Scanning again only parses the
+project and plan files whose size or modification time changed, the rest is
+refreshed with a single directory listing per project.
+"""
+import multiprocessing
+import os
+import os.path as osp
+import sqlite3
+
+from .read_ras import read_plan, read_project
+
+
+# Project file references and the kind of file they point to
+_PROJECT_FILES = (('Geom File', 'geometry'),
+                  ('Flow File', 'steady flow'),
+                  ('Unsteady File', 'unsteady flow'),
+                  ('QuasiSteady File', 'quasi-steady flow'))
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS projects (
+    path TEXT PRIMARY KEY,
+    is_ras INTEGER,
+    title TEXT,
+    units TEXT,
+    current_plan TEXT,
+    size INTEGER,
+    mtime REAL);
+CREATE TABLE IF NOT EXISTS plans (
+    project TEXT,
+    extension TEXT,
+    path TEXT,
+    title TEXT,
+    short_id TEXT,
+    geometry TEXT,
+    flow TEXT,
+    size INTEGER,
+    mtime REAL,
+    current INTEGER,
+    PRIMARY KEY (project, extension));
+CREATE TABLE IF NOT EXISTS files (
+    project TEXT,
+    plan TEXT,
+    kind TEXT,
+    extension TEXT,
+    path TEXT,
+    size INTEGER,
+    mtime REAL);
+CREATE INDEX IF NOT EXISTS files_project ON files (project);
+"""
+
+
+def _stamp(filename):
+    """Return the (size, mtime) of a file, None if it does not exist."""
+    try:
+        stat = os.stat(filename)
+    except OSError:
+        return None
+    return stat.st_size, stat.st_mtime
+
+
+def find_projects(roots):
+    """Return the paths of the *.prj files found under directory trees.
+
+    Parameters
+    ----------
+    roots : str or list of str
+        The directories to walk.
+
+    Returns
+    -------
+    list of str
+        The absolute paths of the files, sorted.
+    """
+    if isinstance(roots, str):
+        roots = [roots]
+    paths = []
+    for root in roots:
+        for dirpath, _, filenames in os.walk(osp.abspath(root)):
+            paths.extend(osp.join(dirpath, name) for name in filenames
+                         if name.lower().endswith('.prj'))
+    return sorted(paths)
+
+
+def _parse_project(path):
+    """Return the summary of a project file, None if not a HEC-RAS one.
+
+    GIS projection files share the *.prj extension, they have no
+    'Proj Title'.
+    """
+    try:
+        project = read_project(path)
+    except (IOError, OSError, ValueError):
+        return path, None
+    if project['Proj Title'] is None:
+        return path, None
+    summary = {'title': project['Proj Title'],
+               'units': project['units'],
+               'current_plan': project['Current Plan'],
+               'plans': list(project['Plan File'] or [])}
+    for key, kind in _PROJECT_FILES:
+        summary[kind] = list(project[key] or [])
+    return path, summary
+
+
+def _parse_plan(path):
+    """Return the summary of a plan file, None if it can not be read."""
+    try:
+        plan = read_plan(path)
+    except (IOError, OSError, ValueError):
+        return path, None
+    return path, {'title': plan['Plan Title'],
+                  'short_id': plan['Short Identifier'],
+                  'geometry': plan['Geom File'],
+                  'flow': plan['Flow File']}
+
+
+def _map(function, items, pool, processes):
+    """Map a function over items, in a pool if any."""
+    if pool is None or len(items) < 2:
+        return [function(item) for item in items]
+    n_workers = processes or multiprocessing.cpu_count()
+    chunksize = max(1, len(items) // (4 * n_workers))
+    return list(pool.imap_unordered(function, items, chunksize))
+
+
+class _Listing(object):
+    """Case insensitive lookup of the files of a directory.
+
+    HEC-RAS writes extensions in mixed case ('.O01', '.p01.hdf'), which
+    matters on case sensitive file systems.
+    """
+
+    def __init__(self, directory):
+        try:
+            names = os.listdir(directory)
+        except OSError:
+            names = []
+        self.directory = directory
+        self._names = dict((name.lower(), name) for name in names)
+
+    def record(self, base, extension, kind, plan=None):
+        """Return the file record of base.extension."""
+        name = self._names.get((base + '.' + extension).lower())
+        path = osp.join(self.directory, name or base + '.' + extension)
+        stamp = _stamp(path) if name else None
+        return {'kind': kind,
+                'plan': plan,
+                'extension': extension,
+                'path': path,
+                'size': stamp[0] if stamp else None,
+                'mtime': stamp[1] if stamp else None}
+
+
+class ProjectCatalog(object):
+    """Catalog of HEC-RAS projects.
+
+    Parameters
+    ----------
+    filename : str, optional
+        The SQLite file of the catalog. It is loaded if it exists and is the
+        default target of `save`.
+
+    Examples
+    --------
+    >>> catalog = ProjectCatalog('projects.sqlite')
+    >>> catalog.scan([r'\\\\server\\models'], processes=8)
+    >>> catalog.save()
+    >>> stale = [plan for _, plan in catalog.iter_plans()
+    ...          if not plan['current']]
+    """
+
+    def __init__(self, filename=None):
+        super(ProjectCatalog, self).__init__()
+        self.filename = filename
+        self.projects = {}
+        # (size, mtime) of the *.prj files that are not HEC-RAS projects
+        self._ignored = {}
+        if filename is not None and osp.isfile(filename):
+            self.load(filename)
+
+    def __len__(self):
+        return len(self.projects)
+
+    def __iter__(self):
+        return iter(sorted(self.projects))
+
+    def __getitem__(self, path):
+        return self.projects[osp.abspath(path)]
+
+    def iter_plans(self):
+        """Iterate over the (project, plan) records of the catalog."""
+        for path in sorted(self.projects):
+            project = self.projects[path]
+            for extension in sorted(project['plans']):
+                yield project, project['plans'][extension]
+
+    # %% Scan
+    def scan(self, roots, processes=None):
+        """Scan directory trees and update the catalog.
+
+        Parameters
+        ----------
+        roots : str or list of str
+            The directories to walk.
+        processes : int, optional
+            The number of worker processes parsing the files, by default the
+            number of CPUs. With 1 the files are parsed in the current
+            process.
+
+        Returns
+        -------
+        dict
+            The number of projects 'found', 'parsed' and 'removed', and of
+            plan files 'plans_parsed'.
+        """
+        if isinstance(roots, str):
+            roots = [roots]
+        roots = [osp.abspath(root) for root in roots]
+        paths = find_projects(roots)
+        stamps = dict((path, _stamp(path)) for path in paths)
+
+        changed = []
+        for path in paths:
+            known = self.projects.get(path)
+            if known is not None:
+                known_stamp = (known['size'], known['mtime'])
+            else:
+                known_stamp = self._ignored.get(path)
+            if stamps[path] is not None and known_stamp != stamps[path]:
+                changed.append(path)
+
+        # Only start workers if there is something to parse
+        pool = None
+        try:
+            if processes != 1 and len(changed) > 1:
+                pool = multiprocessing.Pool(processes)
+            summaries = dict(_map(_parse_project, changed, pool, processes))
+            plan_jobs = self._plan_jobs(paths, summaries)
+            if pool is None and processes != 1 and len(plan_jobs) > 1:
+                pool = multiprocessing.Pool(processes)
+            plans = dict(_map(_parse_plan, plan_jobs, pool, processes))
+        finally:
+            if pool is not None:
+                pool.close()
+                pool.join()
+
+        for path in changed:
+            summary = summaries.get(path)
+            if summary is None:
+                self.projects.pop(path, None)
+                self._ignored[path] = stamps[path]
+            else:
+                self._ignored.pop(path, None)
+                self.projects[path] = self._new_project(path, stamps[path],
+                                                        summary)
+
+        for path in paths:
+            if path in self.projects:
+                self._refresh(self.projects[path], plans)
+
+        # Projects of the scanned trees that were deleted
+        found = set(paths)
+        removed = [path for path in list(self.projects) + list(self._ignored)
+                   if path not in found and
+                   any(_is_under(path, root) for root in roots)]
+        for path in removed:
+            self.projects.pop(path, None)
+            self._ignored.pop(path, None)
+
+        return {'found': len(paths),
+                'parsed': len(changed),
+                'removed': len(removed),
+                'plans_parsed': len(plan_jobs)}
+
+    def _new_project(self, path, stamp, summary):
+        """Return the record of a newly parsed project."""
+        project = {'path': path,
+                   'title': summary['title'],
+                   'units': summary['units'],
+                   'current_plan': summary['current_plan'],
+                   'size': stamp[0],
+                   'mtime': stamp[1],
+                   'files': [],
+                   'plans': {}}
+        # Keep the parsed plans of the previous record, they are re-parsed
+        # only if their own file changed
+        previous = self.projects.get(path)
+        for extension in summary['plans']:
+            plan = None
+            if previous is not None:
+                plan = previous['plans'].get(extension)
+            project['plans'][extension] = plan or {'extension': extension}
+        for _, kind in _PROJECT_FILES:
+            project[kind] = summary[kind]
+        return project
+
+    def _plan_paths(self, path, extensions):
+        """Return the paths of plan files of a project."""
+        base = osp.splitext(path)[0]
+        return [(extension, base + '.' + extension) for extension in
+                extensions]
+
+    def _plan_jobs(self, paths, summaries):
+        """Return the plan files that need to be parsed."""
+        jobs = []
+        for path in paths:
+            if path in summaries:
+                if summaries[path] is None:
+                    continue
+                extensions = summaries[path]['plans']
+                known = self.projects.get(path, {'plans': {}})['plans']
+            elif path in self.projects:
+                known = self.projects[path]['plans']
+                extensions = list(known)
+            else:
+                continue
+            for extension, plan_path in self._plan_paths(path, extensions):
+                plan = known.get(extension, {})
+                stamp = _stamp(plan_path)
+                if stamp is not None and stamp != (plan.get('size'),
+                                                   plan.get('mtime')):
+                    jobs.append(plan_path)
+        return jobs
+
+    def _refresh(self, project, parsed):
+        """Update the plans and the file records of a project."""
+        path = project['path']
+        base = osp.splitext(osp.basename(path))[0]
+        listing = _Listing(osp.dirname(path))
+
+        files = []
+        for _, kind in _PROJECT_FILES:
+            files.extend(listing.record(base, extension, kind)
+                         for extension in project[kind])
+        project['files'] = files
+        stamps = dict((record['extension'], record['mtime'])
+                      for record in files)
+
+        for extension, plan_path in self._plan_paths(path,
+                                                     list(project['plans'])):
+            plan = project['plans'][extension]
+            record = listing.record(base, extension, 'plan')
+            if plan_path in parsed:
+                summary = parsed[plan_path] or {}
+                plan.update({'title': summary.get('title'),
+                             'short_id': summary.get('short_id'),
+                             'geometry': summary.get('geometry'),
+                             'flow': summary.get('flow')})
+            plan.update({'path': record['path'],
+                         'size': record['size'],
+                         'mtime': record['mtime']})
+            for key in ('title', 'short_id', 'geometry', 'flow'):
+                plan.setdefault(key, None)
+
+            number = extension[1:]
+            outputs = [listing.record(base, 'O' + number, 'output',
+                                      extension),
+                       listing.record(base, extension + '.hdf', 'hdf output',
+                                      extension)]
+            plan['outputs'] = [output for output in outputs
+                               if output['mtime'] is not None]
+
+            # The outputs are current if newer than the plan and its inputs
+            inputs = [plan['mtime'], stamps.get(plan['geometry']),
+                      stamps.get(plan['flow'])]
+            inputs = [mtime for mtime in inputs if mtime is not None]
+            plan['current'] = bool(plan['outputs']) and all(
+                max(output['mtime'] for output in plan['outputs']) >= mtime
+                for mtime in inputs)
+
+    # %% SQLite
+    def save(self, filename=None):
+        """Save the catalog to a SQLite file.
+
+        Parameters
+        ----------
+        filename : str, optional
+            The SQLite file, by default the one the catalog was created with.
+        """
+        filename = filename or self.filename
+        if filename is None:
+            raise ValueError('No catalog file given')
+
+        connection = sqlite3.connect(filename)
+        try:
+            with connection:
+                connection.executescript(_SCHEMA)
+                for table in ('projects', 'plans', 'files'):
+                    connection.execute('DELETE FROM ' + table)
+
+                connection.executemany(
+                    'INSERT INTO projects VALUES (?, 0, NULL, NULL, NULL, '
+                    '?, ?)',
+                    [(path, stamp[0], stamp[1])
+                     for path, stamp in self._ignored.items()])
+                connection.executemany(
+                    'INSERT INTO projects VALUES (?, 1, ?, ?, ?, ?, ?)',
+                    [(p['path'], p['title'], p['units'], p['current_plan'],
+                      p['size'], p['mtime']) for p in self.projects.values()])
+
+                plans = []
+                files = [dict(record, project=project['path'])
+                         for project in self.projects.values()
+                         for record in project['files']]
+                for project, plan in self.iter_plans():
+                    plans.append((project['path'], plan['extension'],
+                                  plan['path'], plan['title'],
+                                  plan['short_id'], plan['geometry'],
+                                  plan['flow'], plan['size'], plan['mtime'],
+                                  int(plan['current'])))
+                    files.extend(dict(record, project=project['path'])
+                                 for record in plan['outputs'])
+                connection.executemany(
+                    'INSERT INTO plans VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                    plans)
+                connection.executemany(
+                    'INSERT INTO files VALUES (:project, :plan, :kind, '
+                    ':extension, :path, :size, :mtime)', files)
+        finally:
+            connection.close()
+        self.filename = filename
+
+    def load(self, filename):
+        """Load a catalog saved with `save`, replacing the current content."""
+        connection = sqlite3.connect(filename)
+        try:
+            connection.executescript(_SCHEMA)
+            projects, ignored = {}, {}
+            for row in connection.execute(
+                    'SELECT path, is_ras, title, units, current_plan, size, '
+                    'mtime FROM projects'):
+                path, is_ras, title, units, current_plan, size, mtime = row
+                if not is_ras:
+                    ignored[path] = (size, mtime)
+                    continue
+                project = {'path': path, 'title': title, 'units': units,
+                           'current_plan': current_plan, 'size': size,
+                           'mtime': mtime, 'files': [], 'plans': {}}
+                for _, kind in _PROJECT_FILES:
+                    project[kind] = []
+                projects[path] = project
+
+            for row in connection.execute(
+                    'SELECT project, extension, path, title, short_id, '
+                    'geometry, flow, size, mtime, current FROM plans'):
+                project = projects.get(row[0])
+                if project is None:
+                    continue
+                keys = ('extension', 'path', 'title', 'short_id', 'geometry',
+                        'flow', 'size', 'mtime')
+                plan = dict(zip(keys, row[1:9]))
+                plan['current'] = bool(row[9])
+                plan['outputs'] = []
+                project['plans'][plan['extension']] = plan
+
+            for row in connection.execute(
+                    'SELECT project, plan, kind, extension, path, size, mtime '
+                    'FROM files'):
+                project = projects.get(row[0])
+                if project is None:
+                    continue
+                record = dict(zip(('plan', 'kind', 'extension', 'path',
+                                   'size', 'mtime'), row[1:]))
+                if record['plan'] is None:
+                    project['files'].append(record)
+                    project[record['kind']].append(record['extension'])
+                elif record['plan'] in project['plans']:
+                    project['plans'][record['plan']]['outputs'].append(record)
+        finally:
+            connection.close()
+        self.projects = projects
+        self._ignored = ignored
+
+
+def _is_under(path, root):
+    """Check if a path is inside a directory tree."""
+    root = osp.join(root, '')
+    return osp.normcase(path).startswith(osp.normcase(root))
+
+
+def scan_projects(roots, filename=None, processes=None):
+    """Scan directory trees for HEC-RAS projects.
+
+    Parameters
+    ----------
+    roots : str or list of str
+        The directories to walk.
+    filename : str, optional
+        The SQLite file of the catalog. If it exists only the files changed
+        since the previous scan are parsed, and the updated catalog is saved
+        to it.
+    processes : int, optional
+        The number of worker processes, see ProjectCatalog.scan.
+
+    Returns
+    -------
+    ProjectCatalog
+    """
+    catalog = ProjectCatalog(filename)
+    catalog.scan(roots, processes)
+    if filename is not None:
+        catalog.save()
+    return catalog
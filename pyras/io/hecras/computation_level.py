@@ -0,0 +1,319 @@
+"""
+Streaming reader of computation level output exported with
+Output_ComputationLevel_Export.
+
+The exported comma delimited file can be several GB, so it is read by chunks
+of lines decoded into columnar numpy arrays: river, reach and river station
+as integer codes into categories shared by all the chunks, the date and time
+as datetime64 and the output variables (flow, stage, area, top width) as
+floats. The chunks can also be written to an on-disk column store that is
+opened as memory maps.
+"""
+from itertools import islice
+import json
+import os
+import os.path as osp
+
+import numpy as np
+
+from .read_ras import parse_datetime
+
+
+# Names of the key columns in the header of the exported file
+_KEY_COLUMNS = {'river': 'river',
+                'reach': 'reach',
+                'rs': 'rs',
+                'river station': 'rs',
+                'riverstation': 'rs',
+                'date': 'date',
+                'time': 'time',
+                'date/time': 'time',
+                'date time': 'time',
+                'datetime': 'time'}
+
+_CATEGORICAL = ('river', 'reach', 'rs')
+
+_STORE_META = 'columns.json'
+_STORE_VERSION = 1
+
+
+def _decode(value):
+    """Convert a field to a stripped str."""
+    return value.decode('latin-1').strip().strip('"').strip()
+
+
+def _parse_time(text):
+    """Parse a "01JAN2000 0100" or "01JAN2000,01:00" date and time."""
+    items = text.replace(',', ' ').split()
+    if not items:
+        return np.datetime64('NaT', 's')
+    return parse_datetime(items[0], items[1] if len(items) > 1 else '')
+
+
+class ComputationLevelReader(object):
+    """Chunked reader of a computation level export.
+
+    Parameters
+    ----------
+    filename : str
+        Path to the exported file.
+    chunk_size : int, optional
+        The number of lines per chunk, memory usage is proportional to it.
+    dtype : numpy dtype, optional
+        The type of the output variables, float64 by default. float32 halves
+        the size of the chunks and of the column store.
+    names : list of str, optional
+        The names of the columns, if the file has no header line. Key
+        columns are 'River', 'Reach', 'RS' and 'Date/Time'.
+
+    Attributes
+    ----------
+    categories : dict
+        Maps 'river', 'reach' and 'rs' to the list of values their codes
+        refer to. The lists grow while the file is read.
+
+    Examples
+    --------
+    >>> reader = ComputationLevelReader('complevel.txt')
+    >>> peak = None
+    >>> for chunk in reader:
+    ...     flow = chunk['Flow'].max()
+    ...     peak = flow if peak is None else max(peak, flow)
+    """
+
+    def __init__(self, filename, chunk_size=1 << 16, dtype=np.float64,
+                 names=None):
+        super(ComputationLevelReader, self).__init__()
+        self.filename = filename
+        self.chunk_size = int(chunk_size)
+        self.dtype = np.dtype(dtype)
+        self.names = names
+        self.categories = dict((key, []) for key in _CATEGORICAL)
+        self._codes = dict((key, {}) for key in _CATEGORICAL)
+        self._times = {}
+        self._time_values = np.empty(0, dtype='datetime64[s]')
+        self._n_columns = 0
+
+    def __iter__(self):
+        """Iterate over the chunks of the file.
+
+        Yields
+        ------
+        dict
+            Maps the column names to arrays of equal length: 'river',
+            'reach' and 'rs' codes (int32), 'time' (datetime64[s]) if the
+            file has dates and one float array per output variable, named as
+            in the header, e.g. 'Flow' or 'Top Width'.
+        """
+        with open(self.filename, 'rb') as f:
+            if self.names is None:
+                first = f.readline()
+                names = [_decode(name) for name in first.split(b',')]
+            else:
+                names = list(self.names)
+            columns = self._columns(names)
+            self._n_columns = len(names)
+            while True:
+                lines = list(islice(f, self.chunk_size))
+                if not lines:
+                    break
+                chunk = self._parse(lines, columns)
+                if chunk is not None:
+                    yield chunk
+
+    def _columns(self, names):
+        """Return the (key, index) of the columns, joining date and time."""
+        keys = [_KEY_COLUMNS.get(name.lower(), name) for name in names]
+        if not any(key in _CATEGORICAL for key in keys):
+            raise ValueError('No river, reach or RS column in "{0}", '
+                             'give the column names'.format(self.filename))
+        columns = []
+        for i, key in enumerate(keys):
+            if key == 'date':
+                key = 'time'
+                if 'time' in keys:
+                    i = (i, keys.index('time'))
+            elif key == 'time' and 'date' in keys:
+                continue
+            columns.append((key, i))
+        return columns
+
+    def _parse(self, lines, columns):
+        """Decode a chunk of lines into columns, None if all blank."""
+        data = b''.join(lines).replace(b'\r', b'')
+        if b'\n\n' in data or data.startswith(b'\n'):
+            data = b'\n'.join(line for line in data.split(b'\n') if line)
+        if not data:
+            return None
+        if not data.endswith(b'\n'):
+            data += b'\n'
+        # Split all the fields at once, then take the columns by slicing
+        fields = data.replace(b'\n', b',').split(b',')
+        fields.pop()
+        n_columns = self._n_columns
+        if len(fields) != data.count(b'\n') * n_columns:
+            raise ValueError('Lines with a varying number of fields in '
+                             '"{0}"'.format(self.filename))
+
+        chunk = {}
+        for key, i in columns:
+            if key in _CATEGORICAL:
+                chunk[key] = self._encode(key, fields[i::n_columns])
+            elif key == 'time':
+                if isinstance(i, tuple):
+                    values = [date + b' ' + time for date, time in
+                              zip(fields[i[0]::n_columns],
+                                  fields[i[1]::n_columns])]
+                else:
+                    values = fields[i::n_columns]
+                chunk[key] = self._parse_times(values)
+            else:
+                chunk[key] = self._floats(fields[i::n_columns])
+        return chunk
+
+    def _encode(self, key, values):
+        """Convert values to codes into the categories of a column."""
+        codes = self._codes[key]
+        n_codes = len(codes)
+        result = np.fromiter((codes.setdefault(value, len(codes))
+                              for value in values), dtype=np.int32,
+                             count=len(values))
+        if len(codes) > n_codes:
+            new = list(codes)[n_codes:]
+            self.categories[key].extend(_decode(value) for value in new)
+        return result
+
+    def _parse_times(self, values):
+        """Convert date and time strings to datetime64, parsing each once."""
+        codes = self._times
+        n_codes = len(codes)
+        result = np.fromiter((codes.setdefault(value, len(codes))
+                              for value in values), dtype=np.int64,
+                             count=len(values))
+        if len(codes) > n_codes:
+            new = list(codes)[n_codes:]
+            self._time_values = np.concatenate([
+                self._time_values,
+                np.array([_parse_time(_decode(value)) for value in new],
+                         dtype='datetime64[s]')])
+        return self._time_values[result]
+
+    def _floats(self, values):
+        """Convert a column of fields to floats, blanks are NaN."""
+        try:
+            return np.array(list(map(float, values)), dtype=self.dtype)
+        except ValueError:
+            values = np.char.strip(np.array(values, dtype=np.bytes_))
+            values[values == b''] = b'nan'
+            return values.astype(self.dtype)
+
+    def decode(self, key, codes):
+        """Return the values of codes of a 'river', 'reach' or 'rs' column."""
+        return np.asarray(self.categories[key], dtype=np.str_)[codes]
+
+
+class ColumnStore(object):
+    """Column store built with `build_column_store`, opened as memory maps.
+
+    Parameters
+    ----------
+    directory : str
+        The directory of the store.
+
+    Attributes
+    ----------
+    columns : dict
+        Maps the column names to read only memory maps.
+    categories : dict
+        The values of the 'river', 'reach' and 'rs' codes.
+    """
+
+    def __init__(self, directory):
+        super(ColumnStore, self).__init__()
+        self.directory = directory
+        with open(osp.join(directory, _STORE_META), 'r') as f:
+            meta = json.load(f)
+        if meta.get('version') != _STORE_VERSION:
+            raise ValueError('Unsupported column store version in '
+                             '"{0}"'.format(directory))
+        self.length = meta['length']
+        self.categories = meta['categories']
+        self.columns = {}
+        for column in meta['columns']:
+            dtype = np.dtype(column['dtype'])
+            path = osp.join(directory, column['file'])
+            if self.length:
+                values = np.memmap(path, dtype=dtype, mode='r',
+                                   shape=(self.length,))
+            else:
+                values = np.empty(0, dtype=dtype)
+            self.columns[column['name']] = values
+
+    def __len__(self):
+        return self.length
+
+    def __getitem__(self, name):
+        return self.columns[name]
+
+    def __contains__(self, name):
+        return name in self.columns
+
+    def keys(self):
+        """Return the column names."""
+        return list(self.columns)
+
+    def decode(self, key, codes):
+        """Return the values of codes of a 'river', 'reach' or 'rs' column."""
+        return np.asarray(self.categories[key], dtype=np.str_)[codes]
+
+
+def build_column_store(filename, directory, chunk_size=1 << 16,
+                       dtype=np.float64, names=None):
+    """Convert a computation level export to an on-disk column store.
+
+    Every column is written to a raw binary file chunk by chunk, so memory
+    usage does not depend on the size of the export.
+
+    Parameters
+    ----------
+    filename : str
+        Path to the exported file.
+    directory : str
+        The directory of the store, created if needed.
+    chunk_size, dtype, names
+        See ComputationLevelReader.
+
+    Returns
+    -------
+    ColumnStore
+    """
+    if not osp.isdir(directory):
+        os.makedirs(directory)
+    reader = ComputationLevelReader(filename, chunk_size, dtype, names)
+    files = {}
+    columns = []
+    length = 0
+    try:
+        for chunk in reader:
+            for name, values in chunk.items():
+                if name not in files:
+                    column = {'name': name,
+                              'file': '{0:02d}.bin'.format(len(columns)),
+                              'dtype': values.dtype.str}
+                    columns.append(column)
+                    files[name] = open(osp.join(directory, column['file']),
+                                       'wb')
+                values.tofile(files[name])
+            length += len(values)
+    finally:
+        for f in files.values():
+            f.close()
+
+    meta = {'version': _STORE_VERSION,
+            'source': osp.abspath(filename),
+            'length': length,
+            'columns': columns,
+            'categories': reader.categories}
+    with open(osp.join(directory, _STORE_META), 'w') as f:
+        json.dump(meta, f)
+    return ColumnStore(directory)
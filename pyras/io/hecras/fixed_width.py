@@ -0,0 +1,171 @@
+"""
+Decoder for the fixed width numeric tables of HEC-RAS text files.
+
+Numeric tables (#Sta/Elev=, #Mann=, Levee=, hydrographs, ...) are written in
+columns of 8 or 16 characters, so contiguous values like '-123.456-12.3456'
+are valid and can not be split on whitespace. The whole table is decoded as a
+single buffer: the bytes are viewed as an array of fixed width strings with
+`np.frombuffer` and converted in one pass, instead of value by value.
+"""
+import numpy as np
+
+
+_SPACE = ord(' ')
+
+
+def _fields(data, width):
+    """Return a view of `data` as an array of `width` bytes strings."""
+    if isinstance(data, np.ndarray):
+        buf = data.view(np.uint8).ravel()
+    else:
+        buf = np.frombuffer(data, dtype=np.uint8)
+    remainder = buf.size % width
+    if remainder:
+        pad = np.full(width - remainder, _SPACE, dtype=np.uint8)
+        buf = np.concatenate([buf, pad])
+    return buf.view('S{0}'.format(width))
+
+
+def decode(data, width, count=None):
+    """Decode a buffer of fixed width numeric fields into a float64 array.
+
+    Parameters
+    ----------
+    data : bytes, bytearray, memoryview or ndarray
+        Contiguous buffer of fields without line terminators. The buffer is
+        padded with blanks if its length is not a multiple of `width`.
+    width : int
+        The width of a field, 8 or 16 in HEC-RAS files.
+    count : int, optional
+        The number of values to return. By default all fields are decoded.
+
+    Returns
+    -------
+    ndarray of float64
+        The decoded values, blank fields are NaN.
+
+    Raises
+    ------
+    ValueError
+        If a field is not a valid number.
+    """
+    fields = _fields(data, width)
+    if count is not None:
+        fields = fields[:count]
+
+    try:
+        return fields.astype(np.float64)
+    except ValueError:
+        pass
+
+    # Blank fields are the usual culprit, they are decoded as NaN
+    chars = fields.view(np.uint8).reshape(-1, width)
+    blank = (chars == _SPACE).all(axis=1)
+    fields = fields.copy()
+    fields[blank] = b'nan'
+    try:
+        return fields.astype(np.float64)
+    except ValueError:
+        for i, field in enumerate(fields):
+            try:
+                float(field)
+            except ValueError:
+                msg = 'Invalid number {0!r} in field {1} of a fixed width ' \
+                      'table'.format(field.decode('latin-1'), i)
+                raise ValueError(msg)
+        raise
+
+
+def read_block(lines, start, count, width):
+    """Read a table of `count` fixed width values from a list of lines.
+
+    Parameters
+    ----------
+    lines : list of bytes
+        The lines of the file, with or without line terminators.
+    start : int
+        The index of the first line of the table.
+    count : int
+        The number of values in the table.
+    width : int
+        The width of a field.
+
+    Returns
+    -------
+    values : ndarray of float64
+        The decoded values.
+    stop : int
+        The index of the first line after the table.
+
+    Notes
+    -----
+    The number of values per line is not fixed between tables (10 for
+    station/elevation, 9 for Manning's n, 4 for coordinates), so it is
+    worked out from the length of every line.
+    """
+    rows = []
+    n_fields = 0
+    i = start
+    n_lines = len(lines)
+    while n_fields < count and i < n_lines:
+        line = lines[i].rstrip(b'\r\n')
+        n = -(-len(line) // width)
+        rows.append(line.ljust(n * width))
+        n_fields += n
+        i += 1
+    values = decode(b''.join(rows), width, count)
+    return values, i
+
+
+def format_field(value, width):
+    """Format a number to fit in a fixed width field, right aligned.
+
+    The largest number of decimals that fits is used, trailing zeros and the
+    leading zero of numbers below 1 are dropped as HEC-RAS does.
+
+    Raises
+    ------
+    ValueError
+        If the integer part of the number does not fit in the field.
+    """
+    if value != value:
+        return ' ' * width
+    for decimals in range(width - 1, -1, -1):
+        text = '{0:.{1}f}'.format(value, decimals)
+        if '.' in text:
+            text = text.rstrip('0').rstrip('.')
+        if text in ('-0', ''):
+            text = '0'
+        if text.startswith('0.'):
+            text = text[1:]
+        elif text.startswith('-0.'):
+            text = '-' + text[2:]
+        if len(text) <= width:
+            return text.rjust(width)
+    raise ValueError('{0!r} does not fit in {1} characters'.format(value,
+                                                                   width))
+
+
+def encode(values, width, per_line, newline=b'\r\n'):
+    """Encode values as the lines of a fixed width table.
+
+    Parameters
+    ----------
+    values : sequence of float
+        The values of the table, NaN are written as blank fields.
+    width : int
+        The width of a field.
+    per_line : int
+        The number of values per line.
+    newline : bytes, optional
+        The line terminator. Default is b'\\r\\n'.
+
+    Returns
+    -------
+    bytes
+        The lines of the table, each one terminated by `newline`.
+    """
+    fields = [format_field(float(value), width) for value in values]
+    lines = [''.join(fields[i:i + per_line]).encode('ascii') + newline
+             for i in range(0, len(fields), per_line)]
+    return b''.join(lines)
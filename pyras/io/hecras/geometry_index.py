@@ -0,0 +1,272 @@
+"""
+Byte offset index for random access into HEC-RAS geometry files (*.g##).
+
+The index records where every "Type RM Length L Ch R" block starts and how
+long it is, so a single node can be decoded from a memory mapped file without
+parsing the rest of the geometry. The index is saved next to the geometry file
+and reused as long as the size and modification time of the geometry file do
+not change.
+"""
+import mmap
+import os
+
+import numpy as np
+
+from .read_ras import _BLOCK_KEYS, _NODE_KEY, _REACH_KEY, _parse_node
+
+
+INDEX_SUFFIX = '.pyrasidx'
+
+
+def _file_stamp(filename):
+    """Return the size and modification time of a file."""
+    stat = os.stat(filename)
+    return stat.st_size, stat.st_mtime
+
+
+class GeometryIndex(object):
+    """Location of the node blocks of a geometry file.
+
+    Parameters
+    ----------
+    river, reach, rs : array of str
+        The river, reach and river station of every node.
+    node_type : array of int
+        The node type of every node (see read_ras.NODE_TYPES).
+    offset : array of int
+        The byte offset of the first line of every node block.
+    length : array of int
+        The length in bytes of every node block.
+    size : int
+        The size of the geometry file when the index was built.
+    mtime : float
+        The modification time of the geometry file when the index was built.
+    """
+
+    def __init__(self, river, reach, rs, node_type, offset, length, size,
+                 mtime):
+        self.river = np.asarray(river, dtype=np.str_)
+        self.reach = np.asarray(reach, dtype=np.str_)
+        self.rs = np.asarray(rs, dtype=np.str_)
+        self.node_type = np.asarray(node_type, dtype=np.int8)
+        self.offset = np.asarray(offset, dtype=np.int64)
+        self.length = np.asarray(length, dtype=np.int64)
+        self.size = int(size)
+        self.mtime = float(mtime)
+        self._positions = None
+
+    def __len__(self):
+        return self.offset.size
+
+    def __contains__(self, key):
+        return tuple(key) in self._lookup()
+
+    def _lookup(self):
+        """Return the (river, reach, rs) to position mapping."""
+        if self._positions is None:
+            keys = zip(self.river.tolist(), self.reach.tolist(),
+                       self.rs.tolist())
+            self._positions = dict((key, i) for i, key in enumerate(keys))
+        return self._positions
+
+    def position(self, river, reach, rs):
+        """Return the position of a node in the index.
+
+        Raises
+        ------
+        KeyError
+            If the node is not in the geometry file.
+        """
+        return self._lookup()[(river, reach, str(rs))]
+
+    def is_current(self, filename):
+        """Check if the index still matches the geometry file."""
+        try:
+            size, mtime = _file_stamp(filename)
+        except OSError:
+            return False
+        return size == self.size and mtime == self.mtime
+
+    def save(self, filename):
+        """Save the index to a file."""
+        with open(filename, 'wb') as f:
+            np.savez(f, river=self.river, reach=self.reach, rs=self.rs,
+                     node_type=self.node_type, offset=self.offset,
+                     length=self.length, size=self.size, mtime=self.mtime)
+
+    @staticmethod
+    def load(filename):
+        """Load an index saved with `save`."""
+        with np.load(filename, allow_pickle=False) as data:
+            return GeometryIndex(data['river'], data['reach'], data['rs'],
+                                 data['node_type'], data['offset'],
+                                 data['length'], data['size'], data['mtime'])
+
+
+def build_index(filename):
+    """Scan a geometry file and index its node blocks.
+
+    Parameters
+    ----------
+    filename : str
+        Path to the geometry file.
+
+    Returns
+    -------
+    GeometryIndex
+    """
+    size, mtime = _file_stamp(filename)
+    rivers, reaches, stations, types, offsets, lengths = [], [], [], [], [], []
+    river = reach = ''
+    start = None
+    offset = 0
+
+    with open(filename, 'rb') as f:
+        for line in f:
+            if line.startswith(_BLOCK_KEYS):
+                if start is not None:
+                    lengths.append(offset - start)
+                    start = None
+                value = line.rstrip(b'\r\n').partition(b'=')[2]
+                if line.startswith(_NODE_KEY):
+                    items = value.split(b',')
+                    rivers.append(river)
+                    reaches.append(reach)
+                    types.append(int(items[0]))
+                    stations.append(items[1].strip().decode('latin-1'))
+                    offsets.append(offset)
+                    start = offset
+                elif line.startswith(_REACH_KEY):
+                    river, _, reach = value.decode('latin-1').partition(',')
+                    river, reach = river.strip(), reach.strip()
+            offset += len(line)
+
+    if start is not None:
+        lengths.append(offset - start)
+
+    return GeometryIndex(rivers, reaches, stations, types, offsets, lengths,
+                         size, mtime)
+
+
+def index_filename(filename):
+    """Return the path of the sidecar index of a geometry file."""
+    return filename + INDEX_SUFFIX
+
+
+def load_index(filename, save=True):
+    """Return the index of a geometry file, reusing the sidecar if current.
+
+    Parameters
+    ----------
+    filename : str
+        Path to the geometry file.
+    save : bool, optional
+        Save a new sidecar index if it had to be built. Default is True.
+
+    Returns
+    -------
+    GeometryIndex
+    """
+    sidecar = index_filename(filename)
+    if os.path.isfile(sidecar):
+        try:
+            index = GeometryIndex.load(sidecar)
+        except (IOError, OSError, ValueError, KeyError):
+            index = None
+        if index is not None and index.is_current(filename):
+            return index
+
+    index = build_index(filename)
+    if save:
+        try:
+            index.save(sidecar)
+        except (IOError, OSError):
+            # Read only location, the index is still usable in memory
+            pass
+    return index
+
+
+class IndexedGeometry(object):
+    """Random access reader of a geometry file.
+
+    Parameters
+    ----------
+    filename : str
+        Path to the geometry file.
+    save_index : bool, optional
+        Save the sidecar index if it had to be built. Default is True.
+
+    Examples
+    --------
+    >>> with IndexedGeometry('model.g01') as geo:
+    ...     node = geo.read_node('Beaver Creek', 'Kentwood', '5.99')
+    """
+
+    def __init__(self, filename, save_index=True):
+        super(IndexedGeometry, self).__init__()
+        self.filename = filename
+        self.index = load_index(filename, save=save_index)
+        self._file = open(filename, 'rb')
+        if self.index.size:
+            self._map = mmap.mmap(self._file.fileno(), 0,
+                                  access=mmap.ACCESS_READ)
+        else:
+            self._map = b''
+
+    def __enter__(self):
+        """ """
+        return self
+
+    def __exit__(self, type, value, traceback):
+        """ """
+        self.close()
+
+    def __len__(self):
+        return len(self.index)
+
+    def close(self):
+        """Release the memory map of the geometry file."""
+        if isinstance(self._map, mmap.mmap):
+            self._map.close()
+        self._file.close()
+
+    def read_at(self, position):
+        """Decode the node at a position of the index.
+
+        Returns
+        -------
+        dict
+            The node record, see read_ras.iter_geometry.
+        """
+        index = self.index
+        start = int(index.offset[position])
+        block = self._map[start:start + int(index.length[position])]
+        lines = block.splitlines(True)
+        return _parse_node(lines, str(index.river[position]),
+                           str(index.reach[position]))
+
+    def read_node(self, river, reach, rs):
+        """Decode a single node given its river, reach and river station.
+
+        Raises
+        ------
+        KeyError
+            If the node is not in the geometry file.
+        """
+        return self.read_at(self.index.position(river, reach, rs))
+
+    def read_nodes(self, keys):
+        """Decode a list of (river, reach, rs) nodes in file order.
+
+        Returns
+        -------
+        list of dict
+            The node records, in the same order as `keys`.
+        """
+        positions = [self.index.position(*key) for key in keys]
+        # Read in file order so the pages of the map are visited once
+        order = np.argsort(self.index.offset[positions], kind='stable')
+        nodes = [None] * len(positions)
+        for i in order:
+            nodes[i] = self.read_at(positions[i])
+        return nodes
@@ -0,0 +1,341 @@
+"""
+Lazy reader of HEC-RAS 5 plan results (*.p##.hdf).
+
+Results are exposed as ResultView objects, light wrappers around the h5py
+datasets that only read from disk the chunks touched by a selection of
+locations and time steps. HEC-RAS is not needed, only h5py.
+"""
+import h5py
+import numpy as np
+
+from .read_ras import parse_datetime
+
+
+_UNSTEADY = 'Results/Unsteady/Output/Output Blocks/Base Output/' \
+            'Unsteady Time Series'
+_STEADY = 'Results/Steady/Output/Output Blocks/Base Output/Steady Profiles'
+_XS_ATTRIBUTES = 'Geometry/Cross Sections/Attributes'
+_CROSS_SECTIONS = 'Cross Sections'
+_FLOW_AREAS = '2D Flow Areas'
+
+
+def _decode(values):
+    """Convert an array of bytes to an array of stripped str."""
+    values = np.asarray(values)
+    if values.dtype.kind == 'S':
+        values = np.char.decode(values, 'latin-1')
+    return np.char.strip(values.astype(np.str_))
+
+
+class ResultView(object):
+    """Lazy view of a results dataset of shape (time, location).
+
+    Parameters
+    ----------
+    dataset : h5py.Dataset
+        The results dataset.
+    times : ndarray
+        The time coordinate of the first axis (datetime64 for unsteady plans,
+        profile names for steady plans).
+    time_index : slice, optional
+        The selected time steps.
+    location_index : ndarray of int, optional
+        The selected locations, all by default.
+
+    Notes
+    -----
+    Indexing a view (`view[10:20, 5]`) reads the selection straight from the
+    dataset, `sel` returns a narrower view without reading anything and
+    `read` (or `numpy.asarray`) reads the selection of a view.
+    """
+
+    def __init__(self, dataset, times, time_index=None, location_index=None):
+        self.dataset = dataset
+        self._times = times
+        if time_index is None:
+            time_index = slice(0, dataset.shape[0])
+        self.time_index = time_index
+        self.location_index = location_index
+
+    def __repr__(self):
+        return '<ResultView {0!r} shape={1}>'.format(self.name, self.shape)
+
+    def __getitem__(self, key):
+        return self.read()[key] if self._is_narrowed() else self.dataset[key]
+
+    def __array__(self, dtype=None, copy=None):
+        values = self.read()
+        return values if dtype is None else values.astype(dtype)
+
+    def _is_narrowed(self):
+        """Check if the view has a selection."""
+        start, stop, step = self.time_index.indices(self.dataset.shape[0])
+        return (self.location_index is not None or start != 0 or
+                stop != self.dataset.shape[0] or step != 1)
+
+    @property
+    def name(self):
+        """The name of the variable."""
+        return self.dataset.name.rsplit('/', 1)[-1]
+
+    @property
+    def units(self):
+        """The units of the variable, if stored in the file."""
+        units = self.dataset.attrs.get('Units')
+        if isinstance(units, bytes):
+            units = units.decode('latin-1')
+        return units
+
+    @property
+    def chunks(self):
+        """The chunk shape of the dataset, None if contiguous."""
+        return self.dataset.chunks
+
+    @property
+    def dtype(self):
+        """The data type of the dataset."""
+        return self.dataset.dtype
+
+    @property
+    def times(self):
+        """The selected time steps."""
+        return self._times[self.time_index]
+
+    @property
+    def shape(self):
+        """The shape of the selection."""
+        n_times = len(range(*self.time_index.indices(self.dataset.shape[0])))
+        if self.location_index is None:
+            n_locations = self.dataset.shape[1]
+        else:
+            n_locations = len(self.location_index)
+        return (n_times, n_locations) + self.dataset.shape[2:]
+
+    def sel(self, locations=None, start=None, end=None):
+        """Narrow the view to some locations and a time window.
+
+        Parameters
+        ----------
+        locations : sequence of int, optional
+            The indices of the locations, see PlanResults.xs_index.
+        start, end : datetime64 or str, optional
+            The time window, both ends included. For steady plans the
+            integer indices of the profiles.
+
+        Returns
+        -------
+        ResultView
+        """
+        first, last, _ = self.time_index.indices(self.dataset.shape[0])
+        times = self._times[first:last]
+        n_times = len(times)
+        if times.dtype.kind == 'M':
+            lo = 0 if start is None else int(
+                np.searchsorted(times, np.datetime64(start), side='left'))
+            hi = n_times if end is None else int(
+                np.searchsorted(times, np.datetime64(end), side='right'))
+        else:
+            lo = 0 if start is None else start
+            hi = n_times if end is None else end + 1
+        hi = max(lo, min(hi, n_times))
+        time_index = slice(first + lo, first + hi)
+
+        location_index = self.location_index
+        if locations is not None:
+            locations = np.asarray(locations, dtype=np.int64)
+            if location_index is not None:
+                locations = location_index[locations]
+            location_index = locations
+
+        return ResultView(self.dataset, self._times, time_index,
+                          location_index)
+
+    def read(self):
+        """Read the selection of the view.
+
+        Only the chunks containing the selected time steps and locations are
+        read. Locations are read in increasing order, as required by h5py,
+        and returned in the order they were selected.
+        """
+        if self.location_index is None:
+            return self.dataset[self.time_index]
+        unique, inverse = np.unique(self.location_index, return_inverse=True)
+        values = self.dataset[self.time_index, unique]
+        return values[:, inverse]
+
+    def iter_chunks(self):
+        """Iterate over the selection by blocks of whole time chunks.
+
+        Yields
+        ------
+        times : ndarray
+            The time steps of the block.
+        values : ndarray
+            The values of the block.
+        """
+        chunks = self.chunks
+        step = chunks[0] if chunks else self.shape[0] or 1
+        first, last, _ = self.time_index.indices(self.dataset.shape[0])
+        # Align the blocks to the chunk boundaries of the dataset
+        bound = (first // step + 1) * step
+        while first < last:
+            stop = min(bound, last)
+            view = ResultView(self.dataset, self._times, slice(first, stop),
+                              self.location_index)
+            yield self._times[first:stop], view.read()
+            first, bound = stop, bound + step
+
+
+class PlanResults(object):
+    """Results of a HEC-RAS 5 plan, read from its HDF5 file.
+
+    Parameters
+    ----------
+    filename : str
+        Path to the plan results file (*.p##.hdf).
+
+    Examples
+    --------
+    >>> with PlanResults('model.p01.hdf') as res:
+    ...     ws = res.cross_section('Water Surface')
+    ...     i = res.xs_index([('Bald Eagle', 'Loc Hav', '138154.4')])
+    ...     values = ws.sel(i, '2000-01-01', '2000-01-02').read()
+    """
+
+    def __init__(self, filename):
+        super(PlanResults, self).__init__()
+        self.filename = filename
+        self._file = h5py.File(filename, 'r')
+        if _UNSTEADY in self._file:
+            self._base = self._file[_UNSTEADY]
+            self.steady = False
+        elif _STEADY in self._file:
+            self._base = self._file[_STEADY]
+            self.steady = True
+        else:
+            self.close()
+            raise IOError('No results found in "{0}"'.format(filename))
+        self._times = None
+        self._xs = None
+        self._xs_lookup = None
+
+    def __enter__(self):
+        """ """
+        return self
+
+    def __exit__(self, type, value, traceback):
+        """ """
+        self.close()
+
+    def close(self):
+        """Close the HDF5 file."""
+        self._file.close()
+
+    # %% Coordinates
+    @property
+    def times(self):
+        """The output times (datetime64[s]), or profile names if steady."""
+        if self._times is None:
+            if self.steady:
+                self._times = _decode(self._base['Profile Names'][()])
+            else:
+                stamps = self._base['Time Date Stamp']
+                days = self._base['Time'][()]
+                date, _, time = _decode(stamps[0:1])[0].partition(' ')
+                start = parse_datetime(date, time)
+                seconds = np.round((days - days[0]) * 86400.0)
+                self._times = start + seconds.astype('timedelta64[s]')
+        return self._times
+
+    @property
+    def cross_sections(self):
+        """The (river, reach, rs) arrays of the cross sections."""
+        if self._xs is None:
+            if _XS_ATTRIBUTES in self._file:
+                attrs = self._file[_XS_ATTRIBUTES][()]
+                self._xs = (_decode(attrs['River']), _decode(attrs['Reach']),
+                            _decode(attrs['RS']))
+            else:
+                empty = np.empty(0, dtype=np.str_)
+                self._xs = (empty, empty, empty)
+        return self._xs
+
+    def xs_index(self, locations):
+        """Return the location indices of (river, reach, rs) tuples.
+
+        Raises
+        ------
+        KeyError
+            If a cross section is not in the results.
+        """
+        if self._xs_lookup is None:
+            keys = zip(*[values.tolist() for values in self.cross_sections])
+            self._xs_lookup = dict((key, i) for i, key in enumerate(keys))
+        return np.array([self._xs_lookup[(river, reach, str(rs))]
+                         for river, reach, rs in locations], dtype=np.int64)
+
+    @property
+    def flow_areas(self):
+        """The names of the 2D flow areas with results."""
+        if _FLOW_AREAS not in self._base:
+            return []
+        return list(self._base[_FLOW_AREAS].keys())
+
+    # %% Variables
+    def variables(self, flow_area=None):
+        """Return the variables available for cross sections or a 2D area."""
+        group = self._group(flow_area)
+        if group is None:
+            return []
+        return [name for name, item in group.items()
+                if isinstance(item, h5py.Dataset)]
+
+    def _group(self, flow_area):
+        """Return the HDF5 group of cross sections or of a 2D area."""
+        if flow_area is None:
+            path = _CROSS_SECTIONS
+        else:
+            path = _FLOW_AREAS + '/' + flow_area
+        return self._base[path] if path in self._base else None
+
+    def cross_section(self, variable):
+        """Return a lazy view of a cross section results variable.
+
+        Parameters
+        ----------
+        variable : str
+            The variable name, e.g. 'Water Surface' or 'Flow'.
+
+        Returns
+        -------
+        ResultView
+            With shape (time, cross section).
+        """
+        return self._view(None, variable)
+
+    def flow_area(self, name, variable):
+        """Return a lazy view of a 2D flow area results variable.
+
+        Parameters
+        ----------
+        name : str
+            The 2D flow area name.
+        variable : str
+            The variable name, e.g. 'Depth', 'Water Surface' or
+            'Face Velocity'.
+
+        Returns
+        -------
+        ResultView
+            With shape (time, cell or face).
+        """
+        return self._view(name, variable)
+
+    def _view(self, flow_area, variable):
+        """Return the view of a variable of a group."""
+        group = self._group(flow_area)
+        if group is None or variable not in group:
+            msg = 'Variable "{0}" not found, available: {1}'.format(
+                variable, ', '.join(self.variables(flow_area)))
+            raise KeyError(msg)
+        return ResultView(group[variable], self.times)
@@ -1,117 +1,893 @@
 """
 """
+import multiprocessing
 
+import numpy as np
 
-class SimpleAttribute:
+from .fixed_width import read_block
+
+
+# Node types as written in the "Type RM Length L Ch R" line of a geometry file
+NODE_TYPES = {1: 'XS',
+              2: 'Culvert',
+              3: 'Bridge',
+              4: 'Multiple Opening',
+              5: 'Inline Structure',
+              6: 'Lateral Structure'}
+
+# Keys that start a new top level block in a geometry file
+_NODE_KEY = b'Type RM Length L Ch R'
+_REACH_KEY = b'River Reach'
+_BLOCK_KEYS = (_NODE_KEY, _REACH_KEY, b'Junct Name', b'Storage Area',
+               b'Connection')
+
+
+class SimpleAttribute(object):
+    """Attribute given by a whole line matching one of a set of options.
+
+    Parameters
+    ----------
+    name : str
+        The name of the attribute in the parsed result.
+    options : list of str
+        The lines that set the attribute, e.g. 'SI Units' or 'English Units'.
+    value : str, optional
+        The default value if none of the options is found.
     """
-    """    
-    def __init__(self, name, options=['SI Units', 'English Units']):
-        pass
+    repeat = False
+
+    def __init__(self, name, options=['SI Units', 'English Units'],
+                 value=None):
+        self.name = name
+        self.options = tuple(options)
+        self.value = value
+
+    def keys(self):
+        """Return the (separator, key) pairs dispatched to this attribute."""
+        return [(None, option) for option in self.options]
 
+    def parse(self, line, value, lines, i):
+        """Return the value of the attribute and the index of the next line.
+        """
+        return line, i
 
-class NamedAttribute:
+
+class NamedAttribute(object):
+    """Attribute given by a 'name=value' line.
+
+    Parameters
+    ----------
+    name : str
+        The name of the attribute as written in the file, e.g. 'Proj Title'.
+    type_ : callable
+        Function converting the text of the value, e.g. str, int or float.
+    value : object, optional
+        The default value if the attribute is missing or empty.
+    separator : str, optional
+        The separator between name and value. Default is '='.
+    max_length : int, optional
+        The maximum number of characters of the value, longer values are
+        truncated.
+    repeat : bool, optional
+        If True the attribute may appear several times and the parsed value is
+        the list of all the values found. Default is False.
     """
-    """    
     def __init__(self, name, type_, value=None, separator='=',
-                 max_length=None):
-        pass
+                 max_length=None, repeat=False):
+        self.name = name
+        self.type_ = type_
+        self.value = [] if repeat and value is None else value
+        self.separator = separator
+        self.max_length = max_length
+        self.repeat = repeat
 
+    def keys(self):
+        """Return the (separator, key) pairs dispatched to this attribute."""
+        return [(self.separator, self.name)]
 
-class TagAttribute:
-    """
+    def convert(self, text):
+        """Convert the text of a value, empty values give the default."""
+        text = text.strip()
+        if self.max_length is not None:
+            text = text[:self.max_length]
+        if not text:
+            return None if self.repeat else self.value
+        return self.type_(text)
+
+    def parse(self, line, value, lines, i):
+        """Return the value of the attribute and the index of the next line.
+        """
+        return self.convert(value), i
+
+
+class TagAttribute(object):
+    """Attribute given by the lines enclosed by a start and an end tag.
+
+    Parameters
+    ----------
+    name : str
+        The name of the attribute in the parsed result.
+    start_tag : str
+        The line opening the block, e.g. 'BEGIN DESCRIPTION:'.
+    end_tag : str
+        The line closing the block, e.g. 'END DESCRIPTION:'.
+    type_ : callable
+        Function converting the text of the block (lines joined by newlines).
+    value : object, optional
+        The default value if the block is missing.
+    max_length : int, optional
+        The maximum number of characters of the block, longer blocks are
+        truncated.
     """
+    repeat = False
+
     def __init__(self, name, start_tag, end_tag, type_, value=None,
                  max_length=None):
-        pass
+        self.name = name
+        self.start_tag = start_tag
+        self.end_tag = end_tag
+        self.type_ = type_
+        self.value = value
+        self.max_length = max_length
+
+    def keys(self):
+        """Return the (separator, key) pairs dispatched to this attribute."""
+        return [(None, self.start_tag)]
+
+    def parse(self, line, value, lines, i):
+        """Return the value of the attribute and the index of the next line.
+        """
+        block = []
+        n_lines = len(lines)
+        while i < n_lines:
+            text = lines[i]
+            i += 1
+            if text.strip() == self.end_tag:
+                break
+            block.append(text)
+        text = '\n'.join(block)
+        if self.max_length is not None:
+            text = text[:self.max_length]
+        return self.type_(text), i
+
+
+class Schema(object):
+    """Declarative description of a HEC-RAS text file.
+
+    The attributes are compiled into a single dispatch table keyed by the text
+    of a line before its separator (or by the whole line for simple and tag
+    attributes), so every line is classified with a dictionary lookup
+    regardless of the number of attributes.
+
+    Parameters
+    ----------
+    attributes : list
+        SimpleAttribute, NamedAttribute and TagAttribute instances.
+    """
+    def __init__(self, attributes):
+        self.attributes = list(attributes)
+        self._lines = {}
+        self._named = {}
+        for attribute in self.attributes:
+            for separator, key in attribute.keys():
+                if separator is None:
+                    table = self._lines
+                else:
+                    table = self._named.setdefault(separator, {})
+                if key in table:
+                    raise ValueError('Duplicated key "{0}"'.format(key))
+                table[key] = attribute
+        self._separators = list(self._named.items())
+
+    def defaults(self):
+        """Return the parsed result of an empty file."""
+        result = {}
+        for attribute in self.attributes:
+            value = attribute.value
+            if isinstance(value, list):
+                value = list(value)
+            result[attribute.name] = value
+        return result
+
+    def parse(self, lines):
+        """Parse a list of lines (str, without line terminators).
+
+        Returns
+        -------
+        dict
+            The value of every attribute, keyed by attribute name. Lines not
+            described by the schema are ignored.
+        """
+        result = self.defaults()
+        lines_table = self._lines
+        separators = self._separators
+        n_lines = len(lines)
+        i = 0
+        while i < n_lines:
+            line = lines[i]
+            i += 1
+            attribute = lines_table.get(line.strip())
+            value = None
+            if attribute is None:
+                for separator, table in separators:
+                    key, sep, value = line.partition(separator)
+                    if sep:
+                        attribute = table.get(key.strip())
+                        if attribute is not None:
+                            break
+                if attribute is None:
+                    continue
+            parsed, i = attribute.parse(line.strip(), value, lines, i)
+            if attribute.repeat:
+                if parsed is not None:
+                    result[attribute.name].append(parsed)
+            else:
+                result[attribute.name] = parsed
+        return result
+
+
+def _floats(text):
+    """Convert a comma separated value to a tuple of floats."""
+    return tuple(float(item) if item.strip() else float('nan')
+                 for item in text.split(','))
+
 
+def _strings(text):
+    """Convert a comma separated value to a tuple of stripped str."""
+    return tuple(item.strip() for item in text.split(','))
 
 
-def _generic_reader():
-    """ """
+def _bool(text):
+    """Convert 'True'/'False' and '-1'/'0'/'1' flags to bool."""
+    text = text.strip()
+    if text.lower() in ('true', 'false'):
+        return text.lower() == 'true'
+    return int(text) != 0
+
+
+_MONTHS = {'JAN': 1, 'FEB': 2, 'MAR': 3, 'APR': 4, 'MAY': 5, 'JUN': 6,
+           'JUL': 7, 'AUG': 8, 'SEP': 9, 'OCT': 10, 'NOV': 11, 'DEC': 12}
+
+
+def parse_datetime(date, time=''):
+    """Convert a HEC-RAS date and time to a numpy datetime64.
+
+    Parameters
+    ----------
+    date : str
+        Date in 'DDMONYYYY' format, e.g. '01JAN2000'.
+    time : str, optional
+        Time in 'HHMM', 'HH:MM' or 'HH:MM:SS' format. HEC-RAS writes
+        midnight as '2400' of the previous day, which is supported.
+
+    Returns
+    -------
+    numpy.datetime64
+        With a resolution of seconds.
+    """
+    date = date.strip().upper()
+    day = int(date[:2])
+    month = _MONTHS[date[2:5]]
+    year = int(date[5:])
+    time = time.strip().replace(':', '')
+    hours = int(time[:2] or 0)
+    minutes = int(time[2:4] or 0)
+    seconds = int(time[4:6] or 0)
+    day_start = np.datetime64('{0:04d}-{1:02d}-{2:02d}'.format(year, month,
+                                                               day), 's')
+    offset = 3600 * hours + 60 * minutes + seconds
+    return day_start + np.timedelta64(offset, 's')
+
+
+def _generic_reader(filename, schema):
+    """Read a HEC-RAS text file described by a schema."""
+    with open(filename, 'rb') as f:
+        text = f.read().decode('latin-1')
+    return schema.parse(text.splitlines())
+
+
+PROJECT_SCHEMA = Schema([
+    NamedAttribute('Proj Title', str),
+    NamedAttribute('Current Plan', str),
+    NamedAttribute('Default Exp/Contr', _floats),
+    SimpleAttribute('units', ['SI Units', 'English Units']),
+    NamedAttribute('Geom File', str, repeat=True),
+    NamedAttribute('Flow File', str, repeat=True),
+    NamedAttribute('Unsteady File', str, repeat=True),
+    NamedAttribute('QuasiSteady File', str, repeat=True),
+    NamedAttribute('Plan File', str, repeat=True),
+    NamedAttribute('Y Axis Title', str),
+    NamedAttribute('X Axis Title(PF)', str),
+    NamedAttribute('X Axis Title(XS)', str),
+    TagAttribute('description', 'BEGIN DESCRIPTION:', 'END DESCRIPTION:',
+                 str, value=''),
+    NamedAttribute('DSS Start Date', str),
+    NamedAttribute('DSS Start Time', str),
+    NamedAttribute('DSS End Date', str),
+    NamedAttribute('DSS End Time', str),
+    NamedAttribute('DSS Export Filename', str),
+    NamedAttribute('DSS Export Rating Curves', int),
+    NamedAttribute('DSS Export Rating Curve Sorted', int),
+    NamedAttribute('DSS Export Volume Flow Curves', int),
+    NamedAttribute('DXF Filename', str),
+    NamedAttribute('DXF OffsetX', float),
+    NamedAttribute('DXF OffsetY', float),
+    NamedAttribute('DXF ScaleX', float),
+    NamedAttribute('DXF ScaleY', float),
+    NamedAttribute('GIS Export Profiles', int),
+    ])
 
 
 def read_project(filename):
+    """Read a HEC-RAS project file (*.prj).
+
+    Parameters
+    ----------
+    filename : str
+        Path to the project file.
+
+    Returns
+    -------
+    dict
+        The project attributes, see PROJECT_SCHEMA. File references ('Geom
+        File', 'Flow File', 'Unsteady File', 'Plan File', ...) are lists of
+        extensions, e.g. ['g01', 'g02'].
+
+    Notes
+    -----
+    Example of a project file::
+
+        Proj Title=new_project
+        Default Exp/Contr=0.3,0.1
+        SI Units
+        Geom File=g01
+        Flow File=f01
+        Plan File=p01
+        Y Axis Title=Elevation
+        X Axis Title(PF)=Main Channel Distance
+        X Axis Title(XS)=Station
+        BEGIN DESCRIPTION:
+        Example text
+        END DESCRIPTION:
+        DSS Start Date=
+        DSS Export Rating Curves= 0
+        DXF ScaleY= 10
+        GIS Export Profiles= 0
     """
-Proj Title=new_project
-Default Exp/Contr=0.3,0.1
-SI Units
-Y Axis Title=Elevation
-X Axis Title(PF)=Main Channel Distance
-X Axis Title(XS)=Station
-BEGIN DESCRIPTION:
-Example text
-END DESCRIPTION:
-DSS Start Date=
-DSS Start Time=
-DSS End Date=
-DSS End Time=
-DSS Export Filename=
-DSS Export Rating Curves= 0 
-DSS Export Rating Curve Sorted= 0 
-DSS Export Volume Flow Curves= 0 
-DXF Filename=
-DXF OffsetX= 0 
-DXF OffsetY= 0 
-DXF ScaleX= 1 
-DXF ScaleY= 10 
-GIS Export Profiles= 0 
-     
-    """
-    sep ='='
-    
-    tags = {
-        'description': ['BEGIN DESCRIPTION:', 'END DESCRIPTION:']
-        }
-
-    fixed = {
-        'units': ['SI Units' 'English Units']
-        }
-
-    keys = {
-        'Proj Title': '',
-        'Default Exp/Contr': '=0.3,0.1',
-        'Current Plan': '=p03',
-        'Geom File': '=g01',
-        'Flow File': '=f01',
-        'Plan File': '=p01',
-        'Y Axis Title=Elevation': '',
-        'X Axis Title(PF)': '=Main Channel Distance',
-        'X Axis Title(XS)': '=Station',
-        'DSS Start Date': '=',
-        'DSS Start Time': '=',
-        'DSS End Date': '=',
-        'DSS End Time': '=',
-        'DSS Export Filename': '=',
-        'DSS Export Rating Curves': '= 0',
-        'DSS Export Rating Curve Sorted': '= 0',
-        'DSS Export Volume Flow Curves': '= 0',
-        'DXF Filename': '=',
-        'DXF OffsetX': '= 0',
-        'DXF OffsetY': '= 0',
-        'DXF ScaleX': '= 1',
-        'DXF ScaleY': '= 10',
-        'GIS Export Profiles': '= 0'
-        }
+    return _generic_reader(filename, PROJECT_SCHEMA)
 
 
+def _to_floats(value):
+    """Convert a comma separated value to an array of floats."""
+    items = [item.strip() for item in value.split(b',')]
+    return np.array([float(item) if item else np.nan for item in items],
+                    dtype=np.float64)
+
+
+def _new_node(river, reach):
+    """Return an empty geometry node record."""
+    empty = np.empty(0, dtype=np.float64)
+    return {'river': river,
+            'reach': reach,
+            'rs': None,
+            'type': None,
+            'lengths': np.full(3, np.nan),
+            'description': '',
+            'cut_line': np.empty((0, 2), dtype=np.float64),
+            'station': empty,
+            'elevation': empty,
+            'mann_station': empty,
+            'mann_n': empty,
+            'bank_stations': np.full(2, np.nan),
+            'levees': np.full(2, np.nan),
+            'exp_contr': np.full(2, np.nan)}
+
+
+def _parse_node(lines, river, reach):
+    """Parse the lines of a single "Type RM Length L Ch R" block."""
+    node = _new_node(river, reach)
+    i = 0
+    n_lines = len(lines)
+    while i < n_lines:
+        line = lines[i].rstrip(b'\r\n')
+        i += 1
+        key, sep, value = line.partition(b'=')
+        key = key.strip()
+
+        if key == _NODE_KEY:
+            items = value.split(b',')
+            node['type'] = int(items[0])
+            node['rs'] = items[1].strip().decode('latin-1')
+            node['lengths'] = _to_floats(b','.join(items[2:5]))
+        elif key == b'BEGIN DESCRIPTION:':
+            description = []
+            while i < n_lines:
+                text = lines[i].rstrip(b'\r\n')
+                i += 1
+                if text == b'END DESCRIPTION:':
+                    break
+                description.append(text.decode('latin-1'))
+            node['description'] = '\n'.join(description)
+        elif key == b'XS GIS Cut Line':
+            count = int(value)
+            values, i = read_block(lines, i, 2 * count, 16)
+            node['cut_line'] = values.reshape(-1, 2)
+        elif key == b'#Sta/Elev':
+            count = int(value)
+            values, i = read_block(lines, i, 2 * count, 8)
+            values = values.reshape(-1, 2)
+            node['station'] = np.ascontiguousarray(values[:, 0])
+            node['elevation'] = np.ascontiguousarray(values[:, 1])
+        elif key == b'#Mann':
+            count = int(value.split(b',')[0])
+            values, i = read_block(lines, i, 3 * count, 8)
+            values = values.reshape(-1, 3)
+            node['mann_station'] = np.ascontiguousarray(values[:, 0])
+            node['mann_n'] = np.ascontiguousarray(values[:, 1])
+        elif key == b'Bank Sta':
+            node['bank_stations'] = _to_floats(value)[:2]
+        elif key == b'Exp/Cntr':
+            node['exp_contr'] = _to_floats(value)[:2]
+        elif key == b'Levee':
+            # Left flag, station, elevation, then the same for the right
+            values = np.append(_to_floats(value), np.full(6, np.nan))
+            node['levees'] = values[[1, 4]]
+
+    return node
+
+
+def _iter_node_blocks(lines):
+    """Group the lines of a geometry file into node blocks.
+
+    Yields
+    ------
+    river : str
+        The river name of the node.
+    reach : str
+        The reach name of the node.
+    block : list of bytes
+        The lines of the node, starting with the "Type RM Length L Ch R" line.
+    """
+    river = reach = None
+    block = None
+    for line in lines:
+        if line.startswith(_BLOCK_KEYS):
+            if block is not None:
+                yield river, reach, block
+                block = None
+            if line.startswith(_NODE_KEY):
+                block = [line]
+            elif line.startswith(_REACH_KEY):
+                value = line.rstrip(b'\r\n').partition(b'=')[2]
+                river, _, reach = value.decode('latin-1').partition(',')
+                river, reach = river.strip(), reach.strip()
+        elif block is not None:
+            block.append(line)
+
+    if block is not None:
+        yield river, reach, block
+
+
+def iter_geometry(filename):
+    """Iterate over the nodes of a HEC-RAS geometry file (*.g##).
+
+    The file is read line by line, so memory usage does not depend on the size
+    of the geometry file.
+
+    Parameters
+    ----------
+    filename : str
+        Path to the geometry file.
+
+    Yields
+    ------
+    dict
+        One record per "Type RM Length L Ch R" block, with keys 'river',
+        'reach', 'rs', 'type' (see NODE_TYPES), 'lengths' (left overbank,
+        channel and right overbank downstream reach lengths), 'description',
+        'cut_line' (n x 2 array of x, y coordinates), 'station', 'elevation',
+        'mann_station', 'mann_n', 'bank_stations', 'levees' (left and right
+        levee stations, NaN if not set) and 'exp_contr'. Tables not
+        present in the block are returned as empty arrays.
+    """
+    with open(filename, 'rb') as f:
+        for river, reach, block in _iter_node_blocks(f):
+            yield _parse_node(block, river, reach)
 
 
 def read_geometry(filename):
-    """ """
+    """Read all the nodes of a HEC-RAS geometry file (*.g##).
+
+    Parameters
+    ----------
+    filename : str
+        Path to the geometry file.
+
+    Returns
+    -------
+    list of dict
+        The node records, see `iter_geometry`.
+    """
+    return list(iter_geometry(filename))
+
+
+def _river_reach(value):
+    """Split a "River,Reach" value."""
+    river, _, reach = value.decode('latin-1').partition(',')
+    return river.strip(), reach.strip()
+
+
+def read_network(filename):
+    """Read the reaches and junctions of a HEC-RAS geometry file (*.g##).
+
+    Only the "River Reach" and "Junct Name" blocks and the first line of the
+    nodes are decoded, the tables of the nodes are skipped.
+
+    Parameters
+    ----------
+    filename : str
+        Path to the geometry file.
+
+    Returns
+    -------
+    dict
+        With keys 'reaches' (list of (river, reach)), 'reach_xy' (list of
+        n x 2 arrays, the reach lines from upstream to downstream), 'nodes'
+        (list of the river stations of every reach), 'junctions' (dict
+        mapping the junction names to the lists of (river, reach) flowing
+        in and out of them) and 'junction_xy' (dict of (x, y)).
+    """
+    network = {'reaches': [], 'reach_xy': [], 'nodes': [], 'junctions': {},
+               'junction_xy': {}}
+    with open(filename, 'rb') as f:
+        block = None
+        for line in f:
+            if line.startswith(_BLOCK_KEYS):
+                if block is not None:
+                    _parse_network_block(block, network)
+                block = None
+                if line.startswith(_NODE_KEY):
+                    rs = line.split(b'=', 1)[1].split(b',')[1]
+                    network['nodes'][-1].append(rs.strip().decode('latin-1'))
+                elif line.startswith((_REACH_KEY, b'Junct Name')):
+                    block = [line]
+            elif block is not None:
+                block.append(line)
+        if block is not None:
+            _parse_network_block(block, network)
+    return network
+
+
+def _parse_network_block(lines, network):
+    """Parse the lines of a "River Reach" or "Junct Name" block."""
+    key, _, value = lines[0].rstrip(b'\r\n').partition(b'=')
+    if key.strip() == _REACH_KEY:
+        network['reaches'].append(_river_reach(value))
+        network['nodes'].append([])
+        xy = np.empty((0, 2), dtype=np.float64)
+        for i, line in enumerate(lines):
+            if line.startswith(b'Reach XY='):
+                count = int(line.partition(b'=')[2])
+                values, _ = read_block(lines, i + 1, 2 * count, 16)
+                xy = values.reshape(-1, 2)
+                break
+        network['reach_xy'].append(xy)
+        return
+
+    name = value.decode('latin-1').strip()
+    inflows, outflows = [], []
+    for line in lines[1:]:
+        key, _, value = line.rstrip(b'\r\n').partition(b'=')
+        if key == b'Up River,Reach':
+            inflows.append(_river_reach(value))
+        elif key == b'Dn River,Reach':
+            outflows.append(_river_reach(value))
+        elif key == b'Junct X Y & Text X Y':
+            network['junction_xy'][name] = tuple(_to_floats(value)[:2])
+    network['junctions'][name] = (inflows, outflows)
+
+
+PLAN_SCHEMA = Schema([
+    NamedAttribute('Plan Title', str),
+    NamedAttribute('Program Version', str),
+    NamedAttribute('Short Identifier', str),
+    NamedAttribute('Simulation Date', _strings),
+    NamedAttribute('Geom File', str),
+    NamedAttribute('Flow File', str),
+    SimpleAttribute('regime', ['Subcritical Flow', 'Supercritical Flow',
+                               'Mixed Flow']),
+    TagAttribute('description', 'BEGIN DESCRIPTION:', 'END DESCRIPTION:',
+                 str, value=''),
+    NamedAttribute('Computation Interval', str),
+    NamedAttribute('Output Interval', str),
+    NamedAttribute('Instantaneous Interval', str),
+    NamedAttribute('Mapping Interval', str),
+    NamedAttribute('Run HTab', _bool),
+    NamedAttribute('Run UNet', _bool),
+    NamedAttribute('Run Sediment', _bool),
+    NamedAttribute('Run PostProcess', _bool),
+    NamedAttribute('Run WQNet', _bool),
+    NamedAttribute('Run RASMapper', _bool),
+    NamedAttribute('UNET Theta', float),
+    NamedAttribute('UNET Theta Warmup', float),
+    NamedAttribute('UNET ZTol', float),
+    NamedAttribute('UNET QTol', float),
+    NamedAttribute('UNET MxIter', int),
+    NamedAttribute('DSS File', str),
+    NamedAttribute('Write IC File', _bool),
+    ])
 
 
 def read_plan(filename):
-    """ """
+    """Read a HEC-RAS plan file (*.p##).
+
+    Parameters
+    ----------
+    filename : str
+        Path to the plan file.
+
+    Returns
+    -------
+    dict
+        The plan attributes, see PLAN_SCHEMA. 'Geom File' and 'Flow File' are
+        the extensions of the files used by the plan, e.g. 'g01' and 'u01'.
+        'Simulation Date' is the (start date, start time, end date, end time)
+        tuple of unsteady plans.
+    """
+    return _generic_reader(filename, PLAN_SCHEMA)
+
+
+BOUNDARY_SCHEMA = Schema([
+    NamedAttribute('Flow Title', str),
+    NamedAttribute('Program Version', str),
+    NamedAttribute('Use Restart', _bool),
+    NamedAttribute('Restart Filename', str),
+    ])
+
+_BOUNDARY_KEY = b'Boundary Location'
+_GATE_KEY = b'Gate Name'
+
+# HEC-RAS interval suffixes and the matching numpy time units
+_INTERVAL_UNITS = (('SEC', 's'), ('MIN', 'm'), ('HOUR', 'h'), ('DAY', 'D'),
+                   ('WEEK', 'W'), ('MON', 'M'), ('YEAR', 'Y'))
+
+
+def parse_interval(interval):
+    """Convert a HEC-RAS time interval to a numpy timedelta64.
+
+    Parameters
+    ----------
+    interval : str
+        The interval, e.g. '15MIN', '1HOUR' or '1DAY'.
+
+    Returns
+    -------
+    numpy.timedelta64
+        In the unit of the interval, months and years are kept as calendar
+        units.
+    """
+    text = interval.strip().upper()
+    for suffix, unit in _INTERVAL_UNITS:
+        if text.endswith(suffix):
+            return np.timedelta64(int(text[:-len(suffix)] or 1), unit)
+    raise ValueError('Unknown time interval "{0}"'.format(interval))
 
 
-def read_boundary(filename):
-    """ """
+def time_index(count, interval, start=None):
+    """Return the times of a regular time series.
 
+    Parameters
+    ----------
+    count : int
+        The number of values.
+    interval : str
+        The HEC-RAS time interval, e.g. '1HOUR'.
+    start : datetime64 or str, optional
+        The time of the first value.
 
-def test_project():
-    """ """
-    'D:\Users\penac1\Dropbox (Personal)\it\repos\git\pyras\temp_examples\Steady Examples'
+    Returns
+    -------
+    ndarray
+        datetime64[s] times if `start` is given, otherwise the timedelta64
+        offsets from the first value.
+    """
+    step = parse_interval(interval)
+    offsets = np.arange(count) * step
+    if start is None:
+        return offsets
+    start = np.datetime64(start, 's')
+    unit = np.datetime_data(step.dtype)[0]
+    if unit in ('M', 'Y'):
+        # Calendar steps, keep the offset of the start within its month/year
+        base = start.astype('datetime64[{0}]'.format(unit))
+        times = (base + offsets).astype('datetime64[s]')
+        return times + (start - base.astype('datetime64[s]'))
+    return start + offsets.astype('timedelta64[s]')
+
+
+def simulation_start(plan):
+    """Return the start time of an unsteady plan read with read_plan."""
+    date = plan.get('Simulation Date')
+    if not date or not date[0]:
+        return None
+    return parse_datetime(date[0], date[1] if len(date) > 1 else '')
+
+
+def _fixed_start(settings, prefix):
+    """Return the fixed start time of a boundary or gate, if used."""
+    if not _bool(settings.get(prefix + 'Use Fixed Start Time', 'False')):
+        return None
+    date, _, time = settings.get(prefix + 'Fixed Start Date/Time',
+                                 '').partition(',')
+    if not date.strip():
+        return None
+    return parse_datetime(date, time)
+
+
+def _boundary_records(location, settings, series, start):
+    """Build the records of the time series of a boundary location."""
+    records = []
+    for name, values, gate in series:
+        if gate is None:
+            prefix, source = '', settings
+            interval = settings.get('Interval', '1HOUR')
+        else:
+            prefix, source = 'Gate ', gate
+            interval = gate.get('Gate Time Interval', '1HOUR')
+        fixed = _fixed_start(source, prefix)
+        records.append({
+            'river': location[0],
+            'reach': location[1] if len(location) > 1 else '',
+            'rs': location[2] if len(location) > 2 else '',
+            'location': location,
+            'type': name,
+            'gate': None if gate is None else gate['Gate Name'],
+            'interval': interval,
+            'times': time_index(values.size, interval,
+                                start if fixed is None else fixed),
+            'values': values,
+            'use_dss': _bool(source.get(prefix + 'Use DSS', 'False')),
+            'dss_path': source.get(prefix + 'DSS Path', ''),
+            })
+    return records
+
+
+def _parse_boundaries(lines, start=None):
+    """Parse the "Boundary Location" blocks of an unsteady flow file.
+
+    The settings of a block (interval, fixed start time, DSS path) may come
+    after its table, so the records are built at the end of every block.
+    """
+    records = []
+    location = None
+    settings = {}
+    series = []
+    gate = None
+    i = 0
+    n_lines = len(lines)
+    while i < n_lines:
+        line = lines[i].rstrip(b'\r\n')
+        i += 1
+        key, sep, value = line.partition(b'=')
+        if not sep:
+            continue
+        key = key.strip()
+
+        if key == _BOUNDARY_KEY:
+            if location is not None:
+                records.extend(_boundary_records(location, settings, series,
+                                                 start))
+            items = value.decode('latin-1').split(',')
+            location = tuple(item.strip() for item in items)
+            while len(location) > 3 and not location[-1]:
+                location = location[:-1]
+            settings, series, gate = {}, [], None
+        elif location is None:
+            continue
+        elif key == _GATE_KEY:
+            gate = {'Gate Name': value.decode('latin-1').split(',')[0].strip()}
+        elif key.endswith(b'Hydrograph') or key == b'Gate Openings':
+            count = int(value.split(b',')[0] or 0)
+            values, i = read_block(lines, i, count, 8)
+            name = key.decode('latin-1')
+            series.append((name, values, gate if name == 'Gate Openings'
+                           else None))
+        else:
+            target = gate if key.startswith(b'Gate ') and gate else settings
+            target[key.decode('latin-1')] = value.decode('latin-1').strip()
+
+    if location is not None:
+        records.extend(_boundary_records(location, settings, series, start))
+    return records
+
+
+def read_boundary(filename, start=None):
+    """Read a HEC-RAS unsteady flow file (*.u##).
+
+    Parameters
+    ----------
+    filename : str
+        Path to the unsteady flow file.
+    start : datetime64 or str, optional
+        The start time of the simulation, see `simulation_start`. Boundary
+        conditions with a fixed start time use their own start.
+
+    Returns
+    -------
+    dict
+        The unsteady flow attributes, see BOUNDARY_SCHEMA, and 'boundaries',
+        the list of time series boundary conditions (flow, stage and lateral
+        inflow hydrographs, gate openings...). Every boundary is a dict with:
+
+        - 'river', 'reach', 'rs': the boundary location,
+        - 'location': the full location tuple (storage and 2D areas...),
+        - 'type': the name of the table, e.g. 'Flow Hydrograph',
+        - 'gate': the gate name of 'Gate Openings', None otherwise,
+        - 'interval': the time interval, e.g. '1HOUR',
+        - 'times': datetime64[s] times, or timedelta64 offsets from the
+          start of the simulation if the start time is unknown,
+        - 'values': float array of the values,
+        - 'use_dss', 'dss_path': the DSS source of the boundary.
+
+    Notes
+    -----
+    The times are built from the interval and the start time, no Python
+    datetime is created.
+    """
+    with open(filename, 'rb') as f:
+        lines = f.read().splitlines()
+
+    first = len(lines)
+    for i, line in enumerate(lines):
+        if line.startswith(_BOUNDARY_KEY):
+            first = i
+            break
+
+    header = [line.decode('latin-1') for line in lines[:first]]
+    result = BOUNDARY_SCHEMA.parse(header)
+    result['boundaries'] = _parse_boundaries(lines[first:], start)
+    return result
+
+
+def _read_boundary_star(args):
+    """Call read_boundary with a tuple of arguments, for process pools."""
+    return read_boundary(*args)
+
+
+def read_boundaries(filenames, start=None, processes=None):
+    """Read many unsteady flow files in parallel.
+
+    Parameters
+    ----------
+    filenames : list of str
+        Paths to the unsteady flow files.
+    start : datetime64 or str, or list of them, optional
+        The start time of the simulations, one for all the files or one per
+        file.
+    processes : int, optional
+        The number of worker processes, by default the number of CPUs. With
+        1 the files are read in the current process.
+
+    Returns
+    -------
+    list of dict
+        The parsed files, see `read_boundary`, in the order of `filenames`.
+    """
+    filenames = list(filenames)
+    if start is None or isinstance(start, (str, np.datetime64)):
+        starts = [start] * len(filenames)
+    else:
+        starts = list(start)
+    args = list(zip(filenames, starts))
 
+    if processes == 1 or len(args) < 2:
+        return [_read_boundary_star(item) for item in args]
 
-if __name__ == '__main__':
-    test_project()
+    pool = multiprocessing.Pool(processes)
+    try:
+        n_workers = processes or multiprocessing.cpu_count()
+        chunksize = max(1, len(args) // (4 * n_workers))
+        return pool.map(_read_boundary_star, args, chunksize)
+    finally:
+        pool.close()
+        pool.join()
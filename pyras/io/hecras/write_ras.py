@@ -0,0 +1,396 @@
+"""
+Edit HEC-RAS text files without going through the HECRASController.
+"""
+import mmap
+import os
+import os.path as osp
+import shutil
+import tempfile
+
+import numpy as np
+
+from .fixed_width import encode, format_field, read_block
+from .geometry_index import GeometryIndex, index_filename, load_index
+from .read_ras import _parse_node
+from ...util import replace_file
+
+
+_MANN_KEY = b'#Mann='
+
+# Copy untouched byte ranges in chunks to keep memory bounded
+_COPY_CHUNK = 1 << 24
+
+
+def _newline(line):
+    """Return the line terminator of a line."""
+    return b'\r\n' if line.endswith(b'\r\n') else b'\n'
+
+
+def _find_mann_table(lines):
+    """Return the first and last + 1 line of the #Mann= table of a block."""
+    for i, line in enumerate(lines):
+        if line.startswith(_MANN_KEY):
+            value = line.rstrip(b'\r\n')[len(_MANN_KEY):]
+            count = int(value.split(b',')[0])
+            _, stop = read_block(lines, i + 1, 3 * count, 8)
+            return i, stop
+    raise ValueError("Node has no Manning's n table")
+
+
+def _mann_table(header, Mann_n, Station, newline):
+    """Return the lines of a #Mann= table.
+
+    The fields of the original header after the number of values (the
+    Manning's n variation flags) are kept.
+    """
+    Mann_n = np.asarray(Mann_n, dtype=np.float64)
+    Station = np.asarray(Station, dtype=np.float64)
+    if Mann_n.shape != Station.shape or Mann_n.ndim != 1:
+        raise ValueError("Mann_n and Station must be 1D and of equal length")
+
+    items = header.rstrip(b'\r\n')[len(_MANN_KEY):].split(b',')
+    items[0] = ' {0} '.format(Mann_n.size).encode('ascii')
+    lines = [_MANN_KEY + b','.join(items) + newline]
+
+    values = np.zeros((Mann_n.size, 3))
+    values[:, 0] = Station
+    values[:, 1] = Mann_n
+    lines.append(encode(values.ravel(), 8, 9, newline))
+    return b''.join(lines)
+
+
+def _copy_range(source, out, start, stop):
+    """Copy a byte range of a memory map to a file."""
+    for i in range(start, stop, _COPY_CHUNK):
+        out.write(source[i:min(i + _COPY_CHUNK, stop)])
+
+
+def _rewrite(filename, edits, output=None):
+    """Copy a file replacing byte ranges.
+
+    Parameters
+    ----------
+    filename : str
+        Path to the file.
+    edits : list of (int, int, bytes)
+        The start and stop of the byte ranges and their new content, sorted
+        and not overlapping. Insertions have start == stop.
+    output : str, optional
+        Path of the new file. By default the file is replaced.
+
+    Returns
+    -------
+    str
+        The path of the new file.
+    """
+    if output is None:
+        directory = osp.dirname(osp.abspath(filename))
+        fd, target = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        out = os.fdopen(fd, 'wb')
+    else:
+        target = output
+        out = open(output, 'wb')
+
+    try:
+        with open(filename, 'rb') as f:
+            source = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            try:
+                cursor = 0
+                for start, stop, data in edits:
+                    _copy_range(source, out, cursor, start)
+                    out.write(data)
+                    cursor = stop
+                _copy_range(source, out, cursor, len(source))
+            finally:
+                source.close()
+        out.close()
+        if output is None:
+            # mkstemp creates the file readable by its owner only
+            shutil.copymode(filename, target)
+            replace_file(target, filename)
+    except Exception:
+        out.close()
+        if output is None and osp.isfile(target):
+            os.remove(target)
+        raise
+    return filename if output is None else output
+
+
+def _patch_geometry(filename, changes, make_table, output=None):
+    """Rewrite the #Mann= tables of some nodes of a geometry file.
+
+    Parameters
+    ----------
+    filename : str
+        Path to the geometry file.
+    changes : dict
+        Maps (river, reach, rs) to the change passed to `make_table`.
+    make_table : callable
+        Called as make_table(node, header, change, newline), where node is the
+        parsed node record and header the original '#Mann=' line, and returns
+        the new table bytes.
+    output : str, optional
+        Path of the patched file. By default the geometry file is replaced.
+    """
+    index = load_index(filename)
+    positions = sorted(((index.position(*key), change)
+                        for key, change in changes.items()),
+                       key=lambda item: item[0])
+    deltas = np.zeros(len(index), dtype=np.int64)
+
+    edits = []
+    with open(filename, 'rb') as f:
+        for position, change in positions:
+            start = int(index.offset[position])
+            f.seek(start)
+            block = f.read(int(index.length[position]))
+            lines = block.splitlines(True)
+            first, last = _find_mann_table(lines)
+            node = _parse_node(lines, str(index.river[position]),
+                               str(index.reach[position]))
+            table = make_table(node, lines[first], change,
+                               _newline(lines[first]))
+
+            table_start = start + sum(len(l) for l in lines[:first])
+            table_stop = table_start + sum(len(l) for l in lines[first:last])
+            edits.append((table_start, table_stop, table))
+
+            # Keep track of the change of length of the blocks
+            deltas[position] = len(table) - (table_stop - table_start)
+    path = _rewrite(filename, edits, output)
+
+    # Save the index of the patched file, so it does not need a new scan
+    stat = os.stat(path)
+    offsets = index.offset + np.cumsum(deltas) - deltas
+    lengths = index.length + deltas
+    patched = GeometryIndex(index.river, index.reach, index.rs,
+                            index.node_type, offsets, lengths, stat.st_size,
+                            stat.st_mtime)
+    try:
+        patched.save(index_filename(path))
+    except (IOError, OSError):
+        pass
+
+
+def patch_manning(filename, changes, output=None):
+    """Set the Manning's n values, by stationing, of many cross sections.
+
+    This is the file level equivalent of calling Geometry_SetMann for every
+    cross section, it does not need HEC-RAS. Only the #Mann= tables of the
+    changed cross sections are rewritten, the rest of the file is copied
+    untouched.
+
+    Parameters
+    ----------
+    filename : str
+        Path to the geometry file (*.g##).
+    changes : dict
+        Maps (river, reach, rs) to a (Mann_n, Station) pair of sequences, the
+        Manning's n values and the stations of their breakpoints.
+    output : str, optional
+        Path of the patched geometry file. By default `filename` is replaced,
+        use a different output to generate scenarios from the same file.
+
+    Raises
+    ------
+    KeyError
+        If a cross section is not in the geometry file.
+    ValueError
+        If a node has no Manning's n table.
+    """
+    def make_table(node, header, change, newline):
+        Mann_n, Station = change
+        return _mann_table(header, Mann_n, Station, newline)
+
+    _patch_geometry(filename, changes, make_table, output)
+
+
+def patch_manning_lchr(filename, changes, output=None):
+    """Set the left overbank, channel and right overbank Manning's n values
+    of many cross sections.
+
+    This is the file level equivalent of calling Geometry_SetMann_LChR for
+    every cross section. The breakpoints are placed at the first station of
+    the cross section and at the bank stations.
+
+    Parameters
+    ----------
+    filename : str
+        Path to the geometry file (*.g##).
+    changes : dict
+        Maps (river, reach, rs) to a (MannLOB, MannChan, MannROB) tuple.
+    output : str, optional
+        Path of the patched geometry file. By default `filename` is replaced.
+    """
+    def make_table(node, header, change, newline):
+        station = node['station']
+        left, right = node['bank_stations']
+        if station.size == 0 or np.isnan(left) or np.isnan(right):
+            msg = 'Cross section {0} {1} {2} has no bank stations'.format(
+                node['river'], node['reach'], node['rs'])
+            raise ValueError(msg)
+        Station = (station[0], left, right)
+        return _mann_table(header, change, Station, newline)
+
+    _patch_geometry(filename, changes, make_table, output)
+
+
+def _number(value):
+    """Format a number of a comma separated list, blank if NaN."""
+    return format_field(float(value), 8).strip()
+
+
+def _type_line(line, lengths):
+    """Replace the reach lengths of a "Type RM Length L Ch R" line."""
+    newline = _newline(line)
+    key, sep, value = line.rstrip(b'\r\n').partition(b'=')
+    items = value.split(b',')
+    items += [b''] * (5 - len(items))
+    items[2:5] = [_number(length).encode('ascii') for length in lengths]
+    return key + sep + b','.join(items) + newline
+
+
+def _node_stop(f, start, stop, size):
+    """Return the end of the data of a node block, after its closing blank
+    line.
+
+    The block of the last node of a geometry file runs to the end of the
+    file and holds the global lines following the node, e.g. "LCMann Time=".
+    """
+    f.seek(start)
+    offset = start
+    description = False
+    while offset < stop:
+        line = f.readline()
+        offset += len(line)
+        text = line.rstrip(b'\r\n')
+        if text == b'BEGIN DESCRIPTION:':
+            description = True
+        elif text == b'END DESCRIPTION:':
+            description = False
+        elif not text and not description:
+            return offset
+    if stop == size:
+        raise ValueError('The last node of the geometry file does not end '
+                         'with a blank line')
+    return stop
+
+
+def format_node(node, newline=b'\r\n'):
+    """Return the lines of a cross section block of a geometry file.
+
+    Parameters
+    ----------
+    node : dict
+        A cross section record, see read_ras.iter_geometry.
+    newline : bytes, optional
+        The line terminator.
+
+    Returns
+    -------
+    bytes
+        The block, ending with a blank line.
+    """
+    lines = [('Type RM Length L Ch R = 1 ,{0:<8},{1}'.format(
+        node['rs'], ','.join(_number(length) for length in node['lengths']))
+    ).encode('latin-1') + newline]
+    if node.get('description'):
+        lines.append(b'BEGIN DESCRIPTION:' + newline)
+        lines.extend(line.encode('latin-1') + newline
+                     for line in node['description'].split('\n'))
+        lines.append(b'END DESCRIPTION:' + newline)
+    cut_line = np.asarray(node.get('cut_line', ()), dtype=np.float64)
+    if cut_line.size:
+        lines.append('XS GIS Cut Line={0}'.format(
+            cut_line.shape[0]).encode('ascii') + newline)
+        lines.append(encode(cut_line.ravel(), 16, 4, newline))
+
+    station = np.asarray(node['station'], dtype=np.float64)
+    elevation = np.asarray(node['elevation'], dtype=np.float64)
+    lines.append('#Sta/Elev= {0} '.format(station.size).encode('ascii') +
+                 newline)
+    lines.append(encode(np.column_stack([station, elevation]).ravel(), 8, 10,
+                        newline))
+    mann_n = np.asarray(node['mann_n'], dtype=np.float64)
+    if mann_n.size:
+        lines.append(_mann_table(_MANN_KEY + b' 0 , 0 , 0 ', mann_n,
+                                 node['mann_station'], newline))
+    left, right = node['bank_stations']
+    if not (np.isnan(left) and np.isnan(right)):
+        lines.append('Bank Sta={0},{1}'.format(
+            _number(left), _number(right)).encode('ascii') + newline)
+    levees = node.get('levees')
+    if levees is not None and not np.isnan(levees).all():
+        # Levee elevations at the ground
+        fields = []
+        for levee in levees:
+            if np.isnan(levee):
+                fields += ['0', '', '']
+            else:
+                fields += ['-1', _number(levee),
+                           _number(np.interp(levee, station, elevation))]
+        lines.append(('Levee=' + ','.join(fields)).encode('ascii') + newline)
+    expansion, contraction = node['exp_contr']
+    if not (np.isnan(expansion) and np.isnan(contraction)):
+        lines.append('Exp/Cntr={0},{1}'.format(
+            _number(expansion), _number(contraction)).encode('ascii') +
+            newline)
+    lines.append(newline)
+    return b''.join(lines)
+
+
+def insert_nodes(filename, nodes, after, lengths=None, output=None):
+    """Insert cross sections in a geometry file.
+
+    The file level equivalent of adding cross sections in the geometry
+    editor, e.g. interpolated cross sections.
+
+    Parameters
+    ----------
+    filename : str
+        Path to the geometry file (*.g##).
+    nodes : list of dict
+        The new cross sections, see read_ras.iter_geometry.
+    after : list of tuple
+        The (river, reach, rs) of the node every new cross section follows.
+        Cross sections following the same node are written in order.
+    lengths : dict, optional
+        Maps (river, reach, rs) to new (left overbank, channel, right
+        overbank) reach lengths of existing nodes, e.g. the upstream cross
+        section of interpolated ones.
+    output : str, optional
+        Path of the new geometry file. By default `filename` is replaced.
+
+    Raises
+    ------
+    KeyError
+        If a node of `after` or `lengths` is not in the geometry file.
+    ValueError
+        If `nodes` and `after` have different lengths.
+    """
+    if len(nodes) != len(after):
+        raise ValueError('nodes and after must have equal length')
+    index = load_index(filename)
+    lengths = lengths or {}
+    edits = []
+    with open(filename, 'rb') as f:
+        newline = _newline(f.readline())
+        blocks = {}
+        for node, key in zip(nodes, after):
+            blocks.setdefault(index.position(*key), []).append(
+                format_node(node, newline))
+        for key, value in lengths.items():
+            position = index.position(*key)
+            start = int(index.offset[position])
+            f.seek(start)
+            line = f.readline()
+            edits.append((start, start + len(line), _type_line(line, value)))
+        for position, data in blocks.items():
+            start = int(index.offset[position])
+            stop = _node_stop(f, start, start + int(index.length[position]),
+                              index.size)
+            edits.append((stop, stop, b''.join(data)))
+    # Insertions at the end of a block come before the new first line of
+    # the next one
+    edits.sort(key=lambda edit: (edit[0], edit[1] != edit[0]))
+    _rewrite(filename, edits, output)
@@ -0,0 +1,4 @@
+import sys
+
+# The asyncio computations need Python 3.5 or later
+collect_ignore = ['test_compute.py'] if sys.version_info < (3, 5) else []
@@ -0,0 +1,111 @@
+"""
+Tests of the asynchronous computation of plans with a stand-in for the COM
+object.
+"""
+import asyncio
+
+import pytest
+
+from pyras.controllers.hecras import compute
+
+
+class FakeCompute(object):
+    """The compute methods of HECRASController, the plan is complete at the
+    n-th poll."""
+
+    def __init__(self, n_polls, error=None):
+        self.n_polls = n_polls
+        self.error = error
+        self.calls = []
+
+    def Compute_CurrentPlan(self, nmsg, Msg, BlockingMode):
+        self.calls.append('Compute_CurrentPlan')
+        if self.error is not None:
+            raise self.error
+        assert BlockingMode is False
+        return (True, nmsg, Msg, BlockingMode)
+
+    def Compute_Complete(self):
+        self.calls.append('Compute_Complete')
+        return self.calls.count('Compute_Complete') >= self.n_polls
+
+    def Compute_Cancel(self):
+        self.calls.append('Compute_Cancel')
+
+
+class FakeController(object):
+
+    def __init__(self, n_polls, error=None):
+        self._rc = FakeCompute(n_polls, error)
+        self.cleared = 0
+
+    def clear_id_cache(self):
+        self.cleared += 1
+
+
+@pytest.fixture
+def delays(monkeypatch):
+    """Record the delays of asyncio.sleep without waiting."""
+    sleep = asyncio.sleep
+    result = []
+
+    async def record(delay):
+        result.append(delay)
+        await sleep(0)
+
+    monkeypatch.setattr(asyncio, 'sleep', record)
+    return result
+
+
+def test_complete_after_polls(delays):
+    controller = FakeController(4)
+    assert asyncio.run(compute.compute_async(controller, poll_interval=0.1))
+    assert controller._rc.calls.count('Compute_Complete') == 4
+    assert 'Compute_Cancel' not in controller._rc.calls
+    assert len(delays) == 3
+    # The ID cache is dropped before and after the computation
+    assert controller.cleared == 2
+
+
+def test_backoff(delays):
+    controller = FakeController(8)
+    asyncio.run(compute.compute_async(controller, poll_interval=0.1,
+                                      max_interval=0.5, backoff=2.0))
+    assert delays == pytest.approx([0.1, 0.2, 0.4, 0.5, 0.5, 0.5, 0.5])
+
+
+def test_timeout_cancels():
+    controller = FakeController(10 ** 9)
+    with pytest.raises(asyncio.TimeoutError):
+        asyncio.run(compute.compute_async(controller, timeout=0.05,
+                                          poll_interval=0.01))
+    assert controller._rc.calls[-1] == 'Compute_Cancel'
+    assert controller.cleared == 2
+
+
+def test_task_cancellation_cancels():
+    controller = FakeController(10 ** 9)
+
+    async def cancel():
+        task = asyncio.ensure_future(
+            compute.compute_async(controller, poll_interval=0.01))
+        await asyncio.sleep(0.05)
+        task.cancel()
+        await task
+
+    with pytest.raises(asyncio.CancelledError):
+        asyncio.run(cancel())
+    assert controller._rc.calls[-1] == 'Compute_Cancel'
+
+
+def test_compute_all(delays):
+    error = RuntimeError('HEC-RAS failed')
+    controllers = [FakeController(2), FakeController(1, error),
+                   FakeController(3)]
+    results = asyncio.run(compute.compute_all(
+        controllers, return_exceptions=True, poll_interval=0.01))
+    assert results == [True, error, True]
+    assert [c._rc.calls.count('Compute_Complete') for c in controllers] == \
+        [2, 0, 3]
+    with pytest.raises(RuntimeError):
+        asyncio.run(compute.compute_all(controllers, poll_interval=0.01))
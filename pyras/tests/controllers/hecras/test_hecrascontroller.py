@@ -0,0 +1,215 @@
+"""
+Tests of RASController methods with a stand-in for the COM object.
+"""
+import datetime as dt
+
+import numpy as np
+import pytest
+from numpy.testing import assert_array_equal
+
+from pyras.controllers.hecras import hecrasgeometry
+from pyras.controllers.hecras.hecrascontroller import RAS41, RASController
+from pyras.controllers.hecras.hecrascontroller.ras41 import (_fix_dates,
+                                                             _fix_values)
+
+
+class FakeOutput(object):
+    """The output methods of HECRASController for one reach of 3 cross
+    sections and 2 profiles, the arrays with an unused first item."""
+
+    def Output_GetProfiles(self, nProfile, ProfileName):
+        return (2, ('PF 1', 'PF 2'))
+
+    def Output_GetRivers(self, nRiver, RiverName):
+        return (1, ('Main',))
+
+    def Output_GetReaches(self, riv, nReach, ReachName):
+        return (riv, 1, ('Upper',))
+
+    def Output_ReachOutput(self, riv, rch, prof, nVar, nRS, rs, ChannelDist,
+                           value):
+        # From downstream, the second profile misses the upstream section
+        values = [10.0 * prof + nVar + i for i in range(3)]
+        if prof == 2:
+            values = values[:2]
+        return (riv, rch, prof, nVar, len(values), ('', '10', '20', '30'),
+                (0.0, 0.0, 100.0, 200.0), (0.0,) + tuple(values))
+
+
+def controller():
+    rc = RASController.__new__(RASController)
+    rc._rc = FakeOutput()
+    return rc
+
+
+# The nodes of the rivers of FakeModel, one reach each
+NODES = {1: ('300', '200', '100'), 2: ('20', '10')}
+
+
+class FakeModel(object):
+    """The river, reach and node lists of HECRASController and
+    HECRASGeometry. The node arrays are 1-based, with an unused first item.
+    """
+
+    def __init__(self):
+        self.calls = []
+
+    def _rivers(self):
+        return (2, ('Main', 'Trib'))
+
+    def _reaches(self, riv):
+        return (riv, 1, (('Upper',), ('Only',))[riv - 1])
+
+    def _nodes(self, riv, rch):
+        names = NODES[riv]
+        return (riv, rch, len(names), ('',) + names,
+                ('',) + ('',) * len(names))
+
+    def Output_GetRivers(self, nRiver, river):
+        return self._rivers()
+
+    def Geometry_GetRivers(self, nRiver, river):
+        return self._rivers()
+
+    def Output_GetReaches(self, riv, nReach, reach):
+        return self._reaches(riv)
+
+    def Geometry_GetReaches(self, riv, nReach, reach):
+        return self._reaches(riv)
+
+    def Output_GetNodes(self, riv, rch, nRS, rs, NodeType):
+        return self._nodes(riv, rch)
+
+    def Geometry_GetNodes(self, riv, rch, nRS, rs, NodeType):
+        assert len(rs) == nRS + 1
+        return self._nodes(riv, rch)
+
+    def nNode(self, riv, rch):
+        return (len(NODES[riv]), riv, rch)
+
+    def Output_GetNode(self, riv, rch, rs):
+        self.calls.append('Output_GetNode')
+        return (0, riv, rch, rs)
+
+    def Geometry_GetNode(self, riv, rch, rs):
+        self.calls.append('Geometry_GetNode')
+        return (0, riv, rch, rs)
+
+    def NodeIndex(self, riv, rch, RS):
+        self.calls.append('NodeIndex')
+        return (0, riv, rch, RS)
+
+    def Plan_SetCurrent(self, PlanTitleToSet):
+        return (True, PlanTitleToSet)
+
+    def Project_Open(self, ProjectFileName):
+        pass
+
+
+def model_controller():
+    """Return a RAS41 controller and its geometry on a FakeModel."""
+    model = FakeModel()
+    rc = RAS41.__new__(RAS41)
+    rc._rc = model
+    rc._ids = {}
+    rc._id_stats = {'hits': 0, 'misses': 0, 'loads': 0}
+    rc._geometry = hecrasgeometry.RAS41.__new__(hecrasgeometry.RAS41)
+    rc._geometry._geometry = model
+    rc._geometry._controller = rc
+    return rc, model
+
+
+def test_output_cube():
+    cube, coords = controller().output_cube([2, 5])
+    assert_array_equal(coords['rs'], ['30', '20', '10'])
+    assert coords['profile'] == ['PF 1', 'PF 2']
+    assert_array_equal(cube[:, 0, 0], [14.0, 13.0, 12.0])
+    assert_array_equal(cube[:, 1, 1], [np.nan, 26.0, 25.0])
+
+
+def test_output_cube_empty():
+    with pytest.raises(ValueError):
+        controller().output_cube([2], profiles=[])
+    with pytest.raises(ValueError):
+        controller().output_cube([])
+
+
+def test_fix_dates():
+    # The first item of the 1-based array is not a date
+    dates = (-1.0, 2.0, 43831.5, 43831.0 + 0.25 / 86400)
+    assert _fix_dates(dates) == [dt.datetime(1900, 1, 1),
+                                 dt.datetime(2020, 1, 1, 12),
+                                 dt.datetime(2020, 1, 1, 0, 0, 0, 250000)]
+    assert _fix_dates(dates) == [dt.datetime(1899, 12, 30) + dt.timedelta(d)
+                                 for d in dates[1:]]
+    assert_array_equal(_fix_dates(dates, as_array=True), np.array(
+        ['1900-01-01', '2020-01-01T12:00', '2020-01-01T00:00'],
+        dtype='datetime64[s]'))
+    assert _fix_dates(None) == []
+    assert _fix_dates((0.0,), as_array=True).size == 0
+
+
+def test_fix_values():
+    values = _fix_values((None, 1, 2.5))
+    assert values.dtype == np.float64
+    assert_array_equal(values, [1.0, 2.5])
+    assert _fix_values(None).size == 0
+
+
+@pytest.mark.parametrize('output', [False, True])
+def test_ids(output):
+    rc, model = model_controller()
+    assert rc.get_ids('Main', output=output) == (1,)
+    assert rc.get_ids('Trib', 'Only', output=output) == (2, 1)
+    assert rc.get_ids('Main', 'Upper', '300', output=output) == (1, 1, 1)
+    assert rc.get_ids('Main', 'Upper', '100', output=output) == (1, 1, 3)
+    assert rc.get_ids('Trib', 'Only', '10', output=output) == (2, 1, 2)
+    assert rc.get_ids('Main', 'Upper', '250', output=output) is None
+    assert rc.get_names(1, 1, 2, output=output) == ('Main', 'Upper', '200')
+    assert rc.get_names(2, output=output) == ('Trib',)
+    assert rc.get_names(2, 1, 3, output=output) is None
+    info = rc.id_cache_info()
+    assert info == {'hits': 7, 'misses': 2, 'loads': 1, 'size': 9}
+
+
+def test_cached_node_ids():
+    rc, model = model_controller()
+    assert rc.Output_GetRiver('Trib') == 2
+    assert rc.Output_GetReach(2, 'Only') == 1
+    assert rc.Output_GetNode(1, 1, '200') == 2
+    assert rc.Geometry_GetNode(2, 1, '10') == 2
+    assert model.calls == []
+    assert rc.id_cache_info()['loads'] == 2
+    # Unknown names are looked up with HEC-RAS
+    assert rc.Output_GetNode(1, 1, '250') == 0
+    assert rc.Geometry_GetNode(1, 1, '250') is None
+    assert model.calls == ['Output_GetNode', 'Geometry_GetNode']
+
+
+def test_cached_geometry_ids():
+    rc, model = model_controller()
+    geometry = rc.Geometry()
+    assert geometry.RiverIndex('Trib') == 2
+    assert geometry.ReachIndex(1, 'Upper') == 1
+    assert geometry.NodeIndex(1, 1, '100') == 3
+    assert geometry.NodeRS(2, 1, 1) == '20'
+    assert model.calls == []
+    assert geometry.NodeIndex(1, 1, '250') == 0
+    assert model.calls == ['NodeIndex']
+
+
+def test_id_changes_clear_cache(tmpdir):
+    rc, model = model_controller()
+    rc.get_ids('Main')
+    rc.get_ids('Main', output=True)
+    assert rc.id_cache_info()['size'] == 18
+    rc.Plan_SetCurrent('Plan 2')
+    assert rc.id_cache_info()['size'] == 0
+    rc.get_ids('Main')
+    project = tmpdir.join('model.prj')
+    project.write('')
+    rc.Project_Open(str(project))
+    info = rc.id_cache_info()
+    assert (info['size'], info['loads']) == (0, 3)
+    rc.get_ids('Main')
+    assert rc.id_cache_info()['loads'] == 4
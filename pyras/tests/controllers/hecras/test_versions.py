@@ -0,0 +1,72 @@
+"""
+Tests of the lookup of the installed HEC-RAS versions.
+"""
+import os.path as osp
+import subprocess
+import sys
+
+import pyras
+from pyras.controllers import hecras
+
+
+# Imports pyras.controllers.hecras where pywin32 can not be imported, and
+# lists the attempts to import it
+WITHOUT_PYWIN32 = '''
+import sys
+
+attempts = []
+
+class NoPywin32(object):
+    def find_module(self, name, path=None):
+        return self if name.startswith(('win32', 'pythoncom')) else None
+
+    def find_spec(self, name, path=None, target=None):
+        if self.find_module(name):
+            attempts.append(name)
+            raise ImportError(name)
+
+    def load_module(self, name):
+        attempts.append(name)
+        raise ImportError(name)
+
+sys.meta_path.insert(0, NoPywin32())
+from pyras.controllers import hecras
+assert attempts == [], attempts
+assert not [name for name in sys.modules if name.startswith('win32')]
+assert hecras.get_available_versions() == []
+assert attempts == ['win32api'], attempts
+'''
+
+
+def test_import_without_pywin32():
+    root = osp.dirname(osp.dirname(osp.abspath(pyras.__file__)))
+    subprocess.check_call([sys.executable, '-c', WITHOUT_PYWIN32], cwd=root)
+
+
+def test_available_versions_memoized(monkeypatch):
+    calls = []
+
+    def no_pywin32():
+        calls.append(None)
+        raise ImportError('No module named win32api')
+
+    monkeypatch.setattr(hecras, '_typelib_stamp', no_pywin32)
+    monkeypatch.setattr(hecras, '_available_versions', None)
+    assert hecras.get_available_versions() == []
+    assert hecras.get_available_versions() == []
+    assert len(calls) == 1
+    assert hecras.get_available_versions(refresh=True) == []
+    assert len(calls) == 2
+
+
+def test_version_cache(tmpdir, monkeypatch):
+    filename = osp.join(str(tmpdir), 'pyras', 'hecras_versions.json')
+    monkeypatch.setattr(hecras, '_version_cache', lambda: filename)
+    ras = tmpdir.join('ras.exe')
+    ras.write('')
+    found = [['RAS41', str(ras)]]
+    hecras._write_version_cache([1, 2], found)
+    assert hecras._read_version_cache([1, 2]) == found
+    assert hecras._read_version_cache([1, 3]) is None
+    ras.remove()
+    assert hecras._read_version_cache([1, 2]) is None
@@ -0,0 +1,51 @@
+"""
+Tests of the construction of river networks from reach lines.
+"""
+import os.path as osp
+
+import numpy as np
+from numpy.testing import assert_allclose, assert_array_equal
+
+from pyras.core.base.topology import (network_from_geometry,
+                                      network_from_lines, snap_points)
+
+
+DATA = osp.join(osp.dirname(osp.dirname(osp.dirname(__file__))), 'data')
+
+
+def test_snap_points():
+    x = [0.0, 0.004, 5.0, 10.0, 10.009, 10.0, 0.012]
+    y = [0.0, 0.003, 5.0, 10.0, 10.0, 10.009, 0.0]
+    assert_array_equal(snap_points(x, y, 0.01), [0, 0, 1, 2, 2, 2, 0])
+    # Chains of close points are one group
+    assert_array_equal(snap_points([0.0, 0.8, 1.6, 3.0], np.zeros(4), 1.0),
+                       [0, 0, 0, 1])
+
+
+def test_network_from_lines():
+    # A splits into B and C, which join into D
+    lines = [[(0, 0), (0, 10)], [(0, 10), (-5, 15), (0, 20)],
+             [(0.001, 10), (5, 15), (0, 20.001)], [(0, 20), (0, 30)]]
+    count = [len(line) for line in lines]
+    xy = np.concatenate(lines).astype(float)
+    start = np.concatenate([[0], np.cumsum(count)[:-1]])
+    net = network_from_lines(['A', 'B', 'C', 'D'], xy[:, 0], xy[:, 1],
+                             start, count)
+    assert net.downstream[0] == net.upstream[1] == net.upstream[2]
+    assert net.downstream[1] == net.downstream[2] == net.upstream[3]
+    assert net.n_junctions == 4
+    assert_allclose(net.lengths, [10.0, 2 * np.hypot(5, 5),
+                                  2 * np.hypot(5, 5), 10.0], rtol=1e-3)
+    assert_allclose(net.route([1.0, 0.0, 0.0, 0.0]), [1.0, 0.5, 0.5, 1.0])
+
+
+def test_network_from_geometry():
+    net = network_from_geometry(osp.join(DATA, 'fixture.g01'))
+    main = net.find('Main', 'Upper')
+    trib = net.find('Trib', 'Only')
+    lower = net.find('Main', 'Lower')
+    assert net.downstream[main] == net.downstream[trib] == net.upstream[lower]
+    assert_allclose(net.accumulate(np.ones(len(net)))[lower], 3.0)
+    snapped = network_from_geometry(osp.join(DATA, 'fixture.g01'),
+                                    tolerance=1.0)
+    assert_array_equal(snapped.route(np.ones(3)), net.route(np.ones(3)))
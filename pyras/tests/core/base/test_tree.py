@@ -0,0 +1,48 @@
+"""
+Tests of the river network on a split that joins again: reach A splits into
+B and C at junction 0, which join into D at junction 1.
+"""
+import numpy as np
+from numpy.testing import assert_allclose, assert_array_equal
+
+from pyras.core.base.tree import RiverNetwork
+
+
+def network():
+    return RiverNetwork([-1, 0, 0, 1], [0, 1, 1, -1],
+                        [('R', 'A'), ('R', 'B'), ('S', 'C'), ('R', 'D')],
+                        [1.0, 2.0, 3.0, 4.0])
+
+
+def test_connectivity():
+    net = network()
+    assert net.n_junctions == 4
+    assert net.find('S', 'C') == 2
+    assert_array_equal(net.down_index[net.down_start[0]:net.down_start[1]],
+                       [1, 2])
+    assert_array_equal(net.up_index[net.up_start[3]:net.up_start[4]],
+                       [1, 2])
+    assert_array_equal(net.upstream_of([3]), [0, 1, 2])
+    assert_array_equal(net.downstream_of([2], include=True), [2, 3])
+
+
+def test_accumulate():
+    net = network()
+    assert_allclose(net.accumulate(np.ones(4)), [1.0, 2.0, 2.0, 5.0])
+    assert_allclose(net.accumulate(np.ones(4), 'upstream'),
+                    [5.0, 2.0, 2.0, 1.0])
+    assert_allclose(net.accumulate(np.arange(4.0), ufunc=np.maximum),
+                    [0.0, 1.0, 2.0, 5.0])
+    assert_allclose(net.distance_to_outlet(), [7.0, 6.0, 7.0, 4.0])
+    # Many profiles at once
+    values = np.column_stack([np.ones(4), 2 * np.ones(4)])
+    assert_allclose(net.accumulate(values)[3], [5.0, 10.0])
+
+
+def test_route():
+    net = network()
+    flow = net.route([10.0, 0.0, 0.0, 1.0], split=[1.0, 1.0, 3.0, 1.0])
+    assert_allclose(flow, [10.0, 2.5, 7.5, 11.0])
+    flow = net.route(np.array([[10.0, 20.0], [0, 0], [0, 2.0], [0, 0]]))
+    assert_allclose(flow, [[10.0, 20.0], [5.0, 10.0], [5.0, 12.0],
+                           [10.0, 22.0]])
@@ -0,0 +1,65 @@
+"""
+Tests of the batch normal and critical depth solvers.
+"""
+import numpy as np
+from numpy.testing import assert_allclose
+
+from pyras.core.depth import critical_depth, normal_depth
+from pyras.core.hydraulics import GRAVITY, MANNING_CONSTANT
+from pyras.core.xsection import CrossSection
+
+
+WIDTH = 10.0
+HEIGHT = 10.0
+N = 0.03
+SLOPE = 0.001
+
+
+def rectangle():
+    """A rectangular channel with vertical walls."""
+    return CrossSection([0.0, 0.0, WIDTH, WIDTH], [HEIGHT, 0.0, 0.0, HEIGHT],
+                        [0.0], [N], (0.0, WIDTH))
+
+
+def manning_flow(depth):
+    """Flow of the rectangular channel at normal depth."""
+    area = WIDTH * depth
+    radius = area / (WIDTH + 2 * depth)
+    return (MANNING_CONSTANT['English'] / N * area * radius ** (2.0 / 3) *
+            np.sqrt(SLOPE))
+
+
+def test_normal_depth_rectangle():
+    depths = np.array([0.5, 2.0, 5.0, 9.0])
+    wse, converged = normal_depth([rectangle()], SLOPE, manning_flow(depths))
+    assert converged.all()
+    assert_allclose(wse[0], depths, atol=2e-3)
+
+
+def test_critical_depth_rectangle():
+    flows = np.array([10.0, 100.0, 1000.0])
+    wse, converged = critical_depth([rectangle()], flows)
+    expected = (flows ** 2 / WIDTH ** 2 / GRAVITY['English']) ** (1.0 / 3)
+    assert converged.all()
+    assert_allclose(wse[0], expected, atol=2e-3)
+
+
+def test_dry_and_many_sections():
+    sections = [rectangle(), rectangle()]
+    flow = np.array([[0.0, manning_flow(1.0)], [manning_flow(3.0), 0.0]])
+    wse, converged = normal_depth(sections, SLOPE, flow)
+    assert converged.all()
+    assert_allclose(wse, [[0.0, 1.0], [3.0, 0.0]], atol=2e-3)
+
+
+def test_above_table_not_converged():
+    # The normal depth is above the top of the cross section
+    flow = manning_flow(2 * HEIGHT)
+    wse, converged = normal_depth([rectangle()], SLOPE, [flow, 100.0])
+    assert not converged[0, 0]
+    assert wse[0, 0] > HEIGHT
+    assert converged[0, 1]
+
+    flow = np.sqrt(GRAVITY['English'] * (WIDTH * 2 * HEIGHT) ** 3 / WIDTH)
+    wse, converged = critical_depth([rectangle()], [flow])
+    assert not converged[0, 0]
@@ -0,0 +1,85 @@
+"""
+Tests of the hydraulic property tables.
+"""
+import os.path as osp
+
+import numpy as np
+from numpy.testing import assert_allclose, assert_array_equal
+
+from pyras.core.htab import HydraulicTable
+from pyras.core.hydraulics import Subdivision
+
+
+def sections():
+    """A trapezoid at 100 and a rectangle at 50, both 10 deep."""
+    station = [0.0, 10.0, 20.0, 30.0, 0.0, 0.0, 8.0, 8.0]
+    elevation = [110.0, 100.0, 100.0, 110.0, 60.0, 50.0, 50.0, 60.0]
+    return Subdivision(station, elevation, [4, 4], [0.0, 0.0], [0.03, 0.03],
+                       [1, 1], [(0.0, 30.0), (0.0, 8.0)])
+
+
+def direct(subdivision, z, sections):
+    """Properties computed without the tables, summed by subsection."""
+    wse = np.full((subdivision.n_sections, z.size), np.nan)
+    wse[sections, np.arange(z.size)] = z
+    values = subdivision.properties(np.nan_to_num(wse))
+    return dict((name, values[name][sections, :, np.arange(z.size)].sum(
+        axis=-1)) for name in ('area', 'perimeter', 'top_width',
+                               'conveyance'))
+
+
+def test_build_and_lookup():
+    subdivision = sections()
+    table = HydraulicTable.build(subdivision, n_points=21)
+    assert table.n_points == 21
+    assert_allclose(table.start, [100.0, 50.0])
+    assert_allclose(table.increment, [0.5, 0.5])
+
+    # Exact at the elevations of the tables
+    z = table.elevation.ravel()
+    index = np.repeat([0, 1], 21)
+    values = table.lookup(z, index)
+    expected = direct(subdivision, z, index)
+    for name in expected:
+        assert_allclose(values[name], expected[name], atol=1e-9)
+
+    # Between them the area is exact but for the flat bottom, the others
+    # close
+    z = np.array([100.3, 104.7, 109.9, 50.2, 57.1])
+    index = np.array([0, 0, 0, 1, 1])
+    values = table.lookup(z, index)
+    expected = direct(subdivision, z, index)
+    assert_allclose(values['area'], expected['area'], rtol=1e-5)
+    assert_allclose(values['top_width'], expected['top_width'], rtol=1e-5)
+    # The conveyance is far from linear in the first interval
+    above = [1, 2, 4]
+    assert_allclose(values['conveyance'][above],
+                    expected['conveyance'][above], rtol=0.01)
+    assert_allclose(table.lookup([99.0, 49.0], [0, 1])['area'], 0.0)
+
+
+def test_increment_and_concatenate():
+    subdivision = sections()
+    fine = HydraulicTable.build(subdivision, increment=0.25)
+    assert_allclose(fine.increment, 0.25)
+    coarse = HydraulicTable.build(subdivision, n_points=11)
+    joined = HydraulicTable.concatenate([coarse, fine])
+    assert len(joined) == 4
+    assert joined.n_points == fine.n_points
+    # The padding extends the coarse tables above their top
+    z = np.array([104.0, 112.0])
+    assert_allclose(joined.lookup(z, [0, 0])['area'],
+                    coarse.lookup(z, [0, 0])['area'])
+
+
+def test_save_load(tmpdir):
+    table = HydraulicTable.build(sections(), n_points=11, fingerprint='abc')
+    filename = osp.join(str(tmpdir), 'table.npz')
+    table.save(filename)
+    loaded = HydraulicTable.load(filename)
+    assert loaded.fingerprint == 'abc'
+    assert loaded.units == 'English'
+    assert_array_equal(loaded.start, table.start)
+    assert_array_equal(loaded.increment, table.increment)
+    for name in table.tables:
+        assert_array_equal(loaded.tables[name], table.tables[name])
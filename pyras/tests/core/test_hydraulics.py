@@ -0,0 +1,80 @@
+"""
+Tests of the vectorized hydraulic properties against analytic channels.
+"""
+import numpy as np
+from numpy.testing import assert_allclose
+
+from pyras.core.hydraulics import MANNING_CONSTANT, Subdivision
+
+
+N = 0.035
+DEPTHS = np.array([0.0, 0.5, 1.0, 3.0, 7.5, 10.0])
+
+
+def trapezoid():
+    """Bottom width 10, side slopes 1:1, 10 deep, thalweg at 100."""
+    station = [0.0, 10.0, 20.0, 30.0]
+    elevation = [110.0, 100.0, 100.0, 110.0]
+    return Subdivision(station, elevation, [4], [0.0], [N], [1],
+                       [(0.0, 30.0)])
+
+
+def manning(area, perimeter):
+    radius = np.where(perimeter > 0, area / np.where(perimeter > 0,
+                                                      perimeter, 1.0), 0.0)
+    return MANNING_CONSTANT['English'] / N * area * radius ** (2.0 / 3)
+
+
+def test_trapezoid():
+    values = trapezoid().properties(100.0 + DEPTHS)
+    area = (10.0 + DEPTHS) * DEPTHS
+    perimeter = np.where(DEPTHS > 0, 10.0 + 2 * np.sqrt(2.0) * DEPTHS, 0.0)
+    top_width = np.where(DEPTHS > 0, 10.0 + 2 * DEPTHS, 0.0)
+    assert_allclose(values['area'][0].sum(axis=0), area)
+    assert_allclose(values['perimeter'][0].sum(axis=0), perimeter)
+    assert_allclose(values['top_width'][0].sum(axis=0), top_width)
+    assert_allclose(values['conveyance'][0, 1], manning(area, perimeter))
+    # All in the channel
+    assert_allclose(values['area'][0, [0, 2]], 0.0)
+
+
+def test_rectangle_and_many_sections():
+    # A rectangle with vertical walls next to the trapezoid
+    rectangle = ([0.0, 0.0, 8.0, 8.0], [60.0, 50.0, 50.0, 60.0])
+    trap = ([0.0, 10.0, 20.0, 30.0], [110.0, 100.0, 100.0, 110.0])
+    subdivision = Subdivision(rectangle[0] + trap[0], rectangle[1] + trap[1],
+                              [4, 4], [0.0, 0.0], [N, N], [1, 1],
+                              [(0.0, 8.0), (0.0, 30.0)])
+    wse = np.array([50.0 + DEPTHS, 100.0 + DEPTHS])
+    values = subdivision.properties(wse)
+    area = 8.0 * DEPTHS
+    perimeter = np.where(DEPTHS > 0, 8.0 + 2 * DEPTHS, 0.0)
+    assert_allclose(values['area'][0].sum(axis=0), area)
+    assert_allclose(values['perimeter'][0].sum(axis=0), perimeter)
+    assert_allclose(values['top_width'][0].sum(axis=0),
+                    np.where(DEPTHS > 0, 8.0, 0.0))
+    assert_allclose(values['conveyance'][0].sum(axis=0),
+                    manning(area, perimeter))
+    assert_allclose(values['area'][1].sum(axis=0), (10.0 + DEPTHS) * DEPTHS)
+
+
+def test_overbanks_subdivided():
+    # Trapezoidal channel 2 deep, 6 wide at the bottom and 10 at the banks,
+    # between flat overbanks 20 wide, n breakpoints at the banks
+    station = [0.0, 0.0, 20.0, 22.0, 28.0, 30.0, 50.0, 50.0]
+    elevation = [104.0, 102.0, 102.0, 100.0, 100.0, 102.0, 102.0, 104.0]
+    subdivision = Subdivision(station, elevation, [8], [0.0, 20.0, 30.0],
+                              [0.06, 0.03, 0.08], [3], [(20.0, 30.0)])
+    values = subdivision.properties([103.0])
+    area = np.array([20.0, 26.0, 20.0])
+    perimeter = np.array([21.0, 6.0 + 4 * np.sqrt(2.0), 21.0])
+    assert_allclose(values['area'][0, :, 0], area)
+    assert_allclose(values['top_width'][0, :, 0], [20.0, 10.0, 20.0])
+    assert_allclose(values['perimeter'][0, :, 0], perimeter)
+    c = MANNING_CONSTANT['English']
+    expected = (c / np.array([0.06, 0.03, 0.08]) * area *
+                (area / perimeter) ** (2.0 / 3))
+    assert_allclose(values['conveyance'][0, :, 0], expected)
+    total = expected.sum()
+    k3a2 = (expected ** 3 / area ** 2).sum()
+    assert_allclose(values['alpha'][0, 0], area.sum() ** 2 * k3a2 / total ** 3)
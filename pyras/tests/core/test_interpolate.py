@@ -0,0 +1,102 @@
+"""
+Tests of the interpolation of cross sections along a reach.
+"""
+import os.path as osp
+import shutil
+
+from numpy.testing import assert_allclose, assert_array_equal
+
+from pyras.core.collection import CrossSectionCollection
+from pyras.core.interpolate import interpolate_reach, write_interpolated
+from pyras.core.xsection import CrossSection
+from pyras.io.hecras.read_ras import read_geometry
+
+
+DATA = osp.join(osp.dirname(osp.dirname(__file__)), 'data')
+
+
+def reach():
+    """Three cross sections, the middle one with a point between its left
+    bank and its thalweg."""
+    upstream = CrossSection([0, 10, 20, 30, 40], [10, 5, 0, 5, 10],
+                            [0, 10, 30], [0.06, 0.035, 0.06], (10, 30),
+                            name='300', location=('River', 'Reach'),
+                            lengths=(100, 100, 100), exp_contr=(0.1, 0.3))
+    middle = CrossSection([0, 20, 30, 40, 60, 80], [12, 6, 4, 2, 6, 12],
+                          [0, 20, 60], [0.07, 0.04, 0.07], (20, 60),
+                          name='200', location=('River', 'Reach'),
+                          lengths=(60, 80, 100), exp_contr=(0.1, 0.3))
+    downstream = CrossSection([0, 20, 40], [8, 1, 8], [0], [0.05], (0, 40),
+                              name='100', location=('River', 'Reach'),
+                              lengths=(0, 0, 0), exp_contr=(0.1, 0.3))
+    return CrossSectionCollection.from_sections([upstream, middle,
+                                                 downstream])
+
+
+def test_chord_interpolation():
+    merged, interpolated = interpolate_reach(reach(), count=[1, 0])
+    assert_array_equal(interpolated, [False, True, False, False])
+    assert_array_equal(merged.names, ['300', '250*', '200', '100'])
+    new = merged[1]
+    # Half way between the master points (0, 10, 20, 30, 40) and
+    # (0, 20, 40, 60, 80), the extra point of the middle cross section at
+    # 1.5 on the chords, where the upstream one is at elevation 2.5
+    assert_allclose(new.station, [0, 15, 22.5, 30, 45, 60])
+    assert_allclose(new.elevation, [11, 5.5, 3.25, 1, 5.5, 11])
+    assert new.banks == (15, 45)
+    # Manning's n values of the nearest cross section, here the downstream
+    # one at equal distance
+    assert_allclose(new.mann_station, [0, 15, 45])
+    assert_allclose(new.mann_n, [0.07, 0.04, 0.07])
+    assert merged.location(1) == ('River', 'Reach')
+
+
+def test_count_zero_and_lengths():
+    collection = reach()
+    merged, interpolated = interpolate_reach(collection, count=[1, 0])
+    # The reach lengths of the upstream cross section are divided, the pair
+    # with a count of 0 is left untouched
+    assert_allclose(merged.lengths, [[50, 50, 50], [50, 50, 50],
+                                     [60, 80, 100], [0, 0, 0]])
+    assert_array_equal(merged[2].station, collection[1].station)
+    assert_array_equal(merged[3].elevation, collection[2].elevation)
+
+    merged, interpolated = interpolate_reach(collection, count=0)
+    assert not interpolated.any()
+    assert_allclose(merged.lengths, collection.lengths)
+
+
+def test_spacing():
+    merged, interpolated = interpolate_reach(reach(), spacing=30.0)
+    # ceil(100 / 30) - 1 and ceil(80 / 30) - 1 cross sections
+    assert_array_equal(interpolated, [False, True, True, True, False, True,
+                                      True, False])
+    assert_array_equal(merged.names[1:4], ['275*', '250*', '225*'])
+    assert_allclose(merged.lengths[:4, 1], 25.0)
+    assert_allclose(merged.lengths[4:7, 1], 80.0 / 3)
+    assert_allclose(merged.lengths[4:7, 0], 20.0)
+
+
+def test_write_interpolated(tmpdir):
+    # The index of the source file is written next to it
+    filename = osp.join(str(tmpdir), 'fixture.g01')
+    shutil.copy(osp.join(DATA, 'fixture.g01'), filename)
+    collection = CrossSectionCollection.from_geometry(filename)
+    upper = collection.take([collection.find('Main', 'Upper', rs)
+                             for rs in ('300', '200', '100')])
+    merged, interpolated = interpolate_reach(upper, spacing=50.0)
+    output = osp.join(str(tmpdir), 'interpolated.g01')
+    write_interpolated(filename, merged, interpolated, output)
+
+    nodes = [node for node in read_geometry(output)
+             if node['reach'] == 'Upper']
+    assert [node['rs'] for node in nodes] == ['300', '250*', '200', '150*',
+                                              '100', '50', '10']
+    for i, node in enumerate(nodes[:5]):
+        assert_allclose(node['station'], merged[i].station, atol=1e-4)
+        assert_allclose(node['elevation'], merged[i].elevation, atol=1e-4)
+        assert_allclose(node['lengths'], merged.lengths[i])
+    assert_allclose(nodes[1]['mann_n'], merged[1].mann_n)
+    # The source file is left as it is
+    assert [node['rs'] for node in read_geometry(filename)][:3] == \
+        ['300', '200', '100']
@@ -0,0 +1,132 @@
+"""
+Tests of the spatial index against brute force searches.
+"""
+import numpy as np
+from numpy.testing import assert_allclose, assert_array_equal
+
+from pyras.core.spatial import SpatialIndex, _distance2
+
+
+def random_lines(n=60, points=5, seed=0):
+    """Random polylines, some with a single point or none."""
+    rng = np.random.default_rng(seed)
+    count = rng.integers(0, points + 1, n)
+    start = np.concatenate([[0], np.cumsum(count)[:-1]])
+    origin = np.repeat(rng.uniform(0, 1000, (n, 2)), count, axis=0)
+    xy = origin + rng.normal(0, 40, (count.sum(), 2))
+    return xy[:, 0], xy[:, 1], start, count
+
+
+def brute_distance(x, y, start, count, px, py):
+    """Distance of a point to every polyline, inf without points."""
+    result = np.full(count.size, np.inf)
+    for i, (s, c) in enumerate(zip(start, count)):
+        if c == 0:
+            continue
+        i1 = np.arange(s + 1, s + c) if c > 1 else np.array([s])
+        i0 = i1 - 1 if c > 1 else i1
+        result[i] = np.sqrt(_distance2(px, py, x[i0], y[i0], x[i1],
+                                       y[i1]).min())
+    return result
+
+
+def segments(x, y, start, count):
+    """The segments of every polyline, single points as segments."""
+    result = []
+    for s, c in zip(start, count):
+        i0 = np.arange(s, s + max(c - 1, min(c, 1)))
+        i1 = np.where(c > 1, i0 + 1, i0)
+        result.append((x[i0], y[i0], x[i1], y[i1]))
+    return result
+
+
+def cross(ax, ay, bx, by, cx, cy, dx, dy):
+    """Test which segments AB cross the segment CD, touching included."""
+    def orient(px, py, qx, qy, rx, ry):
+        return np.sign((qx - px) * (ry - py) - (qy - py) * (rx - px))
+
+    def between(p, q, r):
+        return (np.minimum(p, q) <= r) & (r <= np.maximum(p, q))
+
+    d1 = orient(cx, cy, dx, dy, ax, ay)
+    d2 = orient(cx, cy, dx, dy, bx, by)
+    d3 = orient(ax, ay, bx, by, cx, cy)
+    d4 = orient(ax, ay, bx, by, dx, dy)
+    proper = (d1 * d2 < 0) & (d3 * d4 < 0)
+    touch = ((d1 == 0) & between(cx, dx, ax) & between(cy, dy, ay) |
+             (d2 == 0) & between(cx, dx, bx) & between(cy, dy, by) |
+             (d3 == 0) & between(ax, bx, cx) & between(ay, by, cy) |
+             (d4 == 0) & between(ax, bx, dx) & between(ay, by, dy))
+    return proper | touch
+
+
+def test_bbox_matches_brute_force():
+    x, y, start, count = random_lines()
+    index = SpatialIndex(x, y, start, count, node_capacity=4)
+    lines = segments(x, y, start, count)
+    rng = np.random.default_rng(2)
+    for x0, y0 in rng.uniform(0, 1000, (20, 2)):
+        x1, y1 = x0 + 150.0, y0 + 80.0
+        expected = []
+        for i, (ax, ay, bx, by) in enumerate(lines):
+            inside = ((ax >= x0) & (ax <= x1) & (ay >= y0) & (ay <= y1))
+            edges = [(x0, y0, x1, y0), (x1, y0, x1, y1),
+                     (x1, y1, x0, y1), (x0, y1, x0, y0)]
+            if inside.any() or any(cross(ax, ay, bx, by, *edge).any()
+                                   for edge in edges):
+                expected.append(i)
+        assert_array_equal(index.bbox(x0, y0, x1, y1), expected)
+
+
+def test_intersects_matches_brute_force():
+    x, y, start, count = random_lines()
+    index = SpatialIndex(x, y, start, count, node_capacity=4)
+    lines = segments(x, y, start, count)
+    rng = np.random.default_rng(3)
+    for _ in range(10):
+        qx, qy = rng.uniform(0, 1000, (2, 4))
+        expected = [i for i, (ax, ay, bx, by) in enumerate(lines)
+                    if any(cross(ax, ay, bx, by, qx[j], qy[j], qx[j + 1],
+                                 qy[j + 1]).any() for j in range(3))]
+        assert_array_equal(index.intersects(qx, qy), expected)
+        found, px, py = index.intersects(qx, qy, points=True)
+        assert_array_equal(np.unique(found), expected)
+
+
+def test_nearest_matches_brute_force():
+    x, y, start, count = random_lines()
+    index = SpatialIndex(x, y, start, count, node_capacity=4)
+    rng = np.random.default_rng(1)
+    for px, py in rng.uniform(-100, 1100, (20, 2)):
+        expected = brute_distance(x, y, start, count, px, py)
+        for k in (1, 3, 10):
+            found, distance = index.nearest(px, py, k)
+            assert_allclose(distance, np.sort(expected)[:k])
+            assert_allclose(expected[found], distance)
+        found, distance = index.nearest(px, py, 5, max_distance=200.0)
+        assert_array_equal(np.sort(found),
+                           np.sort(np.argsort(expected)[:5][
+                               np.sort(expected)[:5] <= 200.0]))
+
+
+def test_nearest_long_lines_no_full_scan():
+    # The nearest leaves all belong to the nearest polyline
+    t = np.linspace(0.0, 1000.0, 501)
+    x = np.concatenate([t, t, t])
+    y = np.concatenate([np.zeros(501), np.full(501, 10.0),
+                        np.full(501, 500.0)])
+    index = SpatialIndex(x, y, [0, 501, 1002], [501, 501, 501],
+                         node_capacity=4)
+    searched = []
+    search = index._search
+
+    def spy(keep):
+        segments = search(keep)
+        searched.append(segments.size)
+        return segments
+
+    index._search = spy
+    found, distance = index.nearest(500.0, 1.0, k=2)
+    assert_array_equal(found, [0, 1])
+    assert_allclose(distance, [1.0, 9.0])
+    assert searched[0] < index.owner.size // 4
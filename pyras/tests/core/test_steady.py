@@ -0,0 +1,51 @@
+"""
+Tests of the standard step computation of steady flow.
+"""
+import numpy as np
+from numpy.testing import assert_allclose
+
+from pyras.core.depth import normal_depth
+from pyras.core.steady import SteadyReach
+from pyras.core.xsection import CrossSection
+
+
+SLOPE = 0.001
+LENGTH = 500.0
+
+
+def prismatic_reach(n_sections=11):
+    """Identical trapezoids on a constant bottom slope, from upstream."""
+    sections = []
+    for i in range(n_sections):
+        bottom = 100.0 - SLOPE * LENGTH * i
+        sections.append(CrossSection(
+            [0.0, 10.0, 30.0, 40.0],
+            [bottom + 10, bottom, bottom, bottom + 10], [0.0], [0.03],
+            (0.0, 40.0), name=str(n_sections - i),
+            lengths=(LENGTH, LENGTH, LENGTH)))
+    return SteadyReach(sections)
+
+
+def test_normal_depth_kept():
+    reach = prismatic_reach()
+    flow = np.array([50.0, 400.0, 1500.0])
+    result = reach.compute(flow, slope=SLOPE)
+    assert result['converged'].all()
+    assert not result['critical'].any()
+    depth = result['wse'] - np.array(
+        [section.offset for section in reach.sections])[:, None]
+    expected, _ = normal_depth([reach.sections[0]], SLOPE, flow)
+    expected = expected[0] - reach.sections[0].offset
+    assert_allclose(depth, np.broadcast_to(expected, depth.shape), atol=0.02)
+    assert (result['froude'] < 1).all()
+
+
+def test_backwater_above_normal_depth():
+    reach = prismatic_reach()
+    flow = np.array([400.0])
+    normal = reach.compute(flow, slope=SLOPE)['wse']
+    result = reach.compute(flow, ws=normal[-1] + 2.0)
+    rise = result['wse'][:, 0] - normal[:, 0]
+    # An M1 profile, the rise decreases upstream
+    assert (rise > 0).all()
+    assert (np.diff(rise) > 0).all()
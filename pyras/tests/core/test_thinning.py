@@ -0,0 +1,61 @@
+"""
+Tests of the point thinning of cross sections.
+"""
+import numpy as np
+from numpy.testing import assert_array_equal
+
+from pyras.core import thinning
+from pyras.core.collection import CrossSectionCollection
+from pyras.core.xsection import CrossSection
+
+
+def test_local_minima_ties():
+    area = np.array([np.inf, 0, 0, 0, 0, 0, 1, 2, 1, 1, np.inf])
+    candidate = np.isfinite(area)
+    assert_array_equal(np.nonzero(thinning._local_minima(area, candidate))[0],
+                       [1, 3, 5, 8])
+
+
+def test_collinear_run_passes(monkeypatch):
+    station = np.linspace(0.0, 1000.0, 2001)
+    elevation = np.abs(station - 500.0) / 100.0
+    section = CrossSection(station, elevation, [0.0], [0.04], (0.0, 1000.0))
+    collection = CrossSectionCollection.from_sections([section])
+    calls = []
+    triangles = thinning._triangles
+
+    def spy(*args):
+        calls.append(None)
+        return triangles(*args)
+
+    monkeypatch.setattr(thinning, '_triangles', spy)
+    simplified, report = thinning.simplify(collection, tolerance=None,
+                                           area=1e-6, max_points=None)
+    assert_array_equal(simplified[0].station, [0.0, 500.0, 1000.0])
+    assert len(calls) < 20
+
+
+def test_breakpoints_kept():
+    rng = np.random.default_rng(0)
+    station = np.linspace(0.0, 300.0, 1201)
+    elevation = (100.0 + np.abs(station - 150.0) / 15.0 +
+                 rng.normal(0, 0.02, station.size))
+    mann_station = [0.0, 60.1, 100.05, 210.3]
+    section = CrossSection(station, elevation, mann_station,
+                           [0.08, 0.06, 0.035, 0.07], (100.05, 210.3),
+                           levees=(40.02, np.nan))
+    collection = CrossSectionCollection.from_sections([section, section])
+    simplified, report = thinning.simplify(collection, tolerance=0.1,
+                                           max_points=300)
+    assert (simplified.count <= 300).all()
+    assert_array_equal(report['points'], [1201, 1201])
+    for thin in simplified:
+        kept = thin.station
+        assert kept[0] == 0.0 and kept[-1] == 300.0
+        assert elevation.argmin() in np.searchsorted(station, kept)
+        for value in mann_station[1:] + [40.02]:
+            below = station[station <= value].max()
+            above = station[station >= value].min()
+            assert below in kept and above in kept
+        assert_array_equal(thin.mann_station, mann_station)
+        assert thin.banks == (100.05, 210.3)
@@ -0,0 +1,48 @@
+"""
+Tests of the cross sections viewing a collection.
+"""
+from numpy.testing import assert_allclose
+
+from pyras.core.collection import CrossSectionCollection
+from pyras.core.xsection import CrossSection
+
+
+def trapezoid(bottom=0.0):
+    """A trapezoidal channel 10 wide at the bottom, side slopes 1:1."""
+    return CrossSection([0.0, 10.0, 20.0, 30.0],
+                        [bottom + 10, bottom, bottom, bottom + 10],
+                        [0.0], [0.035], (0.0, 30.0))
+
+
+def test_edit_drops_only_the_edited_section():
+    collection = CrossSectionCollection.from_sections(
+        [trapezoid(), trapezoid(1.0), trapezoid(2.0)])
+    first, second = collection[0], collection[1]
+    table = first.htab
+    subdivision = first.subdivision()
+    second.htab
+
+    second.set_points([0.0, 10.0, 20.0, 30.0], [12.0, 2.0, 2.0, 12.0])
+    assert first.htab is table
+    assert first.subdivision() is subdivision
+    assert_allclose(second.htab.start, 2.0)
+
+    collection.set_mann(0, [0.05], [0.0])
+    assert first.htab is not table
+    collection.changed()
+    assert collection._versions.tolist() == [2, 2, 1]
+
+
+def test_htab_options_on_the_collection():
+    collection = CrossSectionCollection.from_sections(
+        [trapezoid(), trapezoid(1.0)])
+    first, second = collection[0], collection[1]
+    assert not hasattr(first, '__dict__')
+    first.set_htab(n_points=11)
+    assert first.htab.n_points == 11
+    assert collection[0].htab.n_points == 11
+    assert second.htab.n_points == 100
+    collection.set_htab(n_points=21)
+    assert collection[1].htab.n_points == 21
+    assert collection[0].htab.n_points == 11
+    assert_allclose(collection[0].htab.elevation[0, [0, -1]], [0.0, 10.0])
@@ -0,0 +1,99 @@
+"""
+Tests of the persistent cache of parsed files.
+"""
+import os.path as osp
+import shutil
+
+import numpy as np
+from numpy.testing import assert_array_equal
+
+from pyras.io.hecras import read_ras
+from pyras.io.hecras.cache import ParseCache, RecordList
+
+
+DATA = osp.join(osp.dirname(osp.dirname(osp.dirname(__file__))), 'data')
+
+
+def copy(tmpdir, name):
+    filename = osp.join(str(tmpdir), name)
+    shutil.copy(osp.join(DATA, name), filename)
+    return filename
+
+
+def test_geometry_round_trip(tmpdir):
+    cache = ParseCache(str(tmpdir.mkdir('cache')))
+    filename = osp.join(DATA, 'fixture.g01')
+    parsed = read_ras.read_geometry(filename)
+    missed = cache.read_geometry(filename)
+    cached = cache.read_geometry(filename)
+    assert (cache.hits, cache.misses) == (1, 1)
+    assert isinstance(missed, RecordList)
+    assert isinstance(cached, RecordList)
+    assert len(missed) == len(parsed)
+    assert len(cached) == len(parsed)
+    for node, expected in zip(cached, parsed):
+        assert set(node) == set(expected)
+        for key, value in expected.items():
+            if isinstance(value, np.ndarray):
+                assert_array_equal(node[key], value)
+            else:
+                assert node[key] == value
+    assert cached.column('rs') == [node['rs'] for node in parsed]
+    assert cached[-1]['rs'] == '0'
+
+
+def test_project_and_plan(tmpdir):
+    cache = ParseCache(str(tmpdir.mkdir('cache')))
+    for name, reader in (('fixture.prj', read_ras.read_project),
+                         ('fixture.p01', read_ras.read_plan)):
+        filename = osp.join(DATA, name)
+        cache.get(reader, filename)
+        assert cache.get(reader, filename) == reader(filename)
+    assert (cache.hits, cache.misses) == (2, 2)
+
+
+def test_invalidation(tmpdir):
+    cache = ParseCache(str(tmpdir.mkdir('cache')), use_hash=True)
+    filename = copy(tmpdir, 'fixture.prj')
+    assert cache.read_project(filename)['Proj Title'] == 'Fixture project'
+    with open(filename, 'rb') as f:
+        data = f.read()
+    with open(filename, 'wb') as f:
+        f.write(data.replace(b'Fixture project', b'Fixture Project'))
+    assert cache.read_project(filename)['Proj Title'] == 'Fixture Project'
+    assert cache.misses == 2
+
+
+def test_eviction(tmpdir):
+    cache = ParseCache(str(tmpdir.mkdir('cache')))
+    cache.read_geometry(osp.join(DATA, 'fixture.g01'))
+    size = cache.stats()['size']
+    cache.max_size = size
+    cache.read_project(osp.join(DATA, 'fixture.prj'))
+    stats = cache.stats()
+    assert stats['entries'] == 1
+    assert stats['size'] <= size
+    cache.clear()
+    assert cache.stats() == {'hits': 0, 'misses': 0, 'entries': 0,
+                             'size': 0}
+
+
+def test_read_boundary_start_in_key(tmpdir):
+    cache = ParseCache(str(tmpdir))
+    filename = osp.join(DATA, 'fixture.u01')
+    relative = cache.read_boundary(filename)
+    assert relative['boundaries'][0]['times'].dtype.kind == 'm'
+
+    result = cache.read_boundary(filename, '2020-01-01T00:00')
+    expected = read_ras.read_boundary(filename, '2020-01-01T00:00')
+    assert cache.misses == 2
+    for got, boundary in zip(result['boundaries'], expected['boundaries']):
+        assert_array_equal(got['times'], boundary['times'])
+        assert_array_equal(got['values'], boundary['values'])
+
+    again = cache.read_boundary(filename, np.datetime64('2020-01-01'))
+    assert (cache.hits, cache.misses) == (1, 2)
+    assert_array_equal(again['boundaries'][0]['times'],
+                       expected['boundaries'][0]['times'])
+    cache.read_boundary(filename)
+    assert (cache.hits, cache.misses) == (2, 2)
@@ -0,0 +1,83 @@
+"""
+Tests of the catalog of HEC-RAS projects.
+"""
+import os
+import os.path as osp
+import shutil
+
+from pyras.io.hecras.catalog import ProjectCatalog, scan_projects
+
+
+DATA = osp.join(osp.dirname(osp.dirname(osp.dirname(__file__))), 'data')
+
+
+def make_tree(tmpdir):
+    """A project with its files and a GIS projection file."""
+    root = tmpdir.mkdir('models')
+    model = root.mkdir('model')
+    for extension in ('prj', 'p01', 'g01', 'u01'):
+        shutil.copy(osp.join(DATA, 'fixture.' + extension),
+                    str(model.join('model.' + extension)))
+    root.mkdir('gis').join('roads.prj').write('GEOGCS["WGS 84"]')
+    # Output newer than the inputs, HEC-RAS writes upper case extensions
+    output = model.join('model.O01')
+    output.write('output')
+    stamp = os.stat(str(model.join('model.p01'))).st_mtime + 10
+    os.utime(str(output), (stamp, stamp))
+    return str(root), str(model.join('model.prj'))
+
+
+def test_scan(tmpdir):
+    root, path = make_tree(tmpdir)
+    catalog = ProjectCatalog()
+    counts = catalog.scan(root, processes=1)
+    assert counts == {'found': 2, 'parsed': 2, 'removed': 0,
+                      'plans_parsed': 1}
+    assert list(catalog) == [path]
+    project = catalog[path]
+    assert project['title'] == 'Fixture project'
+    assert project['current_plan'] == 'p01'
+    assert project['geometry'] == ['g01']
+    assert [record['kind'] for record in project['files']] == [
+        'geometry', 'unsteady flow']
+
+    plans = dict((plan['extension'], plan)
+                 for _, plan in catalog.iter_plans())
+    assert plans['p01']['title'] == 'Unsteady run'
+    assert plans['p01']['geometry'] == 'g01'
+    assert plans['p01']['current']
+    assert [output['extension'] for output in plans['p01']['outputs']] == \
+        ['O01']
+    # The second plan has no file
+    assert plans['p02']['size'] is None
+    assert not plans['p02']['current']
+
+    # Nothing changed, nothing parsed
+    assert catalog.scan(root, processes=1)['parsed'] == 0
+
+    # A newer geometry makes the output out of date
+    geometry = osp.join(osp.dirname(path), 'model.g01')
+    stamp = os.stat(geometry).st_mtime + 100
+    os.utime(geometry, (stamp, stamp))
+    counts = catalog.scan(root, processes=1)
+    assert counts['parsed'] == 0 and counts['plans_parsed'] == 0
+    assert not catalog[path]['plans']['p01']['current']
+
+
+def test_save_load(tmpdir):
+    root, path = make_tree(tmpdir)
+    filename = str(tmpdir.join('catalog.sqlite'))
+    catalog = scan_projects(root, filename, processes=1)
+    loaded = ProjectCatalog(filename)
+    assert list(loaded) == list(catalog)
+    assert loaded[path]['files'] == catalog[path]['files']
+    for (_, plan), (_, expected) in zip(loaded.iter_plans(),
+                                        catalog.iter_plans()):
+        assert plan == expected
+    # The GIS file is remembered and not parsed again
+    assert loaded.scan(root, processes=1)['parsed'] == 0
+
+    os.remove(path)
+    counts = loaded.scan(root, processes=1)
+    assert counts['removed'] == 1
+    assert len(loaded) == 0
@@ -0,0 +1,71 @@
+"""
+Tests of the reader of computation level exports.
+"""
+import os.path as osp
+
+import numpy as np
+import pytest
+from numpy.testing import assert_allclose, assert_array_equal
+
+from pyras.io.hecras.computation_level import (ColumnStore,
+                                               ComputationLevelReader,
+                                               build_column_store)
+
+
+DATA = osp.join(osp.dirname(osp.dirname(osp.dirname(__file__))), 'data')
+EXPORT = osp.join(DATA, 'fixture.complevel.txt')
+
+
+def test_chunks():
+    reader = ComputationLevelReader(EXPORT, chunk_size=4)
+    chunks = list(reader)
+    assert [len(chunk['Flow']) for chunk in chunks] == [4, 4, 1]
+    assert set(chunks[0]) == {'river', 'reach', 'rs', 'time', 'Flow',
+                              'Stage', 'Top Width'}
+    assert reader.categories == {'river': ['Main', 'Trib'],
+                                 'reach': ['Upper', 'Only'],
+                                 'rs': ['300', '200', '20']}
+
+    joined = dict((key, np.concatenate([chunk[key] for chunk in chunks]))
+                  for key in chunks[0])
+    assert_array_equal(reader.decode('rs', joined['rs'][:3]),
+                       ['300', '200', '20'])
+    assert joined['river'].dtype == np.int32
+    assert_allclose(joined['Flow'], [100, 100, 20.5, 150, 148, 22, 90, 91,
+                                     18])
+    assert np.isnan(joined['Top Width'][1])
+    # Midnight written as 2400 of the previous day
+    assert_array_equal(np.unique(joined['time']), np.array(
+        ['2020-01-01T00:00', '2020-01-01T01:00', '2020-01-03T00:00'],
+        dtype='datetime64[s]'))
+
+
+def test_names_and_dtype(tmpdir):
+    filename = str(tmpdir.join('export.txt'))
+    with open(EXPORT, 'rb') as f:
+        lines = f.read().splitlines(True)
+    with open(filename, 'wb') as f:
+        f.writelines(lines[1:])
+    names = ['River', 'Reach', 'RS', 'Date/Time', 'Q', 'WS', 'TW']
+    reader = ComputationLevelReader(filename, dtype=np.float32, names=names)
+    chunk = next(iter(reader))
+    assert chunk['Q'].dtype == np.float32
+    assert_allclose(chunk['WS'][:2], [105.2, 104.9], rtol=1e-6)
+    with pytest.raises(ValueError, match='No river'):
+        next(iter(ComputationLevelReader(filename)))
+
+
+def test_column_store(tmpdir):
+    directory = str(tmpdir.join('store'))
+    store = build_column_store(EXPORT, directory, chunk_size=2)
+    assert len(store) == 9
+    assert sorted(store.keys()) == sorted(['river', 'reach', 'rs', 'time',
+                                           'Flow', 'Stage', 'Top Width'])
+    assert isinstance(store['Flow'], np.memmap)
+    assert 'Stage' in store
+
+    reopened = ColumnStore(directory)
+    assert_allclose(reopened['Stage'][-3:], [105.0, 104.8, 104.0])
+    assert_array_equal(reopened.decode('river', reopened['river'][:3]),
+                       ['Main', 'Main', 'Trib'])
+    assert reopened['time'][-1] == np.datetime64('2020-01-03T00:00')
@@ -0,0 +1,61 @@
+"""
+Tests of the fixed width numeric tables.
+"""
+import numpy as np
+import pytest
+from numpy.testing import assert_allclose
+
+from pyras.io.hecras.fixed_width import (decode, encode, format_field,
+                                         read_block)
+
+
+def test_decode_contiguous_fields():
+    assert_allclose(decode(b'-123.456-12.3456       1', 8),
+                    [-123.456, -12.3456, 1.0])
+    # Short buffers are padded, blank fields are NaN
+    values = decode(b'     1.5        -2', 8)
+    assert_allclose(values[[0, 2]], [1.5, -2.0])
+    assert np.isnan(values[1])
+    assert_allclose(decode(b'       1       2       3', 8, count=2), [1, 2])
+
+
+def test_decode_invalid():
+    with pytest.raises(ValueError, match='field 1'):
+        decode(b'       1    abcd', 8)
+
+
+def test_read_block():
+    lines = [b'#Sta/Elev= 3 \r\n',
+             b'       0     110      10     100      20\r\n',
+             b'     110\r\n',
+             b'Bank Sta=0,20\r\n']
+    values, stop = read_block(lines, 1, 6, 8)
+    assert_allclose(values, [0, 110, 10, 100, 20, 110])
+    assert stop == 3
+    coordinates = [b'             100           200.5',
+                   b'            -300']
+    values, stop = read_block(coordinates, 0, 3, 16)
+    assert_allclose(values, [100, 200.5, -300])
+    assert stop == 2
+
+
+def test_encode_round_trip():
+    values = [0.0, 0.035, -12.345678, 1234567.0, np.nan, 100.5]
+    text = encode(values, 8, 4)
+    lines = text.split(b'\r\n')
+    assert lines[-1] == b''
+    assert [len(line) for line in lines[:-1]] == [32, 16]
+    decoded, _ = read_block(lines[:-1], 0, len(values), 8)
+    assert_allclose(decoded, [0.0, 0.035, -12.3457, 1234567.0, np.nan,
+                              100.5], equal_nan=True)
+
+
+def test_format_field():
+    assert format_field(0.035, 8) == '    .035'
+    assert format_field(-0.5, 8) == '     -.5'
+    assert format_field(-0.0, 8) == '       0'
+    assert format_field(12.0, 8) == '      12'
+    assert format_field(np.nan, 8) == ' ' * 8
+    with pytest.raises(ValueError):
+        format_field(123456789.0, 8)
+    assert format_field(1.0 / 3, 16) == '.333333333333333'
@@ -0,0 +1,70 @@
+"""
+Tests of the random access to the nodes of geometry files.
+"""
+import os
+import os.path as osp
+import shutil
+
+from numpy.testing import assert_array_equal
+
+from pyras.io.hecras.geometry_index import (IndexedGeometry, build_index,
+                                            index_filename, load_index)
+from pyras.io.hecras.read_ras import read_geometry
+
+
+DATA = osp.join(osp.dirname(osp.dirname(osp.dirname(__file__))), 'data')
+
+
+def copy_fixture(tmpdir):
+    filename = osp.join(str(tmpdir), 'model.g01')
+    shutil.copy(osp.join(DATA, 'fixture.g01'), filename)
+    return filename
+
+
+def test_build_index():
+    filename = osp.join(DATA, 'fixture.g01')
+    index = build_index(filename)
+    nodes = read_geometry(filename)
+    assert len(index) == len(nodes)
+    assert_array_equal(index.rs, [node['rs'] for node in nodes])
+    assert_array_equal(index.node_type, [node['type'] for node in nodes])
+    assert index.position('Trib', 'Only', 20) == 5
+    assert ('Main', 'Upper', '50') in index
+    assert ('Main', 'Upper', '51') not in index
+    with open(filename, 'rb') as f:
+        data = f.read()
+    for offset in index.offset:
+        assert data[offset:].startswith(b'Type RM Length L Ch R')
+
+
+def test_read_nodes(tmpdir):
+    filename = copy_fixture(tmpdir)
+    nodes = read_geometry(filename)
+    with IndexedGeometry(filename) as geometry:
+        assert len(geometry) == len(nodes)
+        node = geometry.read_node('Main', 'Upper', '200')
+        assert_array_equal(node['levees'], nodes[1]['levees'])
+        assert_array_equal(node['cut_line'], nodes[1]['cut_line'])
+        keys = [('Main', 'Lower', '0'), ('Main', 'Upper', '300')]
+        last, first = geometry.read_nodes(keys)
+        assert last['rs'] == '0' and first['rs'] == '300'
+        assert_array_equal(first['station'], nodes[0]['station'])
+    assert osp.isfile(index_filename(filename))
+
+
+def test_sidecar_reuse(tmpdir):
+    filename = copy_fixture(tmpdir)
+    index = load_index(filename)
+    sidecar = index_filename(filename)
+    assert index.is_current(filename)
+    assert_array_equal(load_index(filename).offset, index.offset)
+
+    # Edits make the sidecar stale, it is rebuilt
+    with open(filename, 'ab') as f:
+        f.write(b'\r\n')
+    stat = os.stat(filename)
+    os.utime(filename, (stat.st_atime, stat.st_mtime + 10))
+    assert not index.is_current(filename)
+    assert load_index(filename).size == stat.st_size
+    assert load_index(filename, save=False).is_current(filename)
+    assert osp.isfile(sidecar)
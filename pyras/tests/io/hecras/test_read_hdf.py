@@ -0,0 +1,108 @@
+"""
+Tests of the lazy reader of HDF5 plan results.
+"""
+import os.path as osp
+
+import numpy as np
+import pytest
+from numpy.testing import assert_array_equal
+
+h5py = pytest.importorskip('h5py')
+
+from pyras.io.hecras.read_hdf import PlanResults  # noqa: E402
+
+
+UNSTEADY = ('Results/Unsteady/Output/Output Blocks/Base Output/'
+            'Unsteady Time Series')
+STEADY = 'Results/Steady/Output/Output Blocks/Base Output/Steady Profiles'
+N_TIMES = 25
+XS = [('Main', 'Upper', '300'), ('Main', 'Upper', '200'),
+      ('Trib', 'Only', '20'), ('Main', 'Lower', '0')]
+
+
+def cross_sections(f):
+    dtype = np.dtype([('River', 'S16'), ('Reach', 'S16'), ('RS', 'S8')])
+    attrs = np.array([tuple(item.ljust(8).encode() for item in key)
+                      for key in XS], dtype=dtype)
+    f.create_dataset('Geometry/Cross Sections/Attributes', data=attrs)
+
+
+def unsteady_file(tmpdir):
+    filename = osp.join(str(tmpdir), 'model.p01.hdf')
+    with h5py.File(filename, 'w') as f:
+        cross_sections(f)
+        base = f.create_group(UNSTEADY)
+        # Hourly output, as fractions of days
+        base['Time'] = 43830.0 + np.arange(N_TIMES) / 24.0
+        stamps = ['{0:02d}JAN2020 {1:02d}:00:00'.format(1 + i // 24, i % 24)
+                  for i in range(N_TIMES)]
+        base['Time Date Stamp'] = np.array(stamps, dtype='S19')
+        values = np.arange(N_TIMES * len(XS), dtype=np.float32).reshape(
+            N_TIMES, len(XS))
+        ws = base.create_dataset('Cross Sections/Water Surface',
+                                 data=values, chunks=(10, 2))
+        ws.attrs['Units'] = b'ft'
+        base.create_dataset('Cross Sections/Flow', data=values * 2)
+        base.create_dataset('2D Flow Areas/Pond/Depth',
+                            data=np.ones((N_TIMES, 7)))
+    return filename
+
+
+def test_unsteady(tmpdir):
+    filename = unsteady_file(tmpdir)
+    with PlanResults(filename) as results:
+        assert not results.steady
+        times = results.times
+        assert times[0] == np.datetime64('2020-01-01T00:00')
+        assert times[-1] == np.datetime64('2020-01-02T00:00')
+        assert_array_equal(results.cross_sections[2], ['300', '200', '20',
+                                                       '0'])
+        assert sorted(results.variables()) == ['Flow', 'Water Surface']
+        assert results.flow_areas == ['Pond']
+        assert results.variables('Pond') == ['Depth']
+
+        ws = results.cross_section('Water Surface')
+        assert ws.shape == (N_TIMES, len(XS))
+        assert ws.units == 'ft'
+        assert ws.chunks == (10, 2)
+        full = np.asarray(ws)
+        assert_array_equal(ws[3:5, 1], full[3:5, 1])
+
+        index = results.xs_index([XS[3], XS[0]])
+        assert_array_equal(index, [3, 0])
+        view = ws.sel(index, '2020-01-01T02:00', '2020-01-01T05:00')
+        assert view.shape == (4, 2)
+        assert_array_equal(view.times, times[2:6])
+        assert_array_equal(view.read(), full[2:6][:, [3, 0]])
+        # Views of views
+        narrower = view.sel([1], end='2020-01-01T03:00')
+        assert_array_equal(narrower.read(), full[2:4, [0]])
+
+        blocks = list(ws.sel(start='2020-01-01T05:00').iter_chunks())
+        assert [len(block_times) for block_times, _ in blocks] == [5, 10, 5]
+        assert_array_equal(np.concatenate([values for _, values in blocks]),
+                           full[5:])
+        assert results.flow_area('Pond', 'Depth').shape == (N_TIMES, 7)
+        with pytest.raises(KeyError):
+            results.xs_index([('Main', 'Upper', '999')])
+
+
+def test_steady(tmpdir):
+    filename = osp.join(str(tmpdir), 'model.p02.hdf')
+    with h5py.File(filename, 'w') as f:
+        cross_sections(f)
+        base = f.create_group(STEADY)
+        base['Profile Names'] = np.array([b'PF 1', b'PF 2', b'PF 3'])
+        base['Cross Sections/Water Surface'] = np.arange(12.0).reshape(3, 4)
+    with PlanResults(filename) as results:
+        assert results.steady
+        assert_array_equal(results.times, ['PF 1', 'PF 2', 'PF 3'])
+        view = results.cross_section('Water Surface').sel([2], 1, 2)
+        assert_array_equal(view.read(), [[6.0], [10.0]])
+
+
+def test_no_results(tmpdir):
+    filename = osp.join(str(tmpdir), 'empty.hdf')
+    h5py.File(filename, 'w').close()
+    with pytest.raises(IOError):
+        PlanResults(filename)
@@ -0,0 +1,159 @@
+"""
+Tests of the readers of HEC-RAS text files.
+"""
+import os.path as osp
+
+import numpy as np
+from numpy.testing import assert_allclose, assert_array_equal
+
+from pyras.io.hecras.read_ras import (iter_geometry, parse_datetime,
+                                      parse_interval, read_boundaries,
+                                      read_boundary, read_geometry,
+                                      read_network, read_plan, read_project,
+                                      simulation_start, time_index)
+
+
+DATA = osp.join(osp.dirname(osp.dirname(osp.dirname(__file__))), 'data')
+GEOMETRY = osp.join(DATA, 'fixture.g01')
+
+
+def test_read_geometry():
+    nodes = read_geometry(GEOMETRY)
+    assert [(n['river'], n['reach'], n['rs']) for n in nodes] == [
+        ('Main', 'Upper', '300'), ('Main', 'Upper', '200'),
+        ('Main', 'Upper', '100'), ('Main', 'Upper', '50'),
+        ('Main', 'Upper', '10'), ('Trib', 'Only', '20'),
+        ('Trib', 'Only', '10'), ('Main', 'Lower', '90'),
+        ('Main', 'Lower', '0')]
+
+    first = nodes[0]
+    assert first['type'] == 1
+    assert first['description'] == 'Upstream end'
+    assert_allclose(first['lengths'], [100.0, 100.0, 100.0])
+    assert_allclose(first['station'], [0, 10, 15, 35, 55, 60, 70])
+    assert_allclose(first['elevation'],
+                    [112, 108, 104.5, 104, 104.5, 108, 112])
+    assert_allclose(first['mann_station'], [0, 10, 60])
+    assert_allclose(first['mann_n'], [0.06, 0.035, 0.06])
+    assert_allclose(first['bank_stations'], [10, 60])
+    assert_allclose(first['exp_contr'], [0.3, 0.1])
+    assert_allclose(first['cut_line'], [[0, 90], [10, 100]])
+    assert np.isnan(first['levees']).all()
+    assert_allclose(nodes[1]['levees'], [5, 65])
+
+    bridge = nodes[3]
+    assert bridge['type'] == 3
+    assert bridge['description'] == 'Road bridge'
+    assert bridge['station'].size == 0
+    assert_allclose(bridge['lengths'], [40, 40, 40])
+
+
+def test_iter_geometry_streams():
+    nodes = iter_geometry(GEOMETRY)
+    assert not isinstance(nodes, list)
+    for streamed, node in zip(nodes, read_geometry(GEOMETRY)):
+        assert streamed['rs'] == node['rs']
+        assert_array_equal(streamed['elevation'], node['elevation'])
+
+
+def test_read_network():
+    network = read_network(GEOMETRY)
+    assert network['reaches'] == [('Main', 'Upper'), ('Trib', 'Only'),
+                                  ('Main', 'Lower')]
+    assert network['nodes'] == [['300', '200', '100', '50', '10'],
+                                ['20', '10'], ['90', '0']]
+    assert network['junctions'] == {
+        'Confluence': ([('Main', 'Upper'), ('Trib', 'Only')],
+                       [('Main', 'Lower')])}
+    assert network['junction_xy'] == {'Confluence': (50.0, 50.0)}
+    assert_allclose(network['reach_xy'][0], [[0, 100], [20, 80], [50, 50]])
+
+
+def test_read_project():
+    project = read_project(osp.join(DATA, 'fixture.prj'))
+    assert project['Proj Title'] == 'Fixture project'
+    assert project['Current Plan'] == 'p01'
+    assert project['units'] == 'English Units'
+    assert project['Default Exp/Contr'] == (0.3, 0.1)
+    assert project['Geom File'] == ['g01']
+    assert project['Plan File'] == ['p01', 'p02']
+    assert project['Unsteady File'] == ['u01']
+    assert project['Flow File'] == []
+    assert project['description'] == 'Two reaches joined\nwith a tributary'
+    assert project['DSS Start Date'] is None
+    assert project['DXF ScaleY'] == 10.0
+    assert project['GIS Export Profiles'] == 0
+
+
+def test_read_plan():
+    plan = read_plan(osp.join(DATA, 'fixture.p01'))
+    assert plan['Plan Title'] == 'Unsteady run'
+    assert plan['Short Identifier'] == 'Base'
+    assert plan['Geom File'] == 'g01'
+    assert plan['Flow File'] == 'u01'
+    assert plan['regime'] == 'Subcritical Flow'
+    assert plan['Run HTab'] is True and plan['Run Sediment'] is False
+    assert plan['UNET ZTol'] == 0.02
+    assert plan['UNET QTol'] is None
+    assert plan['UNET MxIter'] == 20
+    assert simulation_start(plan) == np.datetime64('2020-01-01T00:00')
+
+
+def test_read_boundary():
+    filename = osp.join(DATA, 'fixture.u01')
+    flow = read_boundary(filename)
+    assert flow['Flow Title'] == 'Fixture flow'
+    assert flow['Use Restart'] is False
+    upper, lower, gate = flow['boundaries']
+
+    assert upper['location'] == ('Main', 'Upper', '300')
+    assert upper['type'] == 'Flow Hydrograph'
+    assert upper['gate'] is None
+    assert_allclose(upper['values'], [100, 150, 250, 180, 120])
+    # Offsets from the start without a start time
+    assert_array_equal(upper['times'],
+                       np.arange(5) * np.timedelta64(1, 'h'))
+
+    # A fixed start time is used as it is
+    assert lower['type'] == 'Stage Hydrograph'
+    assert lower['use_dss'] is True
+    assert lower['dss_path'] == '/A/B/STAGE//30MIN/C/'
+    assert_array_equal(lower['times'], np.array(
+        ['2020-01-02T06:00', '2020-01-02T06:30', '2020-01-02T07:00'],
+        dtype='datetime64[s]'))
+
+    assert gate['type'] == 'Gate Openings'
+    assert gate['gate'] == 'Sluice'
+    assert gate['interval'] == '1DAY'
+    assert_allclose(gate['values'], [0, 1.5])
+
+    started = read_boundary(filename, '2020-01-01')
+    assert started['boundaries'][0]['times'][-1] == \
+        np.datetime64('2020-01-01T04:00')
+    assert_array_equal(started['boundaries'][1]['times'], lower['times'])
+
+
+def test_read_boundaries():
+    filename = osp.join(DATA, 'fixture.u01')
+    results = read_boundaries([filename, filename],
+                              ['2020-01-01', '2021-01-01'], processes=1)
+    assert results[0]['boundaries'][0]['times'][0] == \
+        np.datetime64('2020-01-01')
+    assert results[1]['boundaries'][0]['times'][0] == \
+        np.datetime64('2021-01-01')
+
+
+def test_dates_and_intervals():
+    assert parse_datetime('02JAN2020', '2400') == \
+        np.datetime64('2020-01-03T00:00')
+    assert parse_datetime('15mar1999', '13:45:10') == \
+        np.datetime64('1999-03-15T13:45:10')
+    assert parse_interval('15MIN') == np.timedelta64(15, 'm')
+    assert parse_interval('1WEEK') == np.timedelta64(1, 'W')
+    # Calendar steps keep the day and time in the month
+    times = time_index(3, '1MON', '2020-01-15T12:00')
+    assert_array_equal(times, np.array(
+        ['2020-01-15T12:00', '2020-02-15T12:00', '2020-03-15T12:00'],
+        dtype='datetime64[s]'))
+    assert_array_equal(time_index(3, '30MIN'),
+                       np.arange(3) * np.timedelta64(30, 'm'))
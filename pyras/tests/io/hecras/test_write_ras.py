@@ -0,0 +1,124 @@
+"""
+Tests of the file level editing of geometry files.
+"""
+import os
+import os.path as osp
+import shutil
+import stat
+
+import numpy as np
+import pytest
+from numpy.testing import assert_allclose, assert_array_equal
+
+from pyras.io.hecras.geometry_index import (GeometryIndex, build_index,
+                                            index_filename, load_index)
+from pyras.io.hecras.read_ras import read_geometry
+from pyras.io.hecras.write_ras import (insert_nodes, patch_manning,
+                                       patch_manning_lchr)
+
+
+DATA = osp.join(osp.dirname(osp.dirname(osp.dirname(__file__))), 'data')
+
+
+def copy_fixture(tmpdir, mode=0o644):
+    """Copy the fixture geometry file with a given mode."""
+    filename = osp.join(str(tmpdir), 'model.g01')
+    shutil.copy(osp.join(DATA, 'fixture.g01'), filename)
+    os.chmod(filename, mode)
+    return filename
+
+
+def nodes_by_key(filename):
+    return {(node['river'], node['reach'], node['rs']): node
+            for node in read_geometry(filename)}
+
+
+def assert_index_current(filename):
+    """The sidecar index is up to date and matches a new scan."""
+    sidecar = GeometryIndex.load(index_filename(filename))
+    assert sidecar.is_current(filename)
+    fresh = build_index(filename)
+    assert_array_equal(sidecar.offset, fresh.offset)
+    assert_array_equal(sidecar.length, fresh.length)
+
+
+def test_patch_manning_in_place(tmpdir):
+    filename = copy_fixture(tmpdir)
+    before = nodes_by_key(filename)
+    load_index(filename)
+    key = ('Main', 'Upper', '200')
+    patch_manning(filename, {key: ([0.07, 0.045, 0.07, 0.09],
+                                   [0.0, 10.0, 40.0, 60.0])})
+
+    after = nodes_by_key(filename)
+    assert_allclose(after[key]['mann_n'], [0.07, 0.045, 0.07, 0.09])
+    assert_allclose(after[key]['mann_station'], [0.0, 10.0, 40.0, 60.0])
+    # The rest of the file is untouched
+    for other in before:
+        if other != key:
+            assert_array_equal(after[other]['mann_n'], before[other]['mann_n'])
+        assert_array_equal(after[other]['station'], before[other]['station'])
+    assert stat.S_IMODE(os.stat(filename).st_mode) == 0o644
+    assert_index_current(filename)
+
+
+def test_patch_manning_lchr_output(tmpdir):
+    filename = copy_fixture(tmpdir)
+    output = osp.join(str(tmpdir), 'scenario.g02')
+    key = ('Trib', 'Only', '20')
+    patch_manning_lchr(filename, {key: (0.1, 0.05, 0.1)}, output)
+    assert_allclose(nodes_by_key(output)[key]['mann_n'], [0.1, 0.05, 0.1])
+    assert_allclose(nodes_by_key(filename)[key]['mann_n'], [0.08, 0.04, 0.08])
+    assert_index_current(output)
+
+
+def test_insert_nodes_in_place(tmpdir):
+    filename = copy_fixture(tmpdir, 0o664)
+    load_index(filename)
+    node = dict(nodes_by_key(filename)[('Main', 'Upper', '300')])
+    node['rs'] = '250*'
+    node['elevation'] = node['elevation'] - 0.05
+    node['cut_line'] = np.empty((0, 2))
+    insert_nodes(filename, [node], [('Main', 'Upper', '300')],
+                 {('Main', 'Upper', '300'): (50.0, 50.0, 50.0)})
+
+    nodes = read_geometry(filename)
+    names = [n['rs'] for n in nodes if n['reach'] == 'Upper']
+    assert names == ['300', '250*', '200', '100', '50', '10']
+    assert_allclose(nodes[0]['lengths'], [50.0, 50.0, 50.0])
+    assert_allclose(nodes[1]['elevation'], node['elevation'])
+    assert_allclose(nodes[1]['mann_n'], node['mann_n'])
+    assert stat.S_IMODE(os.stat(filename).st_mode) == 0o664
+
+    # The old sidecar is out of date and is rebuilt
+    index = load_index(filename)
+    assert ('Main', 'Upper', '250*') in index
+    assert_index_current(filename)
+
+
+def test_insert_nodes_after_last_node(tmpdir):
+    filename = copy_fixture(tmpdir)
+    with open(filename, 'rb') as f:
+        data = f.read()
+    # Drop the junction, the global lines follow the last node
+    start = data.index(b'Junct Name=')
+    data = data[:start] + data[data.index(b'LCMann Time='):]
+    with open(filename, 'wb') as f:
+        f.write(data)
+
+    node = dict(nodes_by_key(filename)[('Main', 'Lower', '0')])
+    node['rs'] = '-10'
+    insert_nodes(filename, [node], [('Main', 'Lower', '0')])
+    assert [n['rs'] for n in read_geometry(filename)][-3:] == ['90', '0',
+                                                                '-10']
+    with open(filename, 'rb') as f:
+        lines = f.read().splitlines()
+    assert lines[-3:] == [b'LCMann Time=Dec/30/1899 00:00:00',
+                          b'Chan Stop Cuts=-1', b'']
+
+
+def test_insert_nodes_length_mismatch(tmpdir):
+    filename = copy_fixture(tmpdir)
+    node = nodes_by_key(filename)[('Main', 'Upper', '300')]
+    with pytest.raises(ValueError):
+        insert_nodes(filename, [node, node], [('Main', 'Upper', '300')])
@@ -0,0 +1,18 @@
+"""
+Helpers shared by the pyras modules.
+"""
+import os
+
+
+def replace_file(source, target):
+    """Rename a file over another one, as os.replace of Python 3.
+
+    On Python 2, os.rename does not replace an existing file on Windows, the
+    target is removed first.
+    """
+    if hasattr(os, 'replace'):
+        os.replace(source, target)
+        return
+    if os.name == 'nt' and os.path.exists(target):
+        os.remove(target)
+    os.rename(source, target)
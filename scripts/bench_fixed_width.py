@@ -0,0 +1,47 @@
+"""
+Micro-benchmark of the fixed width decoder against a pure Python loop.
+"""
+import timeit
+
+import numpy as np
+
+from pyras.io.hecras.fixed_width import decode
+
+
+def _gen_block(n_values, width=8, seed=0):
+    """Generate a station/elevation like block of fixed width values."""
+    rng = np.random.RandomState(seed)
+    values = np.round(rng.uniform(-1000, 10000, n_values), 2)
+    fields = [('{0:g}'.format(v)).rjust(width)[:width] for v in values]
+    return ''.join(fields).encode('ascii')
+
+
+def _decode_loop(data, width):
+    """Reference decoder converting one field at a time."""
+    values = []
+    for i in range(0, len(data), width):
+        field = data[i:i + width].strip()
+        values.append(float(field) if field else float('nan'))
+    return values
+
+
+def bench(n_values=100000, width=8, repeat=5):
+    """Print the best time of the numpy and Python decoders."""
+    data = _gen_block(n_values, width)
+    assert np.array_equal(decode(data, width), _decode_loop(data, width))
+
+    t_numpy = min(timeit.repeat(lambda: decode(data, width), number=1,
+                                repeat=repeat))
+    t_loop = min(timeit.repeat(lambda: _decode_loop(data, width), number=1,
+                               repeat=repeat))
+
+    print('{0} values, width {1}'.format(n_values, width))
+    print('  numpy  : {0:.4f} s'.format(t_numpy))
+    print('  python : {0:.4f} s'.format(t_loop))
+    print('  speedup: {0:.1f}x'.format(t_loop / t_numpy))
+
+
+if __name__ == '__main__':
+    for n in (1000, 100000, 1000000):
+        bench(n, 8)
+    bench(100000, 16)
@@ -0,0 +1,42 @@
+"""
+Benchmark of the vectorized hydraulic properties on synthetic cross sections.
+"""
+import time
+
+import numpy as np
+
+from pyras.core.hydraulics import Subdivision
+
+
+def _gen_sections(n_sections, n_points=100, seed=0):
+    """Generate V shaped cross sections with noise and three n values."""
+    rng = np.random.RandomState(seed)
+    station = np.sort(rng.uniform(0, 500, (n_sections, n_points)), axis=1)
+    elevation = (np.abs(station - 250) / 25 +
+                 rng.uniform(0, 1, (n_sections, n_points)) + 800)
+    mann_station = np.tile([0.0, 200.0, 300.0], (n_sections, 1))
+    mann_n = np.tile([0.08, 0.035, 0.07], (n_sections, 1))
+    banks = np.tile([200.0, 300.0], (n_sections, 1))
+    return (station.ravel(), elevation.ravel(),
+            np.full(n_sections, n_points), mann_station.ravel(),
+            mann_n.ravel(), np.full(n_sections, 3), banks)
+
+
+def bench(n_sections=50000, n_stages=200):
+    """Print the time to build the rating tables of many sections."""
+    sections = _gen_sections(n_sections)
+    start = time.time()
+    subdivision = Subdivision(*sections)
+    built = time.time()
+    wse = subdivision.thalweg[:, None] + np.linspace(0.1, 12, n_stages)
+    subdivision.properties(wse)
+    done = time.time()
+
+    print('{0} sections, {1} stages'.format(n_sections, n_stages))
+    print('  subdivision: {0:.2f} s'.format(built - start))
+    print('  properties : {0:.2f} s'.format(done - built))
+
+
+if __name__ == '__main__':
+    bench(1000)
+    bench(50000)
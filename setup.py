@@ -17,7 +17,10 @@ def readme():
 
 	
 # Check that pywin32 is installed otherwise raise error.
-install_requires = []
+install_requires = ['numpy']
+
+# Optional, needed to read the HDF5 results of HEC-RAS 5 plans.
+extras_require = {'hdf': ['h5py']}
 
 
 setup(
@@ -34,6 +37,7 @@ setup(
     description='Python Wrapper of HEC RAS COM interface',
     long_description=readme(),
     install_requires=install_requires,
+    extras_require=extras_require,
     classifiers=[
         'Development Status :: 4 - Beta',
         'Environment :: Win32 (MS Windows)',